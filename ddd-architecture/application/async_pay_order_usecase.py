@@ -0,0 +1,152 @@
+import asyncio
+from typing import Dict, Iterable, Optional
+from uuid import UUID
+
+from domain.order_status import OrderStatus
+from .interfaces import AsyncOrderRepository, AsyncPaymentGateway, PaymentResult
+
+
+class AsyncPayOrderUseCase:
+    """Асинхронный Use Case для оплаты заказа"""
+    
+    def __init__(
+        self,
+        order_repository: AsyncOrderRepository,
+        payment_gateway: AsyncPaymentGateway,
+        max_concurrency: int = 1000
+    ):
+        """
+        Args:
+            order_repository: асинхронный репозиторий заказов
+            payment_gateway: асинхронный платежный шлюз
+            max_concurrency: максимальное число одновременно выполняемых оплат
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be positive")
+        
+        self._order_repository = order_repository
+        self._payment_gateway = payment_gateway
+        self._max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+    
+    @property
+    def max_concurrency(self) -> int:
+        return self._max_concurrency
+    
+    async def execute(self, order_id: UUID) -> PaymentResult:
+        """
+        Выполнить оплату заказа
+        
+        Шаги совпадают с PayOrderUseCase.execute: заказ сохраняется
+        в статусе PENDING со сравнением версии до вызова шлюза, поэтому
+        из параллельных оплат одного заказа до шлюза дойдет только одна.
+        Если деньги списаны, но оплату не удалось сохранить, результат
+        успешен и содержит ID транзакции, а заказ остается в PENDING
+        до вызова recover_pending. Число одновременно выполняемых оплат
+        ограничено max_concurrency.
+        """
+        async with self._semaphore:
+            # 1. Загружаем заказ
+            order = await self._order_repository.get_by_id(order_id)
+            if order is None:
+                return self._failed(f"Order {order_id} not found")
+            
+            # Сохраняем исходный статус
+            original_status = order.status
+            
+            # 2. Занимаем заказ: проверка инвариантов и сохранение PENDING
+            try:
+                order.start_payment()
+            except Exception as e:
+                return self._failed(str(e))
+            try:
+                await self._order_repository.save(order)
+            except Exception as e:
+                order._status = original_status
+                return self._failed(str(e))
+            
+            # 3. Вызываем платежный шлюз. При отмене задачи заказ остается
+            # в PENDING: неизвестно, успел ли шлюз списать деньги
+            try:
+                payment_result = await self._payment_gateway.charge(
+                    order_id, order.total_amount
+                )
+            except Exception as e:
+                payment_result = self._failed(str(e))
+            
+            # 4. Если платеж успешен, оплачиваем заказ,
+            # иначе восстанавливаем исходный статус
+            try:
+                if payment_result.success:
+                    order.pay()
+                else:
+                    order._status = original_status
+                await self._order_repository.save(order)
+            except Exception as e:
+                if payment_result.success:
+                    return self._unrecorded(payment_result, e)
+                return self._failed(str(e))
+            
+            return payment_result
+    
+    async def recover_pending(
+        self, order_id: UUID, transaction_id: Optional[str] = None
+    ) -> PaymentResult:
+        """
+        Завершает оплату заказа, оставшегося в PENDING после сбоя
+        
+        Args:
+            order_id: ID заказа
+            transaction_id: ID транзакции списания; None - деньги
+                не списывались, заказ возвращается в DRAFT
+        
+        Returns:
+            PaymentResult: успешный с ID транзакции, если оплата записана
+        """
+        order = await self._order_repository.get_by_id(order_id)
+        if order is None:
+            return self._failed(f"Order {order_id} not found")
+        if order.status != OrderStatus.PENDING:
+            return self._failed(f"Order {order_id} is not pending payment")
+        
+        try:
+            if transaction_id:
+                order.pay()
+            else:
+                order._status = OrderStatus.DRAFT
+            await self._order_repository.save(order)
+        except Exception as e:
+            return self._failed(str(e))
+        if not transaction_id:
+            return self._failed(f"Payment of order {order_id} was released")
+        return PaymentResult(
+            success=True, transaction_id=transaction_id, message="Payment recorded"
+        )
+    
+    async def execute_many(self, order_ids: Iterable[UUID]) -> Dict[UUID, PaymentResult]:
+        """
+        Выполнить оплату нескольких заказов конкурентно
+        
+        Returns:
+            Dict[UUID, PaymentResult]: результат для каждого ID заказа
+            в порядке входной последовательности
+        """
+        unique_ids = list(dict.fromkeys(order_ids))
+        results = await asyncio.gather(
+            *(self.execute(order_id) for order_id in unique_ids)
+        )
+        return dict(zip(unique_ids, results))
+    
+    @staticmethod
+    def _failed(message: str) -> PaymentResult:
+        """Создает результат неуспешной оплаты"""
+        return PaymentResult(success=False, transaction_id="", message=message)
+    
+    @staticmethod
+    def _unrecorded(payment_result: PaymentResult, error: Exception) -> PaymentResult:
+        """Результат списания, которое не удалось записать в заказ"""
+        return PaymentResult(
+            success=True,
+            transaction_id=payment_result.transaction_id,
+            message=f"Payment charged but not recorded: {error}"
+        )
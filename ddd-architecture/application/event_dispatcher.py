@@ -0,0 +1,160 @@
+import queue
+import threading
+import time
+from typing import Callable, List, Optional
+
+from domain.domain_events import DomainEvent
+from .interfaces import Outbox, OutboxRecord
+
+# Маркер остановки для потока доставки
+_STOP = None
+
+
+class OutboxDispatcher:
+    """
+    Доставка событий из outbox пакетами с обратным давлением
+    
+    Поток чтения забирает из outbox пакеты по batch_size событий
+    и кладет их в ограниченную очередь (max_pending_batches пакетов),
+    поток доставки передает пакеты обработчику и подтверждает их
+    в outbox. Когда обработчик не успевает, очередь заполняется
+    и чтение останавливается, поэтому в памяти не больше
+    max_pending_batches пакетов, а остальные события ждут в outbox.
+    
+    Пакет подтверждается только после успешной обработки; при ошибке
+    обработчика он повторяется с экспоненциальной задержкой. Доставка
+    выполняется не менее одного раза: события, не подтвержденные
+    до остановки, будут доставлены повторно.
+    """
+    
+    def __init__(
+        self,
+        outbox: Outbox,
+        handler: Callable[[List[DomainEvent]], None],
+        batch_size: int = 500,
+        max_pending_batches: int = 4,
+        poll_interval: float = 0.1,
+        retry_backoff: float = 0.1,
+        max_retry_backoff: float = 5.0,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        """
+        Args:
+            outbox: источник событий
+            handler: обработчик пакета событий (например, публикация в брокер)
+            batch_size: максимальное число событий в пакете
+            max_pending_batches: число прочитанных, но не доставленных пакетов
+            poll_interval: пауза между опросами пустого outbox, секунды
+            retry_backoff: начальная задержка повтора после ошибки обработчика
+            max_retry_backoff: максимальная задержка повтора
+            sleep: функция ожидания (подменяется в тестах)
+        """
+        if batch_size < 1 or max_pending_batches < 1:
+            raise ValueError("batch_size and max_pending_batches must be positive")
+        self._outbox = outbox
+        self._handler = handler
+        self._batch_size = batch_size
+        self._max_pending_batches = max_pending_batches
+        self._poll_interval = poll_interval
+        self._retry_backoff = retry_backoff
+        self._max_retry_backoff = max_retry_backoff
+        self._sleep = sleep
+        
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self.delivered = 0
+        self.failures = 0
+    
+    def dispatch_pending(self) -> int:
+        """
+        Доставляет все события outbox в текущем потоке
+        
+        Returns:
+            число доставленных событий
+        
+        Raises:
+            Exception: ошибка обработчика (пакет остается в outbox)
+        """
+        delivered = 0
+        while True:
+            records = self._outbox.fetch(0, self._batch_size)
+            if not records:
+                return delivered
+            self._deliver(records)
+            delivered += len(records)
+    
+    def start(self) -> None:
+        """Запускает потоки чтения и доставки"""
+        if self._threads:
+            raise RuntimeError("Dispatcher is already running")
+        self._stopping.clear()
+        batches: queue.Queue = queue.Queue(maxsize=self._max_pending_batches)
+        self._threads = [
+            threading.Thread(target=self._read, args=(batches,), daemon=True),
+            threading.Thread(target=self._send, args=(batches,), daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+    
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Останавливает доставку; уже прочитанные пакеты доставляются до выхода"""
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+    
+    def _read(self, batches: queue.Queue) -> None:
+        """Поток чтения: пакеты из outbox в очередь доставки"""
+        cursor = 0
+        try:
+            while not self._stopping.is_set():
+                try:
+                    records = self._outbox.fetch(cursor, self._batch_size)
+                except Exception:
+                    self.failures += 1
+                    self._sleep(self._poll_interval)
+                    continue
+                if not records:
+                    self._sleep(self._poll_interval)
+                    continue
+                # Блокирующая запись в очередь и есть обратное давление
+                if not self._put(batches, records):
+                    return
+                cursor = records[-1].sequence
+        finally:
+            self._put(batches, _STOP, force=True)
+    
+    def _put(self, batches: queue.Queue, item, force: bool = False) -> bool:
+        """Кладет элемент в очередь, пока не запрошена остановка"""
+        while force or not self._stopping.is_set():
+            try:
+                batches.put(item, timeout=self._poll_interval)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def _send(self, batches: queue.Queue) -> None:
+        """Поток доставки: обработка и подтверждение пакетов"""
+        abandoned = False
+        for records in iter(batches.get, _STOP):
+            # После брошенного пакета следующие не доставляем: подтверждение
+            # более позднего номера подтвердило бы и брошенный пакет
+            backoff = self._retry_backoff
+            while not abandoned:
+                try:
+                    self._deliver(records)
+                    break
+                except Exception:
+                    self.failures += 1
+                    if self._stopping.is_set():
+                        # Пакет не подтвержден и будет доставлен после перезапуска
+                        abandoned = True
+                        break
+                    self._sleep(backoff)
+                    backoff = min(backoff * 2, self._max_retry_backoff)
+    
+    def _deliver(self, records: List[OutboxRecord]) -> None:
+        self._handler([record.event for record in records])
+        self._outbox.acknowledge(records[-1].sequence)
+        self.delivered += len(records)
@@ -0,0 +1,141 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+from uuid import UUID
+
+from .interfaces import PaymentResult
+
+
+class _Entry:
+    """Запись хранилища: результат вызова или ожидание его завершения"""
+    
+    __slots__ = ('order_id', 'done', 'result', 'expires_at')
+    
+    def __init__(self, order_id: UUID):
+        self.order_id = order_id
+        self.done = threading.Event()
+        self.result: Optional[PaymentResult] = None
+        self.expires_at = float("inf")
+
+
+class IdempotencyStore:
+    """
+    Ограниченное хранилище результатов оплаты по ключу идемпотентности
+    
+    Первый вызов с ключом выполняет операцию, повторные получают
+    сохраненный результат без повторного выполнения. Параллельные
+    дубликаты ждут завершения первого вызова. Сохраняются только
+    окончательные результаты (успех, отказ в платеже): после временной
+    ошибки или исключения запись удаляется, и повтор с тем же ключом
+    выполняет операцию заново. Записи удаляются по истечении ttl, а при
+    превышении max_size вытесняются самые старые завершенные.
+    """
+    
+    def __init__(
+        self,
+        max_size: int = 100_000,
+        ttl: float = 24 * 60 * 60,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            max_size: максимальное число хранимых ключей
+            ttl: время хранения результата в секундах
+            clock: источник монотонного времени (для тестов)
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be positive")
+        
+        self._max_size = max_size
+        self._ttl = ttl
+        self._clock = clock
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def run(
+        self,
+        key: str,
+        order_id: UUID,
+        operation: Callable[[], Tuple[PaymentResult, bool]]
+    ) -> PaymentResult:
+        """
+        Выполняет операцию один раз для ключа
+        
+        Args:
+            key: ключ идемпотентности запроса
+            order_id: ID оплачиваемого заказа (ключ нельзя использовать
+                для другого заказа)
+            operation: операция, возвращающая результат и признак того,
+                что он окончательный и его нужно сохранить
+        
+        Returns:
+            PaymentResult: сохраненный результат для этого ключа или результат
+            нового выполнения
+        """
+        with self._lock:
+            now = self._clock()
+            self._evict_expired(now)
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = _Entry(order_id)
+                self._entries[key] = entry
+                self._evict_oversized()
+                owner = True
+            else:
+                owner = False
+        
+        if entry.order_id != order_id:
+            return PaymentResult(
+                success=False,
+                transaction_id="",
+                message=f"Idempotency key {key} was used for order {entry.order_id}"
+            )
+        
+        if not owner:
+            entry.done.wait()
+            return entry.result
+        
+        try:
+            entry.result, final = operation()
+        except Exception as e:
+            entry.result = PaymentResult(success=False, transaction_id="", message=str(e))
+            final = False
+        
+        with self._lock:
+            if self._entries.get(key) is entry:
+                if final:
+                    entry.expires_at = self._clock() + self._ttl
+                    # Порядок записей совпадает с порядком истечения их срока
+                    self._entries.move_to_end(key)
+                else:
+                    del self._entries[key]
+        entry.done.set()
+        return entry.result
+    
+    def _evict_expired(self, now: float) -> None:
+        entries = self._entries
+        while entries:
+            key, entry = next(iter(entries.items()))
+            if entry.expires_at > now:
+                return
+            del entries[key]
+    
+    def _evict_oversized(self) -> None:
+        # Незавершенные записи не вытесняются: иначе дубликат запроса
+        # выполнил бы операцию второй раз, пока первая еще идет
+        entries = self._entries
+        excess = len(entries) - self._max_size
+        if excess <= 0:
+            return
+        victims = []
+        for key, entry in entries.items():
+            if entry.done.is_set():
+                victims.append(key)
+                if len(victims) == excess:
+                    break
+        for key in victims:
+            del entries[key]
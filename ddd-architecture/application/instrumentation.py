@@ -0,0 +1,40 @@
+# Фазы PayOrderUseCase.execute
+PHASE_LOAD = "load"
+PHASE_DOMAIN = "domain"
+# Сохранение заказа в статусе PENDING перед списанием
+PHASE_CLAIM = "claim"
+PHASE_CHARGE = "charge"
+PHASE_SAVE = "save"
+
+# Исходы оплаты
+OUTCOME_SUCCESS = "success"
+OUTCOME_NOT_FOUND = "not_found"
+OUTCOME_DOMAIN_ERROR = "domain_error"
+OUTCOME_CONFLICT = "conflict"
+OUTCOME_DECLINED = "declined"
+OUTCOME_ERROR = "error"
+# Деньги списаны, но оплата заказа не сохранена (заказ остался в PENDING)
+OUTCOME_UNRECORDED = "charged_unrecorded"
+
+
+class PaymentInstrumentation:
+    """
+    Хуки инструментирования PayOrderUseCase
+    
+    Реализация по умолчанию ничего не делает. Пока enabled равен False,
+    use case не измеряет время фаз вовсе, поэтому накладные расходы
+    сводятся к одной проверке флага.
+    """
+    
+    enabled: bool = False
+    
+    def observe_phase(self, phase: str, seconds: float) -> None:
+        """Записывает длительность фазы (load, domain, claim, charge, save)"""
+        pass
+    
+    def count_outcome(self, outcome: str) -> None:
+        """Учитывает исход оплаты"""
+        pass
+
+
+NO_INSTRUMENTATION = PaymentInstrumentation()
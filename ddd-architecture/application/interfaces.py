@@ -1,16 +1,60 @@
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 from uuid import UUID
+from datetime import datetime
 from decimal import Decimal
 from dataclasses import dataclass
 
 from domain.order_aggregate import Order
+from domain.order_status import OrderStatus
 from domain.money import Money
+from domain.domain_events import DomainEvent
+
+
+@dataclass(frozen=True)
+class OutboxRecord:
+    """Событие в outbox с порядковым номером"""
+    sequence: int
+    event: DomainEvent
+
+
+class Outbox(ABC):
+    """
+    Интерфейс outbox: доменные события, сохраненные вместе с заказами
+    
+    Репозиторий с outbox записывает события заказа в ту же транзакцию,
+    что и сам заказ; доставка выполняется отдельно (OutboxDispatcher).
+    """
+    
+    @abstractmethod
+    def fetch(self, after: int, limit: int) -> List[OutboxRecord]:
+        """
+        Получить недоставленные события по возрастанию номера
+        
+        Args:
+            after: номер, после которого начинать чтение
+            limit: максимальное число событий
+        """
+        pass
+    
+    @abstractmethod
+    def acknowledge(self, sequence: int) -> None:
+        """Отметить доставленными все события с номером не больше sequence"""
+        pass
+    
+    @abstractmethod
+    def pending_count(self) -> int:
+        """Число недоставленных событий"""
+        pass
 
 
 class OrderRepository(ABC):
     """Интерфейс репозитория заказов"""
     
+    # Outbox, в который save переносит события заказа; без outbox
+    # события после сохранения отбрасываются
+    outbox: Optional[Outbox] = None
+    
     @abstractmethod
     def get_by_id(self, order_id: UUID) -> Optional[Order]:
         """Получить заказ по ID"""
@@ -20,6 +64,95 @@ class OrderRepository(ABC):
     def save(self, order: Order) -> None:
         """Сохранить заказ"""
         pass
+    
+    def get_many(self, order_ids: Iterable[UUID]) -> Dict[UUID, Order]:
+        """
+        Получить несколько заказов за один вызов
+        
+        Реализация по умолчанию вызывает get_by_id для каждого ID;
+        хранилища с поддержкой пакетных чтений должны её переопределять.
+        
+        Returns:
+            Dict[UUID, Order]: найденные заказы (отсутствующие ID пропускаются)
+        """
+        orders = {}
+        for order_id in order_ids:
+            order = self.get_by_id(order_id)
+            if order is not None:
+                orders[order_id] = order
+        return orders
+    
+    def save_many(self, orders: Iterable[Order]) -> None:
+        """Сохранить несколько заказов за один вызов"""
+        for order in orders:
+            self.save(order)
+    
+    def iter_orders(self) -> Iterator[Order]:
+        """
+        Перебрать все заказы (для снимков и выгрузки)
+        
+        Реализация по умолчанию обходит заказы всех статусов через find_by_status.
+        """
+        for status in OrderStatus:
+            yield from self.find_by_status(status)
+    
+    def restore_many(self, orders: Iterable[Order]) -> None:
+        """
+        Загрузить заказы как есть, например из снимка
+        
+        В отличие от save_many версии заказов не проверяются и не
+        увеличиваются, события в outbox не переносятся, сохраненные
+        заказы с теми же ID заменяются.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support restore_many")
+    
+    @abstractmethod
+    def find_by_customer(self, customer_id: UUID) -> List[Order]:
+        """Найти все заказы покупателя"""
+        pass
+    
+    @abstractmethod
+    def find_by_status(self, status: OrderStatus) -> List[Order]:
+        """Найти все заказы с указанным статусом (по последнему сохранению)"""
+        pass
+    
+    @abstractmethod
+    def find_created_between(self, start: datetime, end: datetime) -> List[Order]:
+        """Найти заказы, созданные в интервале [start, end), по времени создания"""
+        pass
+    
+    def find_id_range(self, start: UUID, end: UUID) -> List[Order]:
+        """
+        Найти заказы с ID в диапазоне [start, end) в порядке ID
+        
+        Для ID из TimeOrderedIdProvider порядок ID совпадает с порядком
+        создания, а границы интервала времени дает domain.identity.id_range.
+        Реализация по умолчанию обходит заказы всех статусов (O(N log N));
+        репозитории с упорядоченным индексом ID её переопределяют.
+        """
+        low, high = start.int, end.int
+        found = [
+            order
+            for status in OrderStatus
+            for order in self.find_by_status(status)
+            if low <= order.id.int < high
+        ]
+        found.sort(key=lambda order: order.id.int)
+        return found
+
+
+class AsyncOrderRepository(ABC):
+    """Асинхронный интерфейс репозитория заказов"""
+    
+    @abstractmethod
+    async def get_by_id(self, order_id: UUID) -> Optional[Order]:
+        """Получить заказ по ID"""
+        pass
+    
+    @abstractmethod
+    async def save(self, order: Order) -> None:
+        """Сохранить заказ"""
+        pass
 
 
 @dataclass
@@ -30,6 +163,16 @@ class PaymentResult:
     message: str = ""
 
 
+class PaymentGatewayError(Exception):
+    """
+    Временная ошибка платежного шлюза (недоступность, сбой на его стороне)
+    
+    В отличие от отказа в платеже (PaymentResult с success=False),
+    запрос с такой ошибкой можно повторить.
+    """
+    pass
+
+
 class PaymentGateway(ABC):
     """Интерфейс платежного шлюза"""
     
@@ -46,3 +189,38 @@ class PaymentGateway(ABC):
             PaymentResult: результат платежа
         """
         pass
+    
+    def charge_batch(
+        self, charges: Sequence[Tuple[UUID, Money]]
+    ) -> List[PaymentResult]:
+        """
+        Выполнить пакет платежей
+        
+        Реализация по умолчанию вызывает charge для каждого платежа;
+        шлюзы с пакетным API должны её переопределять.
+        
+        Args:
+            charges: пары (ID заказа, сумма платежа)
+            
+        Returns:
+            List[PaymentResult]: результаты в порядке входных платежей
+        """
+        return [self.charge(order_id, amount) for order_id, amount in charges]
+
+
+class AsyncPaymentGateway(ABC):
+    """Асинхронный интерфейс платежного шлюза"""
+    
+    @abstractmethod
+    async def charge(self, order_id: UUID, amount: Money) -> PaymentResult:
+        """
+        Выполнить платеж, не блокируя цикл событий
+        
+        Args:
+            order_id: ID заказа
+            amount: сумма платежа
+            
+        Returns:
+            PaymentResult: результат платежа
+        """
+        pass
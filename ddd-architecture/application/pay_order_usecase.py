@@ -1,10 +1,34 @@
-from typing import Optional
+from time import perf_counter
+from typing import Dict, Iterable, List, Optional, Tuple
 from uuid import UUID
 
 from domain.order_aggregate import Order
 from domain.money import Money
 from domain.order_status import OrderStatus
+from domain.domain_exceptions import ConcurrencyConflictException
 from .interfaces import OrderRepository, PaymentGateway, PaymentResult
+from .idempotency import IdempotencyStore
+from .instrumentation import (
+    NO_INSTRUMENTATION,
+    OUTCOME_CONFLICT,
+    OUTCOME_DECLINED,
+    OUTCOME_DOMAIN_ERROR,
+    OUTCOME_ERROR,
+    OUTCOME_NOT_FOUND,
+    OUTCOME_SUCCESS,
+    OUTCOME_UNRECORDED,
+    PHASE_CHARGE,
+    PHASE_CLAIM,
+    PHASE_DOMAIN,
+    PHASE_LOAD,
+    PHASE_SAVE,
+    PaymentInstrumentation
+)
+
+
+# Исходы, результат которых сохраняется по ключу идемпотентности;
+# после остальных повтор с тем же ключом выполняет оплату заново
+_FINAL_OUTCOMES = frozenset((OUTCOME_SUCCESS, OUTCOME_DECLINED, OUTCOME_UNRECORDED))
 
 
 class PayOrderUseCase:
@@ -13,55 +37,335 @@ class PayOrderUseCase:
     def __init__(
         self, 
         order_repository: OrderRepository,
-        payment_gateway: PaymentGateway
+        payment_gateway: PaymentGateway,
+        idempotency_store: Optional[IdempotencyStore] = None,
+        instrumentation: PaymentInstrumentation = NO_INSTRUMENTATION
     ):
+        """
+        Args:
+            order_repository: репозиторий заказов
+            payment_gateway: платежный шлюз
+            idempotency_store: хранилище результатов по ключам идемпотентности
+                (по умолчанию создается IdempotencyStore с настройками по умолчанию)
+            instrumentation: хуки для длительности фаз и исходов оплаты
+        """
         self._order_repository = order_repository
         self._payment_gateway = payment_gateway
+        self._idempotency_store = (
+            idempotency_store if idempotency_store is not None else IdempotencyStore()
+        )
+        self._instrumentation = instrumentation
     
-    def execute(self, order_id: UUID) -> PaymentResult:
+    def execute(self, order_id: UUID, idempotency_key: Optional[str] = None) -> PaymentResult:
         """
         Выполнить оплату заказа
         
+        Если передан idempotency_key, повторный запрос с тем же ключом
+        получает результат первого запроса без повторного обращения
+        к платежному шлюзу; параллельные дубликаты ждут первый запрос.
+        
         Шаги:
         1. Загрузить заказ из репозитория
-        2. Выполнить доменную операцию оплаты
+        2. Перевести заказ в PENDING и сохранить со сравнением версии
         3. Вызвать платёж через PaymentGateway
-        4. Сохранить заказ (только если платеж успешен)
+        4. Оплатить заказ (или вернуть исходный статус) и сохранить
         5. Вернуть результат оплаты
+        
+        Сохранение PENDING до вызова шлюза гарантирует, что из параллельных
+        оплат одного заказа до шлюза дойдет только одна: остальные получат
+        устаревшую версию (ConcurrencyConflictException) или увидят статус
+        PENDING/PAID.
+        
+        Если деньги списаны, но оплату не удалось сохранить, результат
+        успешен и содержит ID транзакции (исход charged_unrecorded), а заказ
+        остается в PENDING до вызова recover_pending.
         """
+        if idempotency_key is None:
+            return self._execute(order_id)
+        return self._idempotency_store.run(
+            idempotency_key, order_id, lambda: self._execute_final(order_id)
+        )
+    
+    def _execute_final(self, order_id: UUID) -> Tuple[PaymentResult, bool]:
+        """Оплачивает заказ и сообщает, окончателен ли результат"""
+        outcome, result = self._attempt(order_id)
+        return self._finish(outcome, result), outcome in _FINAL_OUTCOMES
+    
+    def _execute(self, order_id: UUID) -> PaymentResult:
+        outcome, result = self._attempt(order_id)
+        return self._finish(outcome, result)
+    
+    def _attempt(self, order_id: UUID) -> Tuple[str, PaymentResult]:
+        """Выполняет шаги оплаты и возвращает исход и результат"""
+        instrumentation = self._instrumentation
+        timed = instrumentation.enabled
+        start = perf_counter() if timed else 0.0
+        
         # 1. Загружаем заказ
         order = self._order_repository.get_by_id(order_id)
+        if timed:
+            start = self._lap(PHASE_LOAD, start)
         if order is None:
-            return PaymentResult(
+            return OUTCOME_NOT_FOUND, PaymentResult(
                 success=False,
                 transaction_id="",
                 message=f"Order {order_id} not found"
             )
         
+        # Сохраняем исходный статус
+        original_status = order.status
+        
+        # 2. Занимаем заказ: проверка инвариантов и сохранение PENDING
+        try:
+            order.start_payment()
+            domain_error = None
+        except Exception as e:
+            domain_error = e
+        if timed:
+            start = self._lap(PHASE_DOMAIN, start)
+        if domain_error is not None:
+            return OUTCOME_DOMAIN_ERROR, self._failed(str(domain_error))
+        try:
+            self._order_repository.save(order)
+        except Exception as e:
+            order._status = original_status
+            outcome = (
+                OUTCOME_CONFLICT if isinstance(e, ConcurrencyConflictException)
+                else OUTCOME_ERROR
+            )
+            return outcome, self._failed(str(e))
+        finally:
+            if timed:
+                start = self._lap(PHASE_CLAIM, start)
+        
+        # 3. Вызываем платежный шлюз
+        try:
+            payment_result = self._payment_gateway.charge(order_id, order.total_amount)
+            outcome = OUTCOME_SUCCESS if payment_result.success else OUTCOME_DECLINED
+        except Exception as e:
+            payment_result = self._failed(str(e))
+            outcome = OUTCOME_ERROR
+        if timed:
+            start = self._lap(PHASE_CHARGE, start)
+        
+        # 4. Если платеж успешен, оплачиваем заказ,
+        # иначе восстанавливаем исходный статус
         try:
-            # Сохраняем исходный статус
-            original_status = order.status
-            
-            # 2. Доменная операция оплаты (меняет статус на PAID)
-            order.pay()
-            amount = order.total_amount
-            
-            # 3. Вызываем платежный шлюз
-            payment_result = self._payment_gateway.charge(order_id, amount)
-            
-            # 4. Если платеж успешен, сохраняем заказ
             if payment_result.success:
-                self._order_repository.save(order)
+                order.pay()
             else:
-                # Если платеж не прошел, восстанавливаем исходный статус
                 order._status = original_status
+            self._order_repository.save(order)
+        except Exception as e:
+            if payment_result.success:
+                # Деньги уже списаны: возвращаем ID транзакции, чтобы оплату
+                # можно было записать через recover_pending
+                return OUTCOME_UNRECORDED, self._unrecorded(payment_result, e)
+            return OUTCOME_ERROR, self._failed(str(e))
+        finally:
+            if timed:
+                self._lap(PHASE_SAVE, start)
+        
+        return outcome, payment_result
+    
+    def recover_pending(
+        self, order_id: UUID, transaction_id: Optional[str] = None
+    ) -> PaymentResult:
+        """
+        Завершает оплату заказа, оставшегося в PENDING после сбоя
+        
+        Такие заказы находятся через find_by_status(OrderStatus.PENDING).
+        
+        Args:
+            order_id: ID заказа
+            transaction_id: ID транзакции списания (из результата
+                с исходом charged_unrecorded или из выписки шлюза);
+                None - деньги не списывались, заказ возвращается в DRAFT
+        
+        Returns:
+            PaymentResult: успешный с ID транзакции, если оплата записана
+        """
+        order = self._order_repository.get_by_id(order_id)
+        if order is None:
+            return self._failed(f"Order {order_id} not found")
+        if order.status != OrderStatus.PENDING:
+            return self._failed(f"Order {order_id} is not pending payment")
+        
+        try:
+            if transaction_id:
+                order.pay()
+            else:
+                order._status = OrderStatus.DRAFT
+            self._order_repository.save(order)
+        except Exception as e:
+            return self._failed(str(e))
+        if not transaction_id:
+            return self._failed(f"Payment of order {order_id} was released")
+        return PaymentResult(
+            success=True, transaction_id=transaction_id, message="Payment recorded"
+        )
+    
+    def _lap(self, phase: str, start: float) -> float:
+        """Записывает длительность фазы и возвращает начало следующей"""
+        now = perf_counter()
+        self._instrumentation.observe_phase(phase, now - start)
+        return now
+    
+    def _finish(self, outcome: str, result: PaymentResult) -> PaymentResult:
+        if self._instrumentation.enabled:
+            self._instrumentation.count_outcome(outcome)
+        return result
+    
+    def execute_many(self, order_ids: Iterable[UUID]) -> Dict[UUID, PaymentResult]:
+        """
+        Выполнить оплату пакета заказов
+        
+        Вместо обращений на каждый заказ выполняет одно пакетное чтение
+        (get_many), одно сохранение заказов в статусе PENDING, один пакетный
+        платеж (charge_batch) и одно сохранение результатов (save_many).
+        
+        Returns:
+            Dict[UUID, PaymentResult]: результат для каждого ID заказа
+            в порядке входной последовательности
+        """
+        timed = self._instrumentation.enabled
+        start = perf_counter() if timed else 0.0
+        results: Dict[UUID, Optional[PaymentResult]] = dict.fromkeys(order_ids)
+        outcomes: Dict[UUID, str] = {}
+        orders = self._order_repository.get_many(results)
+        if timed:
+            start = self._lap(PHASE_LOAD, start)
+        
+        # 1-2. Загружаем заказы и переводим их в PENDING
+        pending: List[Tuple[Order, OrderStatus]] = []
+        for order_id in results:
+            order = orders.get(order_id)
+            if order is None:
+                results[order_id] = self._failed(f"Order {order_id} not found")
+                outcomes[order_id] = OUTCOME_NOT_FOUND
+                continue
             
-            return payment_result
+            original_status = order.status
+            try:
+                order.start_payment()
+            except Exception as e:
+                results[order_id] = self._failed(str(e))
+                outcomes[order_id] = OUTCOME_DOMAIN_ERROR
+                continue
+            pending.append((order, original_status))
+        if timed:
+            start = self._lap(PHASE_DOMAIN, start)
+        
+        pending = self._claim(pending, results, outcomes)
+        if timed:
+            start = self._lap(PHASE_CLAIM, start)
+        
+        if pending:
+            # 3. Один вызов платежного шлюза на весь пакет
+            try:
+                charge_results = self._payment_gateway.charge_batch(
+                    [(order.id, order.total_amount) for order, _ in pending]
+                )
+                charge_outcome = None
+            except Exception as e:
+                charge_results = [self._failed(str(e)) for _ in pending]
+                charge_outcome = OUTCOME_ERROR
+            if timed:
+                start = self._lap(PHASE_CHARGE, start)
             
-        except Exception as e:
-            # Возвращаем ошибку, если что-то пошло не так
-            return PaymentResult(
-                success=False,
-                transaction_id="",
-                message=str(e)
+            # Заказы без результата шлюза не оплачены и возвращаются в исходный статус
+            charge_results = list(charge_results)
+            matched = len(charge_results)
+            charge_results.extend(
+                self._failed("Payment gateway returned no result for order")
+                for _ in range(len(pending) - matched)
             )
+            
+            for index, ((order, original_status), payment_result) in enumerate(
+                zip(pending, charge_results)
+            ):
+                results[order.id] = payment_result
+                if payment_result.success:
+                    order.pay()
+                    outcomes[order.id] = OUTCOME_SUCCESS
+                else:
+                    order._status = original_status
+                    outcomes[order.id] = (
+                        OUTCOME_ERROR if index >= matched
+                        else charge_outcome or OUTCOME_DECLINED
+                    )
+            
+            # 4. Одно сохранение для всего пакета
+            try:
+                self._order_repository.save_many(order for order, _ in pending)
+            except Exception as e:
+                for order, _ in pending:
+                    payment_result = results[order.id]
+                    if payment_result.success:
+                        results[order.id] = self._unrecorded(payment_result, e)
+                        outcomes[order.id] = OUTCOME_UNRECORDED
+                    else:
+                        results[order.id] = self._failed(str(e))
+                        outcomes[order.id] = OUTCOME_ERROR
+            if timed:
+                self._lap(PHASE_SAVE, start)
+        
+        if timed:
+            for outcome in outcomes.values():
+                self._instrumentation.count_outcome(outcome)
+        return results
+    
+    def _claim(
+        self,
+        pending: List[Tuple[Order, OrderStatus]],
+        results: Dict[UUID, Optional[PaymentResult]],
+        outcomes: Dict[UUID, str]
+    ) -> List[Tuple[Order, OrderStatus]]:
+        """
+        Сохраняет заказы в статусе PENDING
+        
+        Сначала пробует одно пакетное сохранение; если пакет отклонен,
+        сохраняет заказы по одному. Неатомарный save_many мог успеть
+        сохранить часть заказов: повторное сохранение того же объекта
+        проходит проверку версии, поэтому такие заказы остаются занятыми
+        и получают исход, а не зависают в PENDING.
+        
+        Returns:
+            заказы, которые удалось занять
+        """
+        if not pending:
+            return pending
+        try:
+            self._order_repository.save_many(order for order, _ in pending)
+            return pending
+        except Exception:
+            pass
+        
+        claimed = []
+        for order, original_status in pending:
+            try:
+                self._order_repository.save(order)
+            except Exception as e:
+                order._status = original_status
+                results[order.id] = self._failed(str(e))
+                outcomes[order.id] = (
+                    OUTCOME_CONFLICT if isinstance(e, ConcurrencyConflictException)
+                    else OUTCOME_ERROR
+                )
+                continue
+            claimed.append((order, original_status))
+        return claimed
+    
+    @staticmethod
+    def _failed(message: str) -> PaymentResult:
+        """Создает результат неуспешной оплаты"""
+        return PaymentResult(success=False, transaction_id="", message=message)
+    
+    @staticmethod
+    def _unrecorded(payment_result: PaymentResult, error: Exception) -> PaymentResult:
+        """Результат списания, которое не удалось записать в заказ"""
+        return PaymentResult(
+            success=True,
+            transaction_id=payment_result.transaction_id,
+            message=f"Payment charged but not recorded: {error}"
+        )
@@ -0,0 +1,142 @@
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Hashable, Iterable, Optional, Tuple
+from uuid import UUID
+
+from domain.money import Money, MoneyAccumulator
+from domain.order_aggregate import Order
+from domain.order_status import OrderStatus
+from .interfaces import OrderRepository
+
+
+@dataclass
+class Totals:
+    """Число заказов и выручка по оплаченным заказам"""
+    orders: int = 0
+    paid_orders: int = 0
+    # Выручка по валютам: сумма total_amount оплаченных заказов
+    revenue: Dict[str, Money] = field(default_factory=dict)
+
+
+class _Bucket:
+    """Изменяемые итоги одного ключа разреза"""
+    
+    __slots__ = ('orders', 'paid_orders', 'revenue')
+    
+    def __init__(self):
+        self.orders = 0
+        self.paid_orders = 0
+        self.revenue: Dict[str, MoneyAccumulator] = {}
+    
+    def snapshot(self) -> Totals:
+        return Totals(
+            self.orders,
+            self.paid_orders,
+            {currency: total.total() for currency, total in self.revenue.items()}
+        )
+
+
+# Вклад заказа в итоги: (версия, статус, покупатель, валюта, сумма)
+_Contribution = Tuple[int, OrderStatus, UUID, str, Money]
+
+
+def _contribution(order: Order) -> _Contribution:
+    total = order.total_amount
+    return order.version, order.status, order.customer_id, total.currency, total
+
+
+class RevenueReport:
+    """
+    Материализованные итоги по заказам: по статусу, покупателю и валюте
+    
+    Итоги обновляются инкрементально при каждом сохранении заказа
+    (подписка через ObservableOrderRepository), поэтому чтение выполняется
+    за O(1) без обхода репозитория. Для каждого заказа хранится его текущий
+    вклад, чтобы при смене статуса или суммы вычесть старый вклад; сохранения
+    с версией не новее учтенной пропускаются. rebuild пересчитывает итоги
+    полным обходом.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._contributions: Dict[UUID, _Contribution] = {}
+        self._by_status: Dict[OrderStatus, _Bucket] = {}
+        self._by_customer: Dict[UUID, _Bucket] = {}
+        self._by_currency: Dict[str, _Bucket] = {}
+    
+    def on_saved(self, orders: Iterable[Order]) -> None:
+        """Учитывает сохраненные заказы (подписчик репозитория)"""
+        contributions = [(order.id, _contribution(order)) for order in orders]
+        with self._lock:
+            for order_id, contribution in contributions:
+                self._update(order_id, contribution)
+    
+    def rebuild(self, orders: Iterable[Order]) -> None:
+        """
+        Пересчитывает итоги по полному набору заказов
+        
+        Заказы, сохраненные во время обхода с более новой версией,
+        учитываются по последнему сохранению.
+        """
+        scanned = {order.id: _contribution(order) for order in orders}
+        with self._lock:
+            live = self._contributions
+            self._contributions = {}
+            self._by_status = {}
+            self._by_customer = {}
+            self._by_currency = {}
+            for order_id, contribution in live.items():
+                if order_id not in scanned or scanned[order_id][0] < contribution[0]:
+                    scanned[order_id] = contribution
+            for order_id, contribution in scanned.items():
+                self._update(order_id, contribution)
+    
+    def rebuild_from(self, repository: OrderRepository) -> None:
+        """Пересчитывает итоги обходом всех заказов репозитория"""
+        self.rebuild(
+            order for status in OrderStatus for order in repository.find_by_status(status)
+        )
+    
+    def _update(self, order_id: UUID, contribution: _Contribution) -> None:
+        previous = self._contributions.get(order_id)
+        if previous is not None:
+            if previous[0] >= contribution[0]:
+                return
+            self._apply(previous, -1)
+        self._apply(contribution, 1)
+        self._contributions[order_id] = contribution
+    
+    def _apply(self, contribution: _Contribution, sign: int) -> None:
+        _, status, customer_id, currency, amount = contribution
+        paid = status is OrderStatus.PAID
+        for buckets, key in (
+            (self._by_status, status),
+            (self._by_customer, customer_id),
+            (self._by_currency, currency),
+        ):
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = _Bucket()
+            bucket.orders += sign
+            if paid:
+                bucket.paid_orders += sign
+                revenue = bucket.revenue.get(currency)
+                if revenue is None:
+                    revenue = bucket.revenue[currency] = MoneyAccumulator(currency)
+                revenue.add(amount, sign)
+            if not bucket.orders:
+                del buckets[key]
+    
+    def by_status(self, status: OrderStatus) -> Totals:
+        return self._read(self._by_status, status)
+    
+    def by_customer(self, customer_id: UUID) -> Totals:
+        return self._read(self._by_customer, customer_id)
+    
+    def by_currency(self, currency: str) -> Totals:
+        return self._read(self._by_currency, currency)
+    
+    def _read(self, buckets: Dict[Hashable, _Bucket], key: Hashable) -> Totals:
+        with self._lock:
+            bucket: Optional[_Bucket] = buckets.get(key)
+            return bucket.snapshot() if bucket is not None else Totals()
@@ -0,0 +1,226 @@
+"""
+Бенчмарк горячих путей: сборка заказа, total_amount, remove_line,
+арифметика Money и пропускная способность PayOrderUseCase.execute
+
+Результаты печатаются в stdout, с --output записываются в JSON
+и сравниваются с сохраненным базовым файлом (--baseline); при замедлении
+больше допуска код выхода равен 1.
+
+Запуск из каталога ddd-architecture:
+    python -m benchmarks.hot_path_benchmark --output results.json
+    python -m benchmarks.hot_path_benchmark --output results.json --baseline baseline.json
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+from uuid import uuid4
+
+from domain.money import Money, MoneyAccumulator
+from domain.order_aggregate import Order, OrderLine
+from application.pay_order_usecase import PayOrderUseCase
+from infrastructure.order_repository import InMemoryOrderRepository
+from infrastructure.payment_gateway import FakePaymentGateway
+
+LINE_COUNTS = (10, 100, 1_000, 10_000)
+
+
+def make_lines(count: int) -> List[OrderLine]:
+    return [
+        OrderLine(
+            product_id=uuid4(),
+            product_name=f"Product {i}",
+            price=Money.from_minor_units(100 + i % 1000),
+            quantity=1 + i % 5
+        )
+        for i in range(count)
+    ]
+
+
+def measure(
+    operation: Callable[[object], None],
+    operations: int,
+    repeat: int,
+    setup: Callable[[], object] = lambda: None
+) -> Dict[str, float]:
+    """
+    Измеряет операцию несколько раз и берет лучший результат
+    
+    Args:
+        operation: измеряемая функция, получает результат setup
+        operations: число операций, выполняемых за один вызов operation
+        repeat: число повторов
+        setup: подготовка данных, не входящая в измерение
+    
+    Returns:
+        лучшее время на операцию и соответствующее число операций в секунду
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        state = setup()
+        start = time.perf_counter()
+        operation(state)
+        best = min(best, time.perf_counter() - start)
+    seconds_per_op = best / operations
+    return {
+        "seconds_per_op": seconds_per_op,
+        "ops_per_sec": 1 / seconds_per_op if seconds_per_op else float("inf"),
+    }
+
+
+def bench_orders(repeat: int) -> Dict[str, Dict[str, float]]:
+    results = {}
+    for count in LINE_COUNTS:
+        lines = make_lines(count)
+        
+        def build(_, lines=lines):
+            order = Order()
+            for line in lines:
+                order.add_line(line)
+        
+        def build_order(lines=lines):
+            return Order(lines=lines)
+        
+        def read_total(order):
+            for _ in range(1000):
+                order.total_amount
+        
+        # Удаляем до 100 строк из середины заказа
+        removed = [line.product_id for line in lines[count // 2:count // 2 + 100]]
+        
+        def remove(order, removed=removed):
+            for product_id in removed:
+                order.remove_line(product_id)
+        
+        results[f"order.add_line[{count}]"] = measure(build, count, repeat)
+        results[f"order.total_amount[{count}]"] = measure(
+            read_total, 1000, repeat, build_order
+        )
+        results[f"order.remove_line[{count}]"] = measure(
+            remove, len(removed), repeat, build_order
+        )
+    return results
+
+
+def bench_money(repeat: int) -> Dict[str, Dict[str, float]]:
+    prices = [Money.from_minor_units(100 + i % 1000) for i in range(10_000)]
+    
+    def add(_):
+        total = Money.from_minor_units(0)
+        for price in prices:
+            total = total + price
+    
+    def multiply(_):
+        for price in prices:
+            price * 3
+    
+    def accumulate(_):
+        accumulator = MoneyAccumulator()
+        for price in prices:
+            accumulator.add(price, 3)
+        accumulator.total()
+    
+    return {
+        "money.add": measure(add, len(prices), repeat),
+        "money.mul": measure(multiply, len(prices), repeat),
+        "money.accumulate": measure(accumulate, len(prices), repeat),
+    }
+
+
+def bench_use_case(repeat: int, orders: int) -> Dict[str, Dict[str, float]]:
+    def setup():
+        repository = InMemoryOrderRepository()
+        order_ids = []
+        for _ in range(orders):
+            order = Order(lines=make_lines(3))
+            repository.save(order)
+            order_ids.append(order.id)
+        use_case = PayOrderUseCase(repository, FakePaymentGateway(history_size=1))
+        return use_case, order_ids
+    
+    def execute(state):
+        use_case, order_ids = state
+        for order_id in order_ids:
+            use_case.execute(order_id)
+    
+    return {"pay_order.execute": measure(execute, orders, repeat, setup)}
+
+
+def run(repeat: int = 5, orders: int = 10_000) -> dict:
+    """Выполняет все бенчмарки и возвращает результат в виде словаря для JSON"""
+    results = {}
+    results.update(bench_orders(repeat))
+    results.update(bench_money(repeat))
+    results.update(bench_use_case(repeat, orders))
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> List[str]:
+    """
+    Сравнивает результаты с базовыми
+    
+    Returns:
+        имена бенчмарков, которые замедлились больше чем на tolerance
+    """
+    regressions = []
+    for name, values in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        if values["seconds_per_op"] > base["seconds_per_op"] * (1 + tolerance):
+            regressions.append(name)
+    return regressions
+
+
+def print_report(current: dict, baseline: Optional[dict]) -> None:
+    print(f"{'benchmark':<30}{'ops/s':>14}{'baseline':>14}{'change':>10}")
+    for name, values in current["results"].items():
+        line = f"{name:<30}{values['ops_per_sec']:>14.0f}"
+        base = baseline["results"].get(name) if baseline else None
+        if base is not None:
+            change = base["seconds_per_op"] / values["seconds_per_op"] - 1
+            line += f"{base['ops_per_sec']:>14.0f}{change:>+10.1%}"
+        print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--output", help="файл для сохранения результатов (JSON)")
+    parser.add_argument("--baseline", help="файл с базовыми результатами для сравнения")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="допустимое замедление (0.2 = 20%%)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--orders", type=int, default=10_000)
+    args = parser.parse_args()
+    
+    current = run(args.repeat, args.orders)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(current, file, indent=2)
+    
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    print_report(current, baseline)
+    
+    if baseline is not None:
+        regressions = compare(current, baseline, args.tolerance)
+        if regressions:
+            print(f"regressions over {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Бенчмарк памяти: сколько байт занимают заказ и строка заказа
+в InMemoryOrderRepository
+
+Запуск из каталога ddd-architecture:
+    python -m benchmarks.memory_benchmark --orders 1000000 --lines-per-order 2
+"""
+import argparse
+import gc
+import tracemalloc
+from uuid import uuid4
+
+from domain.money import Money
+from domain.order_aggregate import Order, OrderLine
+from infrastructure.order_repository import InMemoryOrderRepository
+
+
+def fill_repository(orders: int, lines_per_order: int) -> InMemoryOrderRepository:
+    """Заполняет репозиторий заказами с заданным числом строк"""
+    repository = InMemoryOrderRepository()
+    for i in range(orders):
+        order = Order()
+        for j in range(lines_per_order):
+            order.add_line(OrderLine(
+                product_id=uuid4(),
+                product_name=f"Product {j}",
+                price=Money.from_minor_units(100 + i % 1000),
+                quantity=1 + j
+            ))
+        repository.save(order)
+    return repository
+
+
+def measure(orders: int, lines_per_order: int) -> int:
+    """Возвращает число байт, занятых репозиторием с заказами"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        repository = fill_repository(orders, lines_per_order)
+        gc.collect()
+        used, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del repository
+    return used
+
+
+def run(orders: int, lines_per_order: int) -> dict:
+    """Измеряет память на заказ и на строку заказа"""
+    empty_orders_bytes = measure(orders, 0)
+    full_orders_bytes = measure(orders, lines_per_order)
+    
+    bytes_per_order = empty_orders_bytes / orders
+    bytes_per_line = 0.0
+    if lines_per_order:
+        bytes_per_line = (
+            (full_orders_bytes - empty_orders_bytes) / (orders * lines_per_order)
+        )
+    
+    return {
+        "orders": orders,
+        "lines_per_order": lines_per_order,
+        "total_bytes": full_orders_bytes,
+        "bytes_per_order": bytes_per_order,
+        "bytes_per_line": bytes_per_line,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--lines-per-order", type=int, default=2)
+    args = parser.parse_args()
+    
+    result = run(args.orders, args.lines_per_order)
+    print(f"orders:          {result['orders']}")
+    print(f"lines per order: {result['lines_per_order']}")
+    print(f"total:           {result['total_bytes'] / 2 ** 20:.1f} MiB")
+    print(f"bytes per order: {result['bytes_per_order']:.1f}")
+    print(f"bytes per line:  {result['bytes_per_line']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Бенчмарк репозиториев: InMemoryOrderRepository против ShardedOrderRepository,
+SqliteOrderRepository и EventLogOrderRepository
+
+Запуск из каталога ddd-architecture:
+    python -m benchmarks.repository_benchmark --orders 20000 --lines-per-order 3
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from typing import Callable, Dict, List
+from uuid import uuid4
+
+from domain.money import Money
+from domain.order_aggregate import Order, OrderLine
+from application.interfaces import OrderRepository
+from infrastructure.order_repository import InMemoryOrderRepository
+from infrastructure.sqlite_order_repository import SqliteOrderRepository
+from infrastructure.event_log_repository import EventLogOrderRepository
+from infrastructure.sharded_order_repository import ShardedOrderRepository
+
+
+def make_orders(count: int, lines_per_order: int) -> List[Order]:
+    """Создает заказы с заданным числом строк"""
+    orders = []
+    for i in range(count):
+        order = Order()
+        order.add_lines(
+            OrderLine(
+                product_id=uuid4(),
+                product_name=f"Product {j}",
+                price=Money.from_minor_units(100 + (i + j) % 1000),
+                quantity=1 + j
+            )
+            for j in range(lines_per_order)
+        )
+        orders.append(order)
+    return orders
+
+
+def timed(operation: Callable[[], None], count: int) -> float:
+    """Возвращает число операций в секунду"""
+    start = time.perf_counter()
+    operation()
+    return count / (time.perf_counter() - start)
+
+
+def bench_repository(repository: OrderRepository, orders: List[Order], batch_size: int) -> Dict[str, float]:
+    """Измеряет пропускную способность операций репозитория"""
+    ids = [order.id for order in orders]
+    sample = random.Random(42).sample(ids, min(len(ids), 5000))
+    half = len(orders) // 2
+    
+    def save_one_by_one():
+        for order in orders[:half]:
+            repository.save(order)
+    
+    def save_in_batches():
+        for start in range(half, len(orders), batch_size):
+            repository.save_many(orders[start:start + batch_size])
+    
+    def get_one_by_one():
+        for order_id in sample:
+            repository.get_by_id(order_id)
+    
+    def get_in_batches():
+        for start in range(0, len(ids), batch_size):
+            repository.get_many(ids[start:start + batch_size])
+    
+    return {
+        "save": timed(save_one_by_one, half),
+        "save_many": timed(save_in_batches, len(orders) - half),
+        "get_by_id": timed(get_one_by_one, len(sample)),
+        "get_many": timed(get_in_batches, len(ids)),
+    }
+
+
+def run(orders: int, lines_per_order: int, batch_size: int) -> Dict[str, Dict[str, float]]:
+    """Сравнивает репозитории на одном наборе заказов"""
+    data = make_orders(orders, lines_per_order)
+    results = {
+        "in_memory": bench_repository(InMemoryOrderRepository(), data, batch_size),
+        "sharded": bench_repository(ShardedOrderRepository(), data, batch_size),
+    }
+    
+    with tempfile.TemporaryDirectory() as directory:
+        repository = SqliteOrderRepository(os.path.join(directory, "orders.db"))
+        try:
+            results["sqlite"] = bench_repository(repository, data, batch_size)
+        finally:
+            repository.close()
+        
+        log_path = os.path.join(directory, "orders.log")
+        repository = EventLogOrderRepository(log_path)
+        try:
+            results["event_log"] = bench_repository(repository, data, batch_size)
+        finally:
+            repository.close()
+        
+        start = time.perf_counter()
+        EventLogOrderRepository(log_path).close()
+        print(f"event log recovery: {time.perf_counter() - start:.3f} s for {orders} orders")
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--orders", type=int, default=20_000)
+    parser.add_argument("--lines-per-order", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    
+    results = run(args.orders, args.lines_per_order, args.batch_size)
+    operations = list(next(iter(results.values())))
+    print(f"{'ops/s':<12}" + "".join(f"{name:>14}" for name in operations))
+    for repository, values in results.items():
+        print(f"{repository:<12}" + "".join(f"{values[name]:>14.0f}" for name in operations))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+from dataclasses import dataclass
+from uuid import UUID
+
+from .money import Money
+
+
+@dataclass(frozen=True, slots=True)
+class DomainEvent:
+    """Базовое доменное событие заказа"""
+    order_id: UUID
+    # Время события как POSIX timestamp
+    occurred_at: float
+
+
+@dataclass(frozen=True, slots=True)
+class LineAdded(DomainEvent):
+    """В заказ добавлена строка"""
+    product_id: UUID
+    product_name: str
+    price: Money
+    quantity: int
+
+
+@dataclass(frozen=True, slots=True)
+class LineRemoved(DomainEvent):
+    """Из заказа удалена строка"""
+    product_id: UUID
+
+
+@dataclass(frozen=True, slots=True)
+class LineQuantityChanged(DomainEvent):
+    """Изменено количество в строке заказа"""
+    product_id: UUID
+    quantity: int
+
+
+@dataclass(frozen=True, slots=True)
+class OrderPaid(DomainEvent):
+    """Заказ оплачен"""
+    amount: Money
@@ -16,3 +16,13 @@ class OrderAlreadyPaidException(DomainException):
 class OrderModificationException(DomainException):
     """Нельзя изменить оплаченный заказ"""
     pass
+
+
+class PaymentInProgressException(DomainException):
+    """Оплата заказа уже выполняется"""
+    pass
+
+
+class ConcurrencyConflictException(DomainException):
+    """Заказ был изменен параллельно: сохраняемая версия устарела"""
+    pass
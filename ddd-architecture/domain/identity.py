@@ -0,0 +1,89 @@
+import random
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Optional, Tuple
+from uuid import SafeUUID, UUID
+
+# Источник ID и часы (POSIX timestamp), которые использует Order
+IdProvider = Callable[[], UUID]
+Clock = Callable[[], float]
+
+# Раскладка UUIDv7 (RFC 9562): 48 бит миллисекунд, версия, 74 случайных бита
+_RANDOM_BITS = 74
+_LOW_BITS = 62
+_LOW_MASK = (1 << _LOW_BITS) - 1
+_VERSION = 0x7 << 76
+_VARIANT = 0b10 << 62
+
+_new_object = object.__new__
+_set_attribute = object.__setattr__
+
+
+def uuid_from_int(value: int) -> UUID:
+    """UUID из 128-битного числа без проверок UUID.__init__"""
+    uuid = _new_object(UUID)
+    _set_attribute(uuid, 'int', value)
+    _set_attribute(uuid, 'is_safe', SafeUUID.unknown)
+    return uuid
+
+
+class TimeOrderedIdProvider:
+    """
+    Монотонные UUIDv7, упорядоченные по времени создания
+    
+    Старшие 48 бит - время в миллисекундах, поэтому сортировка ID
+    совпадает с порядком создания, а заказы за интервал времени лежат
+    в непрерывном диапазоне ID (см. id_range). Внутри одной миллисекунды
+    следующий ID равен предыдущему плюс один, как в монотонных ULID,
+    поэтому ID строго возрастают даже при отставании часов.
+    
+    Случайная часть берется из random.Random, а не из os.urandom:
+    такие ID уникальны, но не подходят как секреты.
+    """
+    
+    def __init__(self, clock: Clock = time.time, rng: Optional[random.Random] = None):
+        """
+        Args:
+            clock: источник времени (POSIX timestamp)
+            rng: генератор случайной части (по умолчанию random.Random())
+        """
+        self._clock = clock
+        self._random = rng or random.Random()
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._last = 0
+    
+    def __call__(self) -> UUID:
+        ms = int(self._clock() * 1000)
+        with self._lock:
+            last_ms = self._last_ms
+            if ms <= last_ms:
+                last = self._last
+                if last & _LOW_MASK != _LOW_MASK:
+                    # Та же миллисекунда: следующий ID - предыдущий плюс один
+                    self._last = last + 1
+                    return UUID(int=last + 1)
+                # Счетчик миллисекунды исчерпан: переходим к следующей
+                ms = last_ms + 1
+            rand = self._random.getrandbits(_RANDOM_BITS)
+            value = (
+                (ms << 80) | _VERSION | ((rand >> _LOW_BITS) << 64)
+                | _VARIANT | (rand & _LOW_MASK)
+            )
+            self._last_ms = ms
+            self._last = value
+        return UUID(int=value)
+
+
+def id_range(start: datetime, end: datetime) -> Tuple[UUID, UUID]:
+    """
+    Границы ID, созданных TimeOrderedIdProvider в интервале [start, end)
+    
+    Returns:
+        (первый ID диапазона, первый ID после диапазона)
+    """
+    return (
+        UUID(int=int(start.timestamp() * 1000) << 80),
+        UUID(int=int(end.timestamp() * 1000) << 80)
+    )
@@ -0,0 +1,696 @@
+import operator
+from abc import ABC, abstractmethod
+from array import array
+from collections.abc import Sequence
+from decimal import Decimal
+from itertools import compress
+from typing import Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Union
+from uuid import UUID
+
+from .money import Money, MoneyAccumulator, currency_exponent
+from .order_line import OrderLine
+
+try:
+    import numpy as np
+except ImportError:  # NumPy не обязателен: без него используются массивы array
+    np = None
+
+# Для маленьких массивов накладные расходы вызова NumPy выше выигрыша
+NUMPY_MIN_SIZE = 64
+
+_INT64_LIMIT = 2 ** 63
+
+
+class LineStore(ABC):
+    """Хранилище строк заказа с инкрементально поддерживаемой итоговой суммой"""
+    
+    __slots__ = ()
+    
+    # Строки находятся в памяти (False - еще не загружены из хранилища)
+    loaded = True
+    
+    @abstractmethod
+    def __len__(self) -> int:
+        pass
+    
+    @abstractmethod
+    def __iter__(self) -> Iterator[OrderLine]:
+        pass
+    
+    @abstractmethod
+    def append(self, line: OrderLine) -> None:
+        """Добавляет строку (при ошибке хранилище не меняется)"""
+        pass
+    
+    @abstractmethod
+    def extend(self, lines: Iterable[OrderLine]) -> None:
+        """Добавляет пакет строк (все или ни одной)"""
+        pass
+    
+    @abstractmethod
+    def remove(self, product_id: UUID) -> int:
+        """Удаляет строки с product_id и возвращает их число"""
+        pass
+    
+    @abstractmethod
+    def total(self) -> Money:
+        """Возвращает накопленную итоговую сумму (O(1))"""
+        pass
+    
+    def find(self, product_id: UUID) -> Optional[OrderLine]:
+        """Возвращает первую строку товара или None"""
+        for line in self:
+            if line.product_id == product_id:
+                return line
+        return None
+    
+    def count(self, product_id: UUID) -> int:
+        """Возвращает число строк товара"""
+        return sum(1 for line in self if line.product_id == product_id)
+    
+    @abstractmethod
+    def set_quantity(self, product_id: UUID, quantity: int) -> OrderLine:
+        """
+        Меняет количество в строке товара и возвращает новую строку
+        
+        Raises:
+            KeyError: если строки товара нет
+            ValueError: если количество отрицательное или строк товара несколько
+        """
+        pass
+    
+    def recalculate_total(self) -> Money:
+        """Пересчитывает итоговую сумму полным проходом по строкам"""
+        accumulator = MoneyAccumulator()
+        for line in self:
+            accumulator.add(line.price, line.quantity)
+        return accumulator.total()
+    
+    def to_list(self) -> List[OrderLine]:
+        """Возвращает строки новым списком"""
+        return list(self)
+    
+    def line_at(self, index: int) -> OrderLine:
+        """Возвращает строку по индексу"""
+        return self.to_list()[index]
+    
+    def copy(self) -> 'LineStore':
+        """Возвращает независимую копию хранилища того же типа"""
+        return type(self)(self)
+    
+    def filter(
+        self,
+        min_price: Optional[Money] = None,
+        max_price: Optional[Money] = None,
+        min_quantity: Optional[int] = None,
+        max_quantity: Optional[int] = None
+    ) -> List[OrderLine]:
+        """Возвращает строки, цена и количество которых попадают в границы"""
+        result = []
+        for line in self:
+            if min_price is not None and _price_below(line.price, min_price):
+                continue
+            if max_price is not None and _price_below(max_price, line.price):
+                continue
+            if min_quantity is not None and line.quantity < min_quantity:
+                continue
+            if max_quantity is not None and line.quantity > max_quantity:
+                continue
+            result.append(line)
+        return result
+
+
+def _price_below(price: Money, bound: Money) -> bool:
+    if price.currency != bound.currency:
+        raise ValueError("Cannot compare money with different currencies")
+    return price.amount < bound.amount
+
+
+def _check_quantity_change(
+    line: Optional[OrderLine],
+    product_id: UUID,
+    quantity: int,
+    duplicated: bool
+) -> OrderLine:
+    """Проверяет изменение количества до изменения хранилища"""
+    if line is None:
+        raise KeyError(f"Order has no line for product {product_id}")
+    if duplicated:
+        raise ValueError(f"Order has several lines for product {product_id}")
+    if quantity < 0:
+        raise ValueError("Amount cannot be negative")
+    return line
+
+
+def _check_lines(lines: List[OrderLine], currency: Optional[str]) -> None:
+    """Проверяет валюту и количество строк до изменения хранилища"""
+    for line in lines:
+        if line.quantity < 0:
+            raise ValueError("Amount cannot be negative")
+        if currency is None:
+            currency = line.price.currency
+        elif line.price.currency != currency:
+            raise ValueError("Cannot add money with different currencies")
+
+
+class ListLineStore(LineStore):
+    """
+    Строки заказа в словаре с индексом по ID товара
+    
+    Строки хранятся в порядке добавления; первая строка товара хранится
+    под ключом product_id.int (хеширование int дешевле, чем UUID), поэтому
+    поиск, удаление и изменение количества выполняются за O(1). Повторные
+    строки того же товара (без слияния) хранятся под ключами
+    (product_id.int, номер) и перечислены в _duplicates.
+    
+    Словарь строк и накопитель суммы создаются при первом добавлении
+    строки: пустой заказ их не занимает.
+    """
+    
+    __slots__ = ('_lines', '_duplicates', '_next_key', '_ordered', '_total')
+    
+    def __init__(self, lines: Optional[Iterable[OrderLine]] = None):
+        self._lines: Optional[Dict[Hashable, OrderLine]] = None
+        # Создается при первой повторной строке товара
+        self._duplicates: Optional[Dict[int, List[tuple]]] = None
+        self._next_key = 0
+        # Список строк для доступа по индексу; сбрасывается при изменениях
+        self._ordered: Optional[List[OrderLine]] = None
+        self._total: Optional[MoneyAccumulator] = None
+        if lines:
+            self.extend(lines)
+    
+    def __len__(self) -> int:
+        lines = self._lines
+        return len(lines) if lines is not None else 0
+    
+    def __iter__(self) -> Iterator[OrderLine]:
+        lines = self._lines
+        return iter(lines.values() if lines is not None else ())
+    
+    def to_list(self) -> List[OrderLine]:
+        lines = self._lines
+        return list(lines.values()) if lines is not None else []
+    
+    def line_at(self, index: int) -> OrderLine:
+        ordered = self._ordered
+        if ordered is None:
+            ordered = self._ordered = self.to_list()
+        return ordered[index]
+    
+    def _prepare(self) -> Dict[Hashable, OrderLine]:
+        """Создает словарь и накопитель при первой строке, сбрасывает сумму пустого хранилища"""
+        lines = self._lines
+        if lines is None:
+            lines = self._lines = {}
+            self._total = MoneyAccumulator()
+        elif not lines:
+            self._total.reset()
+        return lines
+    
+    def _put(self, line: OrderLine) -> None:
+        lines = self._lines
+        count = len(lines)
+        key = line.product_id.int
+        lines.setdefault(key, line)
+        if len(lines) == count:
+            self._put_duplicate(key, line)
+    
+    def _put_duplicate(self, key: int, line: OrderLine) -> None:
+        duplicate_key = (key, self._next_key)
+        self._next_key += 1
+        self._lines[duplicate_key] = line
+        if self._duplicates is None:
+            self._duplicates = {}
+        self._duplicates.setdefault(key, []).append(duplicate_key)
+    
+    def append(self, line: OrderLine) -> None:
+        if line.quantity < 0:
+            raise ValueError("Amount cannot be negative")
+        lines = self._prepare()
+        self._total.add(line.price, line.quantity)
+        count = len(lines)
+        key = line.product_id.int
+        lines.setdefault(key, line)
+        if len(lines) == count:
+            self._put_duplicate(key, line)
+        self._ordered = None
+    
+    def extend(self, lines: Iterable[OrderLine]) -> None:
+        lines = list(lines)
+        if not lines:
+            return
+        _check_lines(lines, self._total.currency if self._lines else None)
+        self._prepare()
+        
+        for line in lines:
+            self._total.add(line.price, line.quantity)
+            self._put(line)
+        self._ordered = None
+    
+    def remove(self, product_id: UUID) -> int:
+        if not self._lines:
+            return 0
+        key = product_id.int
+        line = self._lines.pop(key, None)
+        if line is None:
+            return 0
+        removed = [line]
+        if self._duplicates:
+            for duplicate_key in self._duplicates.pop(key, ()):
+                removed.append(self._lines.pop(duplicate_key))
+        self._ordered = None
+        
+        if not self._lines:
+            self._total.reset()
+        else:
+            for line in removed:
+                self._total.subtract(line.price, line.quantity)
+        return len(removed)
+    
+    def find(self, product_id: UUID) -> Optional[OrderLine]:
+        lines = self._lines
+        return lines.get(product_id.int) if lines else None
+    
+    def count(self, product_id: UUID) -> int:
+        key = product_id.int
+        lines = self._lines
+        if not lines or key not in lines:
+            return 0
+        duplicates = self._duplicates
+        return 1 + len(duplicates.get(key, ())) if duplicates else 1
+    
+    def set_quantity(self, product_id: UUID, quantity: int) -> OrderLine:
+        key = product_id.int
+        line = _check_quantity_change(
+            self.find(product_id),
+            product_id,
+            quantity,
+            bool(self._duplicates) and key in self._duplicates
+        )
+        # Строка заменяется новым объектом: прежние строки могли сохраниться
+        # у вызывающих (например, в журнале репозитория)
+        changed = OrderLine(line.product_id, line.product_name, line.price, quantity)
+        self._total.subtract(line.price, line.quantity)
+        self._total.add(line.price, quantity)
+        self._lines[key] = changed
+        self._ordered = None
+        return changed
+    
+    def total(self) -> Money:
+        if not self._lines:
+            return Money(Decimal('0'), "USD")
+        return self._total.total()
+
+
+class ColumnarLineStore(LineStore):
+    """
+    Строки заказа в параллельных массивах
+    
+    ID товаров хранятся 16-байтными значениями в bytearray, цены — целыми
+    единицами общего масштаба в array('q'), количества — в array('q').
+    Итоги, пакетное добавление и фильтрация выполняются одним проходом
+    по массивам (через NumPy, если он установлен), без создания объектов
+    Money на каждую строку. OrderLine создаются только по запросу.
+    """
+    
+    __slots__ = (
+        '_product_ids',
+        '_names',
+        '_prices',
+        '_quantities',
+        '_currency',
+        '_scale',
+        '_total_units',
+    )
+    
+    def __init__(self, lines: Optional[Iterable[OrderLine]] = None):
+        self._product_ids = bytearray()
+        self._names: List[str] = []
+        self._prices = array('q')
+        self._quantities = array('q')
+        self._currency: Optional[str] = None
+        self._scale = 0
+        self._total_units = 0
+        if lines:
+            self.extend(lines)
+    
+    def __len__(self) -> int:
+        return len(self._names)
+    
+    def __iter__(self) -> Iterator[OrderLine]:
+        return iter(self._materialize(range(len(self._names))))
+    
+    def _materialize(self, indices: Iterable[int]) -> List[OrderLine]:
+        """Создает объекты OrderLine для строк с указанными индексами"""
+        ids = self._product_ids
+        names = self._names
+        prices = self._prices
+        quantities = self._quantities
+        scale = self._scale
+        currency = self._currency
+        from_bytes = int.from_bytes
+        make_money = Money._from_units
+        return [
+            OrderLine(
+                UUID(int=from_bytes(ids[index * 16:index * 16 + 16], 'big')),
+                names[index],
+                make_money(prices[index], scale, currency),
+                quantities[index]
+            )
+            for index in indices
+        ]
+    
+    def append(self, line: OrderLine) -> None:
+        self.extend((line,))
+    
+    def extend(self, lines: Iterable[OrderLine]) -> None:
+        lines = list(lines)
+        if not lines:
+            return
+        
+        currency = self._currency if self._names else None
+        _check_lines(lines, currency)
+        currency = currency or lines[0].price.currency
+        
+        # Общий масштаб: не меньше минимальной единицы валюты и точности цен
+        scale = self._scale if self._names else currency_exponent(currency)
+        price_units = [line.price.as_units() for line in lines]
+        scale = max(scale, max(price_scale for _, price_scale in price_units))
+        
+        prices = array('q', [units * 10 ** (scale - price_scale) for units, price_scale in price_units])
+        quantities = array('q', [line.quantity for line in lines])
+        added_units = _dot(prices, quantities)
+        
+        existing_prices = self._prices
+        total_units = self._total_units
+        if self._names and scale != self._scale:
+            factor = 10 ** (scale - self._scale)
+            existing_prices = _rescale(existing_prices, factor)
+            total_units *= factor
+        
+        self._product_ids += b''.join([line.product_id.bytes for line in lines])
+        self._names.extend([line.product_name for line in lines])
+        existing_prices.extend(prices)
+        self._prices = existing_prices
+        self._quantities.extend(quantities)
+        self._currency = currency
+        self._scale = scale
+        self._total_units = total_units + added_units
+    
+    def remove(self, product_id: UUID) -> int:
+        indices = self._find(product_id.bytes)
+        if not indices:
+            return 0
+        if len(indices) == len(self._names):
+            self._clear()
+            return len(indices)
+        
+        removed_units = sum(self._prices[i] * self._quantities[i] for i in indices)
+        keep = [True] * len(self._names)
+        for index in indices:
+            keep[index] = False
+        self._compact(keep)
+        self._total_units -= removed_units
+        return len(indices)
+    
+    def find(self, product_id: UUID) -> Optional[OrderLine]:
+        indices = self._find(product_id.bytes)
+        return self._materialize(indices[:1])[0] if indices else None
+    
+    def count(self, product_id: UUID) -> int:
+        return len(self._find(product_id.bytes))
+    
+    def set_quantity(self, product_id: UUID, quantity: int) -> OrderLine:
+        indices = self._find(product_id.bytes)
+        _check_quantity_change(
+            self.line_at(indices[0]) if indices else None,
+            product_id,
+            quantity,
+            len(indices) > 1
+        )
+        index = indices[0]
+        self._total_units += self._prices[index] * (quantity - self._quantities[index])
+        self._quantities[index] = quantity
+        return self.line_at(index)
+    
+    def _find(self, key: bytes) -> List[int]:
+        """Возвращает индексы строк с заданным ID товара"""
+        ids = self._product_ids
+        if np is not None and len(self._names) >= NUMPY_MIN_SIZE:
+            columns = np.frombuffer(ids, dtype=np.uint64).reshape(-1, 2)
+            needle = np.frombuffer(key, dtype=np.uint64)
+            mask = (columns[:, 0] == needle[0]) & (columns[:, 1] == needle[1])
+            return np.flatnonzero(mask).tolist()
+        
+        indices = []
+        position = ids.find(key)
+        while position != -1:
+            if position % 16 == 0:
+                indices.append(position // 16)
+                position = ids.find(key, position + 16)
+            else:
+                position = ids.find(key, position + 1)
+        return indices
+    
+    def _compact(self, keep: List[bool]) -> None:
+        """Оставляет только строки, отмеченные в keep"""
+        ids = self._product_ids
+        self._product_ids = bytearray().join(
+            compress((ids[i:i + 16] for i in range(0, len(ids), 16)), keep)
+        )
+        self._names = list(compress(self._names, keep))
+        self._prices = array('q', compress(self._prices, keep))
+        self._quantities = array('q', compress(self._quantities, keep))
+    
+    def _clear(self) -> None:
+        self._product_ids = bytearray()
+        self._names = []
+        self._prices = array('q')
+        self._quantities = array('q')
+        self._currency = None
+        self._scale = 0
+        self._total_units = 0
+    
+    def total(self) -> Money:
+        if not self._names:
+            return Money(Decimal('0'), "USD")
+        return Money._from_units(self._total_units, self._scale, self._currency)
+    
+    def recalculate_total(self) -> Money:
+        if not self._names:
+            return Money(Decimal('0'), "USD")
+        return Money._from_units(
+            _dot(self._prices, self._quantities), self._scale, self._currency
+        )
+    
+    def to_list(self) -> List[OrderLine]:
+        return self._materialize(range(len(self._names)))
+    
+    def line_at(self, index: int) -> OrderLine:
+        return self._materialize((range(len(self._names))[index],))[0]
+    
+    def copy(self) -> 'ColumnarLineStore':
+        # Массивы копируются целиком, без создания OrderLine
+        store = ColumnarLineStore()
+        store._product_ids = bytearray(self._product_ids)
+        store._names = self._names.copy()
+        store._prices = array('q', self._prices)
+        store._quantities = array('q', self._quantities)
+        store._currency = self._currency
+        store._scale = self._scale
+        store._total_units = self._total_units
+        return store
+    
+    def filter(
+        self,
+        min_price: Optional[Money] = None,
+        max_price: Optional[Money] = None,
+        min_quantity: Optional[int] = None,
+        max_quantity: Optional[int] = None
+    ) -> List[OrderLine]:
+        if not self._names:
+            return []
+        
+        low = self._price_bound(min_price, round_up=True)
+        high = self._price_bound(max_price, round_up=False)
+        
+        if np is not None and len(self._names) >= NUMPY_MIN_SIZE:
+            prices = np.frombuffer(self._prices, dtype=np.int64)
+            quantities = np.frombuffer(self._quantities, dtype=np.int64)
+            mask = np.ones(len(prices), dtype=bool)
+            if low is not None:
+                mask &= prices >= low
+            if high is not None:
+                mask &= prices <= high
+            if min_quantity is not None:
+                mask &= quantities >= min_quantity
+            if max_quantity is not None:
+                mask &= quantities <= max_quantity
+            indices = np.flatnonzero(mask).tolist()
+        else:
+            indices = [
+                index
+                for index, (price, quantity) in enumerate(zip(self._prices, self._quantities))
+                if (low is None or price >= low)
+                and (high is None or price <= high)
+                and (min_quantity is None or quantity >= min_quantity)
+                and (max_quantity is None or quantity <= max_quantity)
+            ]
+        return self._materialize(indices)
+    
+    def _price_bound(self, bound: Optional[Money], round_up: bool) -> Optional[int]:
+        """Переводит границу цены в целые единицы масштаба хранилища"""
+        if bound is None:
+            return None
+        if bound.currency != self._currency:
+            raise ValueError("Cannot compare money with different currencies")
+        
+        units, scale = bound.as_units()
+        if scale <= self._scale:
+            return units * 10 ** (self._scale - scale)
+        quotient, remainder = divmod(units, 10 ** (scale - self._scale))
+        return quotient + 1 if round_up and remainder else quotient
+
+
+class LazyLineStore(LineStore):
+    """
+    Строки заказа, загружаемые из хранилища при первом обращении
+    
+    До загрузки число строк и итоговая сумма берутся из сохраненного
+    заголовка заказа, поэтому проверки статуса, суммы и непустоты
+    заказа строки не читают. Любое чтение или изменение строк загружает
+    их в ListLineStore, дальше хранилище работает как он.
+    """
+    
+    __slots__ = ('_loader', '_store', '_count', '_total')
+    
+    def __init__(
+        self,
+        loader: Callable[[], Iterable[OrderLine]],
+        count: int,
+        total: Money
+    ):
+        """
+        Args:
+            loader: загружает строки заказа из хранилища
+            count: сохраненное число строк
+            total: сохраненная итоговая сумма
+        """
+        self._loader = loader
+        self._store: Optional[ListLineStore] = None
+        self._count = count
+        self._total = total
+    
+    @property
+    def loaded(self) -> bool:
+        return self._store is not None
+    
+    def _load(self) -> ListLineStore:
+        store = self._store
+        if store is None:
+            store = self._store = ListLineStore(self._loader())
+            self._loader = None
+        return store
+    
+    def __len__(self) -> int:
+        store = self._store
+        return self._count if store is None else len(store)
+    
+    def __iter__(self) -> Iterator[OrderLine]:
+        return iter(self._load())
+    
+    def append(self, line: OrderLine) -> None:
+        self._load().append(line)
+    
+    def extend(self, lines: Iterable[OrderLine]) -> None:
+        self._load().extend(lines)
+    
+    def remove(self, product_id: UUID) -> int:
+        return self._load().remove(product_id)
+    
+    def total(self) -> Money:
+        store = self._store
+        return self._total if store is None else store.total()
+    
+    def recalculate_total(self) -> Money:
+        return self._load().recalculate_total()
+    
+    def to_list(self) -> List[OrderLine]:
+        return self._load().to_list()
+    
+    def line_at(self, index: int) -> OrderLine:
+        return self._load().line_at(index)
+    
+    def find(self, product_id: UUID) -> Optional[OrderLine]:
+        return self._load().find(product_id)
+    
+    def count(self, product_id: UUID) -> int:
+        return self._load().count(product_id)
+    
+    def set_quantity(self, product_id: UUID, quantity: int) -> OrderLine:
+        return self._load().set_quantity(product_id, quantity)
+    
+    def copy(self) -> LineStore:
+        store = self._store
+        if store is None:
+            return LazyLineStore(self._loader, self._count, self._total)
+        return store.copy()
+    
+    def filter(
+        self,
+        min_price: Optional[Money] = None,
+        max_price: Optional[Money] = None,
+        min_quantity: Optional[int] = None,
+        max_quantity: Optional[int] = None
+    ) -> List[OrderLine]:
+        return self._load().filter(min_price, max_price, min_quantity, max_quantity)
+
+
+class LineView(Sequence):
+    """
+    Строки заказа только для чтения, без копирования
+    
+    Представление отражает текущее состояние хранилища: изменения заказа
+    видны через уже полученное представление.
+    """
+    
+    __slots__ = ('_store',)
+    
+    def __init__(self, store: LineStore):
+        self._store = store
+    
+    def __len__(self) -> int:
+        return len(self._store)
+    
+    def __iter__(self) -> Iterator[OrderLine]:
+        return iter(self._store)
+    
+    def __getitem__(self, index: Union[int, slice]) -> Union[OrderLine, List[OrderLine]]:
+        store = self._store
+        if isinstance(index, slice):
+            return [store.line_at(i) for i in range(len(store))[index]]
+        return store.line_at(index)
+    
+    def __repr__(self) -> str:
+        return f"LineView({list(self._store)!r})"
+
+
+def _dot(prices: array, quantities: array) -> int:
+    """Скалярное произведение цен и количеств без переполнения"""
+    if np is not None and len(prices) >= NUMPY_MIN_SIZE:
+        price_column = np.frombuffer(prices, dtype=np.int64)
+        quantity_column = np.frombuffer(quantities, dtype=np.int64)
+        bound = int(price_column.max()) * int(quantity_column.max()) * len(prices)
+        if bound < _INT64_LIMIT:
+            return int(price_column @ quantity_column)
+    return sum(map(operator.mul, prices, quantities))
+
+
+def _rescale(prices: array, factor: int) -> array:
+    """Переводит цены в более мелкий масштаб"""
+    if np is not None and len(prices) >= NUMPY_MIN_SIZE:
+        column = np.frombuffer(prices, dtype=np.int64)
+        if int(column.max()) * factor < _INT64_LIMIT:
+            return array('q', (column * factor).tobytes())
+    return array('q', [price * factor for price in prices])
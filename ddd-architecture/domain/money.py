@@ -1,23 +1,277 @@
 from decimal import Decimal
-from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+# Число знаков минимальной единицы валюты (центы, копейки и т.д.)
+CURRENCY_EXPONENTS: Dict[str, int] = {
+    "USD": 2,
+    "EUR": 2,
+    "GBP": 2,
+    "RUB": 2,
+    "CNY": 2,
+    "JPY": 0,
+    "KRW": 0,
+    "KWD": 3,
+    "BHD": 3,
+}
+DEFAULT_CURRENCY_EXPONENT = 2
+
+# Точность контекста Decimal по умолчанию: результаты, не помещающиеся
+# в неё, считаются через Decimal, чтобы сохранить его правила округления
+_MAX_UNITS = 10 ** 28
+
+_POWERS_OF_TEN = [10 ** i for i in range(32)]
+
+
+def _pow10(exponent: int) -> int:
+    if exponent < len(_POWERS_OF_TEN):
+        return _POWERS_OF_TEN[exponent]
+    return 10 ** exponent
+
+
+def currency_exponent(currency: str) -> int:
+    """Возвращает число знаков минимальной единицы валюты"""
+    return CURRENCY_EXPONENTS.get(currency, DEFAULT_CURRENCY_EXPONENT)
+
 
-@dataclass(frozen=True)
 class Money:
-    """Value Object для денежных сумм"""
-    amount: Decimal
-    currency: str = "USD"
+    """
+    Value Object для денежных сумм
+    
+    Сумма хранится точно как целое число единиц и масштаб:
+    amount == units * 10 ** -scale (масштаб совпадает с показателем
+    исходного Decimal). Поэтому сложение и умножение выполняются
+    целочисленной арифметикой, а amount и __str__ дают тот же результат,
+    что и вычисления в Decimal.
+    
+    Объект неизменяемый: amount и currency доступны только для чтения.
+    """
     
-    def __post_init__(self):
-        if self.amount < Decimal('0'):
+    __slots__ = ('_units', '_scale', '_amount', '_currency')
+    
+    def __init__(self, amount: Decimal, currency: str = "USD"):
+        if not isinstance(amount, Decimal):
+            amount = Decimal(amount if isinstance(amount, int) else str(amount))
+        if not amount.is_finite():
+            raise ValueError("Amount must be a finite number")
+        if amount < Decimal('0'):
+            raise ValueError("Amount cannot be negative")
+        
+        # Целочисленное представление вычисляется при первой арифметической
+        # операции, чтобы создание Money из Decimal оставалось дешёвым
+        self._units = None
+        self._scale = 0
+        self._amount = amount
+        self._currency = currency
+    
+    @classmethod
+    def _from_units(cls, units: int, scale: int, currency: str) -> 'Money':
+        """Быстрый конструктор без разбора Decimal и повторных проверок"""
+        money = object.__new__(cls)
+        money._units = units
+        money._scale = scale
+        money._amount = None
+        money._currency = currency
+        return money
+    
+    @classmethod
+    def from_minor_units(cls, minor_units: int, currency: str = "USD") -> 'Money':
+        """Создает сумму из минимальных единиц валюты (например, центов)"""
+        if minor_units < 0:
+            raise ValueError("Amount cannot be negative")
+        return cls._from_units(minor_units, currency_exponent(currency), currency)
+    
+    @classmethod
+    def from_units(cls, units: int, scale: int, currency: str = "USD") -> 'Money':
+        """Создает сумму units * 10 ** -scale"""
+        if units < 0:
             raise ValueError("Amount cannot be negative")
+        return cls._from_units(units, scale, currency)
+    
+    def as_units(self) -> Tuple[int, int]:
+        """Возвращает точное представление суммы (units, scale)"""
+        if self._units is None:
+            self._parse()
+        return self._units, self._scale
+    
+    def _parse(self) -> None:
+        """Раскладывает Decimal на целое число единиц и масштаб"""
+        _, digits, exponent = self._amount.as_tuple()
+        units = 0
+        for digit in digits:
+            units = units * 10 + digit
+        self._units = units
+        self._scale = -exponent
+    
+    @property
+    def amount(self) -> Decimal:
+        amount = self._amount
+        if amount is None:
+            amount = self._amount = Decimal(f"{self._units}E{-self._scale}")
+        return amount
+    
+    @property
+    def currency(self) -> str:
+        return self._currency
+    
+    @property
+    def minor_units(self) -> int:
+        """
+        Сумма в минимальных единицах валюты
+        
+        Raises:
+            ValueError: если сумма точнее минимальной единицы валюты
+        """
+        if self._units is None:
+            self._parse()
+        
+        shift = currency_exponent(self._currency) - self._scale
+        if shift >= 0:
+            return self._units * _pow10(shift)
+        
+        minor_units, remainder = divmod(self._units, _pow10(-shift))
+        if remainder:
+            raise ValueError(
+                f"Amount {self.amount} is more precise than {self._currency} minor unit"
+            )
+        return minor_units
     
     def __add__(self, other: 'Money') -> 'Money':
-        if self.currency != other.currency:
+        if self._currency != other._currency:
             raise ValueError("Cannot add money with different currencies")
-        return Money(self.amount + other.amount, self.currency)
+        if self._units is None:
+            self._parse()
+        if other._units is None:
+            other._parse()
+        
+        scale = self._scale
+        other_scale = other._scale
+        if scale == other_scale:
+            units = self._units + other._units
+        elif scale > other_scale:
+            units = self._units + other._units * _pow10(scale - other_scale)
+        else:
+            scale = other_scale
+            units = self._units * _pow10(other_scale - self._scale) + other._units
+        
+        if units >= _MAX_UNITS:
+            return Money(self.amount + other.amount, self._currency)
+        return Money._from_units(units, scale, self._currency)
     
     def __mul__(self, quantity: int) -> 'Money':
-        return Money(self.amount * quantity, self.currency)
+        if type(quantity) is not int or quantity < 0:
+            # Как и в Decimal: ноль на отрицательное количество дает -0,
+            # остальные отрицательные произведения отклоняет конструктор
+            return Money(self.amount * quantity, self._currency)
+        if self._units is None:
+            self._parse()
+        
+        units = self._units * quantity
+        if units >= _MAX_UNITS:
+            return Money(self.amount * quantity, self._currency)
+        return Money._from_units(units, self._scale, self._currency)
+    
+    def __eq__(self, other: object) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        if self._currency != other._currency:
+            return False
+        if self._units is None:
+            self._parse()
+        if other._units is None:
+            other._parse()
+        
+        scale = self._scale
+        other_scale = other._scale
+        if scale == other_scale:
+            return self._units == other._units
+        if scale > other_scale:
+            return self._units == other._units * _pow10(scale - other_scale)
+        return self._units * _pow10(other_scale - scale) == other._units
+    
+    def __hash__(self) -> int:
+        return hash((self.amount, self._currency))
+    
+    def __reduce__(self):
+        return (Money, (self.amount, self._currency))
+    
+    def __repr__(self) -> str:
+        return f"Money(amount={self.amount!r}, currency={self._currency!r})"
     
     def __str__(self) -> str:
-        return f"{self.currency} {self.amount:.2f}"
+        if self._units is not None and self._scale == 2:
+            whole, cents = divmod(self._units, 100)
+            return f"{self._currency} {whole}.{cents:02d}"
+        return f"{self._currency} {self.amount:.2f}"
+
+
+class MoneyAccumulator:
+    """
+    Изменяемый накопитель денежной суммы
+    
+    Складывает суммы в целых единицах без создания промежуточных
+    объектов Money; итог материализуется только в total().
+    """
+    
+    __slots__ = ('_units', '_scale', '_currency')
+    
+    def __init__(self, currency: Optional[str] = None):
+        """
+        Args:
+            currency: валюта накопителя; если None, берется из первой суммы
+        """
+        self._units = 0
+        self._scale: Optional[int] = None
+        self._currency = currency
+    
+    @property
+    def currency(self) -> Optional[str]:
+        return self._currency
+    
+    def add(self, money: Money, quantity: int = 1) -> None:
+        """Прибавляет money * quantity"""
+        self._apply(money, quantity)
+    
+    def subtract(self, money: Money, quantity: int = 1) -> None:
+        """Вычитает money * quantity"""
+        self._apply(money, -quantity)
+    
+    def _apply(self, money: Money, quantity: int) -> None:
+        currency = self._currency
+        if currency is None:
+            self._currency = money._currency
+        elif currency != money._currency:
+            raise ValueError("Cannot add money with different currencies")
+        
+        if money._units is None:
+            money._parse()
+        
+        scale = money._scale
+        if self._scale is None:
+            self._units = money._units * quantity
+            self._scale = scale
+        elif scale > self._scale:
+            self._units = self._units * _pow10(scale - self._scale) + money._units * quantity
+            self._scale = scale
+        else:
+            self._units += money._units * _pow10(self._scale - scale) * quantity
+    
+    def __iadd__(self, money: Money) -> 'MoneyAccumulator':
+        self._apply(money, 1)
+        return self
+    
+    def is_negative(self) -> bool:
+        return self._units < 0
+    
+    def reset(self, currency: Optional[str] = None) -> None:
+        """Обнуляет накопитель"""
+        self._units = 0
+        self._scale = None
+        self._currency = currency
+    
+    def total(self) -> Money:
+        """Возвращает накопленную сумму"""
+        if self._units < 0:
+            raise ValueError("Amount cannot be negative")
+        if self._scale is None:
+            return Money(Decimal('0'), self._currency or "USD")
+        return Money._from_units(self._units, self._scale, self._currency or "USD")
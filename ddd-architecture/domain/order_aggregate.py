@@ -1,78 +1,235 @@
-from dataclasses import dataclass, field
+import time
 from datetime import datetime
-from decimal import Decimal
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional
 from uuid import uuid4, UUID
 
+from .identity import Clock, IdProvider, uuid_from_int
 from .order_status import OrderStatus
 from .money import Money
+from .order_line import OrderLine
+from .line_store import LineStore, LineView, ListLineStore
+from .domain_events import (
+    DomainEvent,
+    LineAdded,
+    LineQuantityChanged,
+    LineRemoved,
+    OrderPaid
+)
 from .domain_exceptions import (
     EmptyOrderException, 
     OrderAlreadyPaidException, 
-    OrderModificationException
+    OrderModificationException,
+    PaymentInProgressException
 )
 
 
-@dataclass
-class OrderLine:
-    """Строка заказа (часть агрегата Order)"""
-    product_id: UUID
-    product_name: str
-    price: Money
-    quantity: int
-    
-    @property
-    def total(self) -> Money:
-        """Вычисляет общую стоимость строки"""
-        return self.price * self.quantity
-
-
 class Order:
     """Агрегат корня - Заказ"""
     
+    __slots__ = (
+        '_id',
+        '_customer_id',
+        '_lines',
+        '_status',
+        '_created_at',
+        '_updated_at',
+        '_version',
+        '_events',
+        '_merge_lines',
+        '_clock',
+    )
+    
+    # Режим отладки: при каждой проверке инвариантов итоговая сумма
+    # дополнительно пересчитывается полным проходом по строкам
+    debug_invariants: bool = False
+    
+    # Источник новых ID и часы по умолчанию, если они не переданы в конструктор
+    id_provider = staticmethod(uuid4)
+    clock = staticmethod(time.time)
+    
     def __init__(
         self, 
         order_id: Optional[UUID] = None,
         customer_id: Optional[UUID] = None,
         lines: Optional[List[OrderLine]] = None,
-        status: OrderStatus = OrderStatus.DRAFT
+        status: OrderStatus = OrderStatus.DRAFT,
+        line_store: Optional[LineStore] = None,
+        merge_lines: bool = False,
+        id_provider: Optional[IdProvider] = None,
+        clock: Optional[Clock] = None
     ):
-        self._id = order_id or uuid4()
-        self._customer_id = customer_id or uuid4()
-        self._lines = lines or []
+        """
+        Args:
+            order_id: ID заказа (по умолчанию генерируется)
+            customer_id: ID покупателя (по умолчанию генерируется)
+            lines: начальные строки заказа
+            status: начальный статус
+            line_store: хранилище строк (по умолчанию ListLineStore);
+                для очень больших заказов подходит ColumnarLineStore
+            merge_lines: add_line и add_lines увеличивают количество в уже
+                существующей строке товара вместо добавления новой строки
+            id_provider: источник ID, если order_id или customer_id не заданы,
+                например TimeOrderedIdProvider() (по умолчанию uuid4)
+            clock: часы для времени создания, изменений и событий,
+                POSIX timestamp (по умолчанию time.time)
+        """
+        if id_provider is None:
+            id_provider = self.id_provider
+        self._id = order_id or id_provider()
+        # ID покупателя хранится числом UUID.int: объект UUID создается
+        # только при чтении customer_id
+        self._customer_id = (customer_id or id_provider()).int
+        # Хранилище строк поддерживает итоговую сумму инкрементально
+        # при добавлении и удалении строк
+        self._lines: LineStore = line_store if line_store is not None else ListLineStore()
         self._status = status
-        self._created_at = datetime.now()
-        self._updated_at = datetime.now()
+        # Время хранится как POSIX timestamp (float) вместо двух datetime
+        self._clock = clock = clock if clock is not None else self.clock
+        self._created_at = clock()
+        self._updated_at = self._created_at
+        # Номер последней сохраненной версии (0 - заказ еще не сохранялся)
+        self._version = 0
+        # Несохраненные события: кортежи (тип, время, данные...), объекты
+        # событий создаются только при чтении pending_events
+        self._events: Optional[list] = None
+        self._merge_lines = merge_lines
+        
+        if lines and merge_lines:
+            # Начальные строки событий не порождают
+            self._add_merged(list(lines))
+            self._events = None
+        elif lines:
+            self._lines.extend(lines)
         
         self._validate_invariants()
     
+    @classmethod
+    def reconstitute(
+        cls,
+        order_id: UUID,
+        customer_id: UUID,
+        lines: List[OrderLine],
+        status: OrderStatus,
+        created_timestamp: float,
+        updated_timestamp: float,
+        line_store: Optional[LineStore] = None,
+        version: int = 0,
+        merge_lines: bool = False,
+        clock: Optional[Clock] = None
+    ) -> 'Order':
+        """Восстанавливает заказ из хранилища с сохраненными ID, временем и версией"""
+        order = cls(order_id, customer_id, lines, status, line_store, merge_lines, clock=clock)
+        order._created_at = created_timestamp
+        order._updated_at = updated_timestamp
+        order._version = version
+        return order
+    
+    def clone(self) -> 'Order':
+        """
+        Возвращает независимую копию заказа с тем же типом хранилища строк
+        
+        Несохраненные события в копию не переносятся.
+        """
+        return Order.reconstitute(
+            order_id=self._id,
+            customer_id=self.customer_id,
+            lines=[],
+            status=self._status,
+            created_timestamp=self._created_at,
+            updated_timestamp=self._updated_at,
+            line_store=self._lines.copy(),
+            version=self._version,
+            merge_lines=self._merge_lines,
+            clock=self._clock
+        )
+    
     @property
     def id(self) -> UUID:
         return self._id
     
     @property
     def customer_id(self) -> UUID:
+        return uuid_from_int(self._customer_id)
+    
+    @property
+    def customer_key(self) -> int:
+        """ID покупателя числом (UUID.int), без создания объекта UUID"""
         return self._customer_id
     
     @property
     def lines(self) -> List[OrderLine]:
         """Возвращает копию списка строк заказа"""
-        return self._lines.copy()
+        return self._lines.to_list()
+    
+    @property
+    def line_view(self) -> LineView:
+        """Возвращает строки заказа только для чтения, без копирования"""
+        return LineView(self._lines)
+    
+    @property
+    def lines_loaded(self) -> bool:
+        """False, если строки лениво загружаемого заказа еще не читались"""
+        return self._lines.loaded
     
     @property
     def status(self) -> OrderStatus:
         return self._status
     
+    @property
+    def version(self) -> int:
+        """Версия заказа для оптимистичной блокировки"""
+        return self._version
+    
+    def increment_version(self) -> None:
+        """Увеличивает версию после успешного сохранения (вызывается репозиторием)"""
+        self._version += 1
+    
+    @property
+    def pending_events(self) -> List[DomainEvent]:
+        """События, записанные с момента последнего сохранения"""
+        events = self._events
+        if not events:
+            return []
+        order_id = self._id
+        return [event_type(order_id, *data) for event_type, *data in events]
+    
+    def clear_events(self) -> None:
+        """Очищает записанные события (вызывается репозиторием после сохранения)"""
+        self._events = None
+    
+    def _record(self, event: tuple) -> None:
+        events = self._events
+        if events is None:
+            self._events = [event]
+        else:
+            events.append(event)
+    
+    @property
+    def created_timestamp(self) -> float:
+        """Время создания как POSIX timestamp"""
+        return self._created_at
+    
+    @property
+    def updated_timestamp(self) -> float:
+        """Время последнего изменения как POSIX timestamp"""
+        return self._updated_at
+    
+    @property
+    def created_at(self) -> datetime:
+        return datetime.fromtimestamp(self._created_at)
+    
+    @property
+    def updated_at(self) -> datetime:
+        return datetime.fromtimestamp(self._updated_at)
+    
     @property
     def total_amount(self) -> Money:
-        """Вычисляет общую сумму заказа"""
-        if not self._lines:
-            return Money(Decimal('0'), "USD")
-        
-        total = self._lines[0].total
-        for line in self._lines[1:]:
-            total = total + line.total
-        return total
+        """Возвращает общую сумму заказа (O(1))"""
+        return self._lines.total()
+    
+    def find_line(self, product_id: UUID) -> Optional[OrderLine]:
+        """Возвращает строку товара или None (O(1) для ListLineStore)"""
+        return self._lines.find(product_id)
     
     def add_line(self, line: OrderLine) -> None:
         """Добавляет строку в заказ"""
@@ -80,9 +237,108 @@ class Order:
             raise OrderModificationException(
                 "Cannot modify order after payment"
             )
+        if self._merge_lines:
+            self._add_merged([line])
+            return
         
         self._lines.append(line)
-        self._updated_at = datetime.now()
+        self._updated_at = now = self._clock()
+        self._record((
+            LineAdded, now, line.product_id, line.product_name, line.price, line.quantity
+        ))
+        self._validate_invariants()
+    
+    def add_lines(self, lines: Iterable[OrderLine]) -> None:
+        """Добавляет пакет строк в заказ одной операцией"""
+        if self._status == OrderStatus.PAID:
+            raise OrderModificationException(
+                "Cannot modify order after payment"
+            )
+        
+        lines = list(lines)
+        if self._merge_lines:
+            self._add_merged(lines)
+            return
+        
+        self._lines.extend(lines)
+        self._updated_at = now = self._clock()
+        added = [
+            (LineAdded, now, line.product_id, line.product_name, line.price, line.quantity)
+            for line in lines
+        ]
+        if self._events is None:
+            self._events = added
+        else:
+            self._events.extend(added)
+        self._validate_invariants()
+    
+    def _add_merged(self, lines: List[OrderLine]) -> None:
+        """
+        Добавляет строки, сливая строки одного товара
+        
+        Все проверки выполняются до изменения заказа.
+        
+        Raises:
+            ValueError: если количество отрицательное, цены строк товара
+                различаются или в заказе уже несколько строк товара
+        """
+        store = self._lines
+        added: Dict[UUID, OrderLine] = {}
+        increments: Dict[UUID, int] = {}
+        for line in lines:
+            if line.quantity < 0:
+                raise ValueError("Amount cannot be negative")
+            product_id = line.product_id
+            existing = added.get(product_id) or store.find(product_id)
+            if existing is None:
+                added[product_id] = line
+                continue
+            if existing.price != line.price:
+                raise ValueError(
+                    f"Cannot merge lines of product {product_id} with different prices"
+                )
+            if product_id in added:
+                added[product_id] = OrderLine(
+                    product_id, existing.product_name, existing.price,
+                    existing.quantity + line.quantity
+                )
+            else:
+                increments[product_id] = increments.get(product_id, 0) + line.quantity
+        # set_quantity отклоняет товар с несколькими строками, поэтому
+        # это проверяется до добавления новых строк
+        for product_id in increments:
+            if store.count(product_id) > 1:
+                raise ValueError(f"Order has several lines for product {product_id}")
+        
+        store.extend(added.values())
+        self._updated_at = now = self._clock()
+        for line in added.values():
+            self._record((
+                LineAdded, now, line.product_id, line.product_name, line.price, line.quantity
+            ))
+        for product_id, increment in increments.items():
+            quantity = store.find(product_id).quantity + increment
+            store.set_quantity(product_id, quantity)
+            self._record((LineQuantityChanged, now, product_id, quantity))
+        self._validate_invariants()
+    
+    def change_quantity(self, product_id: UUID, quantity: int) -> None:
+        """
+        Меняет количество в строке товара
+        
+        Raises:
+            OrderModificationException: если заказ оплачен
+            KeyError: если в заказе нет строки товара
+            ValueError: если количество отрицательное
+        """
+        if self._status == OrderStatus.PAID:
+            raise OrderModificationException(
+                "Cannot modify order after payment"
+            )
+        
+        self._lines.set_quantity(product_id, quantity)
+        self._updated_at = now = self._clock()
+        self._record((LineQuantityChanged, now, product_id, quantity))
         self._validate_invariants()
     
     def remove_line(self, product_id: UUID) -> None:
@@ -92,12 +348,30 @@ class Order:
                 "Cannot modify order after payment"
             )
         
-        self._lines = [line for line in self._lines if line.product_id != product_id]
-        self._updated_at = datetime.now()
+        self._lines.remove(product_id)
+        self._updated_at = now = self._clock()
+        self._record((LineRemoved, now, product_id))
         self._validate_invariants()
     
+    def start_payment(self) -> None:
+        """Переводит заказ в ожидание оплаты (PENDING) перед списанием"""
+        self._check_payable()
+        
+        if self._status == OrderStatus.PENDING:
+            raise PaymentInProgressException("Order payment is already in progress")
+        
+        self._status = OrderStatus.PENDING
+        self._updated_at = self._clock()
+    
     def pay(self) -> None:
         """Оплачивает заказ - доменная операция"""
+        self._check_payable()
+        
+        self._status = OrderStatus.PAID
+        self._updated_at = now = self._clock()
+        self._record((OrderPaid, now, self._lines.total()))
+    
+    def _check_payable(self) -> None:
         # Инвариант: нельзя оплатить пустой заказ
         if not self._lines:
             raise EmptyOrderException("Cannot pay empty order")
@@ -105,21 +379,30 @@ class Order:
         # Инвариант: нельзя оплатить заказ повторно
         if self._status == OrderStatus.PAID:
             raise OrderAlreadyPaidException("Order is already paid")
-        
-        self._status = OrderStatus.PAID
-        self._updated_at = datetime.now()
+    
+    def filter_lines(
+        self,
+        min_price: Optional[Money] = None,
+        max_price: Optional[Money] = None,
+        min_quantity: Optional[int] = None,
+        max_quantity: Optional[int] = None
+    ) -> List[OrderLine]:
+        """Возвращает строки, цена и количество которых попадают в границы"""
+        return self._lines.filter(min_price, max_price, min_quantity, max_quantity)
     
     def _validate_invariants(self) -> None:
-        """Проверяет инварианты агрегата"""
+        """
+        Проверяет инварианты агрегата
+        
+        Итоговая сумма поддерживается инкрементально, поэтому проверка
+        выполняется за O(1). В режиме debug_invariants сумма дополнительно
+        сверяется с полным пересчётом по строкам.
+        """
         # Инвариант: итоговая сумма равна сумме строк
-        calculated_total = self.total_amount
-        
-        if self._lines:
-            lines_sum = self._lines[0].total
-            for line in self._lines[1:]:
-                lines_sum = lines_sum + line.total
-            
-            if calculated_total.amount != lines_sum.amount:
+        if self.debug_invariants and self._lines:
+            calculated_total = self._lines.total()
+            lines_sum = self._lines.recalculate_total()
+            if calculated_total != lines_sum:
                 raise ValueError(
                     f"Total amount mismatch: {calculated_total.amount} != {lines_sum.amount}"
                 )
@@ -0,0 +1,18 @@
+from dataclasses import dataclass
+from uuid import UUID
+
+from .money import Money
+
+
+@dataclass(slots=True)
+class OrderLine:
+    """Строка заказа (часть агрегата Order)"""
+    product_id: UUID
+    product_name: str
+    price: Money
+    quantity: int
+    
+    @property
+    def total(self) -> Money:
+        """Вычисляет общую стоимость строки"""
+        return self.price * self.quantity
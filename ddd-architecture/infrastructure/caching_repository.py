@@ -0,0 +1,197 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from uuid import UUID
+
+from domain.order_aggregate import Order
+from domain.order_status import OrderStatus
+from application.interfaces import OrderRepository
+
+
+@dataclass
+class CacheStats:
+    """Счетчики кэша"""
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    
+    @property
+    def hit_ratio(self) -> float:
+        requests = self.hits + self.misses
+        return self.hits / requests if requests else 0.0
+
+
+class CachingOrderRepository(OrderRepository):
+    """
+    Декоратор репозитория с LRU-кэшем заказов
+    
+    get_by_id и get_many обслуживаются из ограниченного LRU-кэша
+    с необязательным TTL; промахи загружаются из оборачиваемого
+    репозитория. save либо записывает заказ в кэш (write-through),
+    либо сбрасывает его запись. Запросы find_* передаются
+    оборачиваемому репозиторию без кэширования.
+    
+    Кэш хранит снимки заказов и отдает каждому вызывающему отдельную
+    копию: параллельные use case не делят один объект, и проверка версии
+    при сохранении отклоняет устаревшую копию. Если сохранение завершилось
+    ошибкой (в том числе конфликтом версий), записи заказов сбрасываются.
+    """
+    
+    def __init__(
+        self,
+        repository: OrderRepository,
+        max_size: int = 10_000,
+        ttl: Optional[float] = None,
+        write_through: bool = True,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            repository: оборачиваемый репозиторий
+            max_size: максимальное число заказов в кэше
+            ttl: время жизни записи в секундах (None - без ограничения)
+            write_through: True - save обновляет кэш, False - сбрасывает запись
+            clock: источник монотонного времени (для тестов)
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be positive")
+        
+        self._repository = repository
+        self._max_size = max_size
+        self._ttl = ttl
+        self._write_through = write_through
+        self._clock = clock
+        self._entries: OrderedDict[UUID, Tuple[Order, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = CacheStats()
+        # События сохраняет обернутый репозиторий
+        self.outbox = repository.outbox
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def _lookup(self, order_id: UUID, now: float) -> Optional[Order]:
+        """Ищет заказ в кэше (вызывается под блокировкой)"""
+        entry = self._entries.get(order_id)
+        if entry is None:
+            self.stats.misses += 1
+            return None
+        
+        order, expires_at = entry
+        if expires_at <= now:
+            del self._entries[order_id]
+            self.stats.expirations += 1
+            self.stats.misses += 1
+            return None
+        
+        self._entries.move_to_end(order_id)
+        self.stats.hits += 1
+        return order.clone()
+    
+    def _put(self, order: Order, now: float) -> None:
+        """Помещает снимок заказа в кэш, вытесняя самые старые записи"""
+        expires_at = now + self._ttl if self._ttl is not None else float("inf")
+        entries = self._entries
+        entries[order.id] = (order.clone(), expires_at)
+        entries.move_to_end(order.id)
+        while len(entries) > self._max_size:
+            entries.popitem(last=False)
+            self.stats.evictions += 1
+    
+    def get_by_id(self, order_id: UUID) -> Optional[Order]:
+        with self._lock:
+            order = self._lookup(order_id, self._clock())
+        if order is not None:
+            return order
+        
+        order = self._repository.get_by_id(order_id)
+        if order is not None:
+            with self._lock:
+                self._put(order, self._clock())
+        return order
+    
+    def get_many(self, order_ids: Iterable[UUID]) -> Dict[UUID, Order]:
+        order_ids = list(dict.fromkeys(order_ids))
+        found: Dict[UUID, Order] = {}
+        missing = []
+        with self._lock:
+            now = self._clock()
+            for order_id in order_ids:
+                order = self._lookup(order_id, now)
+                if order is None:
+                    missing.append(order_id)
+                else:
+                    found[order_id] = order
+        
+        if missing:
+            loaded = self._repository.get_many(missing)
+            with self._lock:
+                now = self._clock()
+                for order in loaded.values():
+                    self._put(order, now)
+            found.update(loaded)
+        
+        return {order_id: found[order_id] for order_id in order_ids if order_id in found}
+    
+    def save(self, order: Order) -> None:
+        self.save_many([order])
+    
+    def save_many(self, orders: Iterable[Order]) -> None:
+        orders = list(orders)
+        try:
+            if len(orders) == 1:
+                self._repository.save(orders[0])
+            else:
+                self._repository.save_many(orders)
+        except Exception:
+            # Закэшированное состояние могло устареть (например, при конфликте версий)
+            for order in orders:
+                self.invalidate(order.id)
+            raise
+        self._after_save(orders)
+    
+    def _after_save(self, orders: List[Order]) -> None:
+        with self._lock:
+            now = self._clock()
+            for order in orders:
+                if self._write_through:
+                    self._put(order, now)
+                else:
+                    self._entries.pop(order.id, None)
+    
+    def restore_many(self, orders: Iterable[Order]) -> None:
+        orders = list(orders)
+        try:
+            self._repository.restore_many(orders)
+        finally:
+            for order in orders:
+                self.invalidate(order.id)
+    
+    def iter_orders(self) -> Iterator[Order]:
+        return self._repository.iter_orders()
+    
+    def invalidate(self, order_id: UUID) -> None:
+        """Удаляет заказ из кэша"""
+        with self._lock:
+            self._entries.pop(order_id, None)
+    
+    def clear(self) -> None:
+        """Очищает кэш"""
+        with self._lock:
+            self._entries.clear()
+    
+    def find_by_customer(self, customer_id: UUID) -> List[Order]:
+        return self._repository.find_by_customer(customer_id)
+    
+    def find_by_status(self, status: OrderStatus) -> List[Order]:
+        return self._repository.find_by_status(status)
+    
+    def find_created_between(self, start: datetime, end: datetime) -> List[Order]:
+        return self._repository.find_created_between(start, end)
+    
+    def find_id_range(self, start: UUID, end: UUID) -> List[Order]:
+        return self._repository.find_id_range(start, end)
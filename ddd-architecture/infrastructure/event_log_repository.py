@@ -0,0 +1,681 @@
+import itertools
+import mmap
+import os
+import struct
+import threading
+import zlib
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from uuid import UUID
+
+from domain.money import Money
+from domain.order_aggregate import Order, OrderLine
+from domain.order_status import OrderStatus
+from domain.domain_events import DomainEvent, LineAdded, LineQuantityChanged, LineRemoved
+from application.interfaces import OutboxRecord
+from .order_codec import uuid_from_bytes
+from .order_repository import InMemoryOrderRepository, unique_orders
+from .outbox import InMemoryOutbox, decode_event, encode_event
+
+
+# Типы записей журнала
+ORDER_SNAPSHOT = 1
+LINE_ADDED = 2
+LINE_REMOVED = 3
+STATUS_CHANGED = 4
+QUANTITY_CHANGED = 5
+OUTBOX_EVENT = 6
+OUTBOX_ACKNOWLEDGED = 7
+# Записи одного сохранения, объединенные в одну запись с общей контрольной
+# суммой: после сбоя пакет восстанавливается целиком или не восстанавливается
+BATCH = 8
+
+_LOG_MAGIC = b"ORDLOG02"
+_SNAPSHOT_MAGIC = b"ORDSNP02"
+
+# Заголовок файла: сигнатура и поколение (номер снимка, к которому относится журнал)
+_FILE_HEADER = struct.Struct("<8sQ")
+# Заголовок записи: длина данных, CRC32 типа и данных, тип
+_RECORD_HEADER = struct.Struct("<IIB")
+
+# Каждая запись несет версию заказа, получившуюся после сохранения
+_ORDER_HEAD = struct.Struct("<16s16sBddQI")
+_LINE_HEAD = struct.Struct("<16sqiqBI")
+_LINE_ADDED_HEAD = struct.Struct("<16sdQ")
+_LINE_REMOVED = struct.Struct("<16s16sdQ")
+_STATUS_CHANGED = struct.Struct("<16sBdQ")
+_QUANTITY_CHANGED = struct.Struct("<16s16sqdQ")
+# Событие outbox: номер, длины имени типа и JSON полей
+_OUTBOX_EVENT = struct.Struct("<QHI")
+_OUTBOX_ACKNOWLEDGED = struct.Struct("<Q")
+
+_STATUS_CODES = {
+    OrderStatus.DRAFT: 0,
+    OrderStatus.PENDING: 1,
+    OrderStatus.PAID: 2,
+    OrderStatus.CANCELLED: 3,
+}
+_STATUSES = {code: status for status, code in _STATUS_CODES.items()}
+
+
+class _OrderState:
+    """Последнее сохраненное состояние заказа (то, что записано в журнал)"""
+    
+    __slots__ = ('customer_id', 'status', 'created_at', 'updated_at', 'version', 'lines')
+    
+    def __init__(
+        self,
+        customer_id: UUID,
+        status: OrderStatus,
+        created_at: float,
+        updated_at: float,
+        version: int,
+        lines: List[OrderLine]
+    ):
+        self.customer_id = customer_id
+        self.status = status
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self.version = version
+        self.lines = lines
+    
+    @classmethod
+    def of(cls, order: Order, version: int) -> '_OrderState':
+        return cls(
+            order.customer_id,
+            order.status,
+            order.created_timestamp,
+            order.updated_timestamp,
+            version,
+            order.lines
+        )
+    
+    def to_order(self, order_id: UUID) -> Order:
+        return Order.reconstitute(
+            order_id=order_id,
+            customer_id=self.customer_id,
+            lines=self.lines,
+            status=self.status,
+            created_timestamp=self.created_at,
+            updated_timestamp=self.updated_at,
+            version=self.version
+        )
+
+
+class EventLogOutbox(InMemoryOutbox):
+    """
+    Outbox EventLogOrderRepository, сохраняемый в журнале
+    
+    События пишутся в журнал той же записью, что и изменения заказов,
+    подтверждения - отдельными записями. После перезапуска восстанавливаются
+    недоставленные события с прежними номерами.
+    """
+    
+    def __init__(self, repository: 'EventLogOrderRepository'):
+        super().__init__()
+        self._repository = repository
+    
+    @property
+    def last_sequence(self) -> int:
+        """Номер последнего добавленного события"""
+        return self._sequence
+    
+    def acknowledge(self, sequence: int) -> None:
+        self._repository._log_acknowledged(sequence)
+        super().acknowledge(sequence)
+    
+    def _restore(self, sequence: int, event: DomainEvent) -> None:
+        """Добавляет событие из журнала с его номером"""
+        with self._lock:
+            self._records.append(OutboxRecord(sequence, event))
+            self._sequence = sequence
+    
+    def _restore_acknowledged(self, sequence: int) -> None:
+        """Применяет подтверждение из журнала"""
+        super().acknowledge(sequence)
+        with self._lock:
+            self._sequence = max(self._sequence, sequence)
+
+
+class EventLogOrderRepository(InMemoryOrderRepository):
+    """
+    Репозиторий заказов на основе журнала событий
+    
+    Изменения заказа (добавление и удаление строк, смена количества
+    и статуса) дописываются в конец бинарного журнала небольшими записями
+    вместо перезаписи всего заказа; записи строятся из несохраненных
+    доменных событий заказа, без сравнения строк. При открытии состояние восстанавливается
+    чтением снимка и журнала через mmap. Периодические снимки
+    (компактизация) ограничивают время восстановления.
+    
+    Заказы и индексы хранятся в памяти, как в InMemoryOrderRepository;
+    журнал обеспечивает их сохранность между перезапусками. Записи одного
+    save_many (включая события outbox при outbox=True) дописываются
+    одной записью журнала и восстанавливаются только вместе.
+    """
+    
+    def __init__(
+        self,
+        path: str,
+        snapshot_every: int = 100_000,
+        fsync: bool = False,
+        outbox: bool = False
+    ):
+        """
+        Args:
+            path: путь к файлу журнала; снимок хранится в path + ".snapshot"
+            snapshot_every: число записей журнала, после которого делается снимок
+            fsync: вызывать fsync после каждого сохранения
+            outbox: сохранять доменные события в журнале (EventLogOutbox)
+        """
+        super().__init__(EventLogOutbox(self) if outbox else None)
+        self._log_path = path
+        self._snapshot_path = path + ".snapshot"
+        self._snapshot_every = snapshot_every
+        self._fsync = fsync
+        
+        self._saved: Dict[UUID, _OrderState] = {}
+        self._generation = 0
+        self._records_since_snapshot = 0
+        # Журнал пишут сохранения и подтверждения outbox из потока диспетчера
+        self._write_lock = threading.RLock()
+        
+        self._recover()
+        self._log = open(self._log_path, "ab")
+    
+    # Восстановление
+    
+    def _recover(self) -> None:
+        """Загружает снимок и применяет к нему журнал"""
+        snapshot_generation = 0
+        if os.path.exists(self._snapshot_path):
+            snapshot_generation, _ = _replay_file(
+                self._snapshot_path, _SNAPSHOT_MAGIC, self._saved, self.outbox
+            )
+        
+        log_generation = None
+        if os.path.exists(self._log_path):
+            log_generation = _peek_generation(self._log_path)
+            if log_generation == snapshot_generation:
+                log_generation, valid_end = _replay_file(
+                    self._log_path, _LOG_MAGIC, self._saved, self.outbox
+                )
+                # Обрезаем недописанную запись в конце журнала
+                if valid_end < os.path.getsize(self._log_path):
+                    os.truncate(self._log_path, valid_end)
+        
+        if log_generation is not None and log_generation > snapshot_generation:
+            raise ValueError(
+                f"Order log {self._log_path} is newer than its snapshot"
+            )
+        
+        # Журнал отсутствует или уже учтен в снимке: начинаем новый
+        if log_generation != snapshot_generation:
+            _write_file_atomically(self._log_path, _LOG_MAGIC, snapshot_generation, [])
+        
+        self._generation = snapshot_generation
+        for order_id, state in self._saved.items():
+            self._put(state.to_order(order_id))
+    
+    # Сохранение
+    
+    def save(self, order: Order) -> None:
+        self.save_many([order])
+    
+    def save_many(self, orders: Iterable[Order]) -> None:
+        # Повтор заказа в пакете записал бы его изменения в журнал дважды
+        orders = unique_orders(orders)
+        with self._write_lock:
+            for order in orders:
+                self._check_version(order)
+            
+            # Записи и новые состояния готовятся без изменения self._saved:
+            # состояние в памяти обновляется только после записи журнала
+            staged: List[Tuple[UUID, Optional[_OrderState], List[Tuple[int, bytes]]]] = []
+            for order in orders:
+                staged.append(self._changes(order, order.version + 1))
+            records = [
+                _record(record_type, payload)
+                for _, _, changes in staged
+                for record_type, payload in changes
+            ]
+            # События получат в outbox те же номера: добавляет в него
+            # только этот репозиторий и только под блокировкой записи
+            outbox = self.outbox
+            if outbox is not None:
+                sequence = outbox.last_sequence
+                for order in orders:
+                    for event in order.pending_events:
+                        sequence += 1
+                        records.append(
+                            _record(OUTBOX_EVENT, _encode_outbox_event(sequence, event))
+                        )
+            
+            self._append_records(records)
+            super().save_many(orders)
+            
+            saved = self._saved
+            for order_id, state, changes in staged:
+                if state is not None:
+                    saved[order_id] = state
+                    continue
+                for record_type, payload in changes:
+                    _apply(record_type, payload, 0, saved)
+            
+            if self._records_since_snapshot >= self._snapshot_every:
+                self.snapshot()
+    
+    def restore_many(self, orders: Iterable[Order]) -> None:
+        """Записывает заказы в журнал целиком с их версиями"""
+        orders = list(orders)
+        states = [(order.id, _OrderState.of(order, order.version)) for order in orders]
+        with self._write_lock:
+            self._append_records([
+                _record(ORDER_SNAPSHOT, _encode_order(order_id, state))
+                for order_id, state in states
+            ])
+            super().restore_many(orders)
+            self._saved.update(states)
+            
+            if self._records_since_snapshot >= self._snapshot_every:
+                self.snapshot()
+    
+    def _log_acknowledged(self, sequence: int) -> None:
+        """Записывает подтверждение доставки событий outbox"""
+        with self._write_lock:
+            self._append_records([
+                _record(OUTBOX_ACKNOWLEDGED, _OUTBOX_ACKNOWLEDGED.pack(sequence))
+            ])
+    
+    def _append_records(self, records: List[bytes]) -> None:
+        """Дописывает записи одной записью журнала (несколько - пакетом BATCH)"""
+        if not records:
+            return
+        data = records[0] if len(records) == 1 else _record(BATCH, b"".join(records))
+        self._append(data)
+        self._records_since_snapshot += len(records)
+    
+    def _append(self, data: bytes) -> None:
+        """Дописывает данные в журнал; при ошибке обрезает недописанное"""
+        position = self._log.tell()
+        try:
+            self._log.write(data)
+            self._log.flush()
+            if self._fsync:
+                os.fsync(self._log.fileno())
+        except BaseException:
+            try:
+                self._log.truncate(position)
+                self._log.seek(position)
+            except OSError:
+                pass
+            raise
+    
+    def _changes(
+        self, order: Order, version: int
+    ) -> Tuple[UUID, Optional[_OrderState], List[Tuple[int, bytes]]]:
+        """
+        Записи журнала, переводящие сохраненное состояние заказа в новое
+        
+        Returns:
+            (ID заказа, новое состояние для полной записи или None,
+            если изменения применяются к сохраненному состоянию записями,
+            список (тип, данные) записей)
+        """
+        order_id = order.id
+        previous = self._saved.get(order_id)
+        if previous is not None:
+            changes = self._event_changes(order, previous, version)
+            if changes is not None:
+                return order_id, None, changes
+        # Новый заказ или события не описывают изменения (например, копия
+        # заказа без событий): записываем заказ целиком
+        state = _OrderState.of(order, version)
+        return order_id, state, [(ORDER_SNAPSHOT, _encode_order(order_id, state))]
+    
+    def _event_changes(
+        self, order: Order, previous: _OrderState, version: int
+    ) -> Optional[List[Tuple[int, bytes]]]:
+        """Записи из несохраненных событий заказа или None, если их недостаточно"""
+        key = order.id.bytes
+        updated_at = order.updated_timestamp
+        changes = []
+        # Число строк после применения событий сверяется с заказом
+        line_count = len(previous.lines)
+        added: Dict[UUID, int] = {}
+        removed_previous = set()
+        for event in order.pending_events:
+            event_type = type(event)
+            if event_type is LineAdded:
+                line = OrderLine(
+                    event.product_id, event.product_name, event.price, event.quantity
+                )
+                changes.append((
+                    LINE_ADDED,
+                    _LINE_ADDED_HEAD.pack(key, updated_at, version) + _encode_line(line)
+                ))
+                added[event.product_id] = added.get(event.product_id, 0) + 1
+                line_count += 1
+            elif event_type is LineRemoved:
+                product_id = event.product_id
+                line_count -= added.pop(product_id, 0)
+                if product_id not in removed_previous:
+                    removed_previous.add(product_id)
+                    line_count -= sum(
+                        1 for line in previous.lines if line.product_id == product_id
+                    )
+                changes.append((
+                    LINE_REMOVED,
+                    _LINE_REMOVED.pack(key, product_id.bytes, updated_at, version)
+                ))
+            elif event_type is LineQuantityChanged:
+                changes.append((
+                    QUANTITY_CHANGED,
+                    _QUANTITY_CHANGED.pack(
+                        key, event.product_id.bytes, event.quantity, updated_at, version
+                    )
+                ))
+        
+        if line_count != len(order.line_view) or order.customer_id != previous.customer_id:
+            return None
+        # Каждое сохранение меняет версию, поэтому пишет хотя бы одну запись
+        if order.status != previous.status or not changes:
+            changes.append((
+                STATUS_CHANGED,
+                _STATUS_CHANGED.pack(
+                    key, _STATUS_CODES[order.status], updated_at, version
+                )
+            ))
+        return changes
+    
+    # Снимки
+    
+    def snapshot(self) -> None:
+        """
+        Записывает снимок всех заказов и недоставленных событий outbox
+        и начинает новый пустой журнал
+        """
+        with self._write_lock:
+            generation = self._generation + 1
+            _write_file_atomically(
+                self._snapshot_path,
+                _SNAPSHOT_MAGIC,
+                generation,
+                itertools.chain(
+                    (
+                        _record(ORDER_SNAPSHOT, _encode_order(order_id, state))
+                        for order_id, state in self._saved.items()
+                    ),
+                    self._outbox_snapshot()
+                )
+            )
+            
+            self._log.close()
+            _write_file_atomically(self._log_path, _LOG_MAGIC, generation, [])
+            self._log = open(self._log_path, "ab")
+            self._generation = generation
+            self._records_since_snapshot = 0
+    
+    def _outbox_snapshot(self) -> List[bytes]:
+        """Записи снимка для недоставленных событий outbox"""
+        outbox = self.outbox
+        if outbox is None:
+            return []
+        records = [
+            _record(OUTBOX_EVENT, _encode_outbox_event(record.sequence, record.event))
+            for record in outbox.fetch(0, outbox.pending_count())
+        ]
+        if not records:
+            # Все события доставлены: сохраняем только последний номер
+            records.append(_record(
+                OUTBOX_ACKNOWLEDGED, _OUTBOX_ACKNOWLEDGED.pack(outbox.last_sequence)
+            ))
+        return records
+    
+    def close(self) -> None:
+        """Закрывает файл журнала"""
+        self._log.close()
+
+
+# Кодирование записей
+
+def _record(record_type: int, payload: bytes) -> bytes:
+    checksum = zlib.crc32(payload, zlib.crc32(bytes((record_type,))))
+    return _RECORD_HEADER.pack(len(payload), checksum, record_type) + payload
+
+
+def _encode_line(line: OrderLine) -> bytes:
+    units, scale = line.price.as_units()
+    currency = line.price.currency.encode()
+    name = line.product_name.encode()
+    return (
+        _LINE_HEAD.pack(
+            line.product_id.bytes, units, scale, line.quantity, len(currency), len(name)
+        )
+        + currency
+        + name
+    )
+
+
+def _encode_order(order_id: UUID, state: _OrderState) -> bytes:
+    head = _ORDER_HEAD.pack(
+        order_id.bytes,
+        state.customer_id.bytes,
+        _STATUS_CODES[state.status],
+        state.created_at,
+        state.updated_at,
+        state.version,
+        len(state.lines)
+    )
+    return head + b"".join(_encode_line(line) for line in state.lines)
+
+
+def _shared_uuid(raw: bytes, ids: Optional[Dict[bytes, UUID]]) -> UUID:
+    """UUID из 16 байт; при восстановлении повторяющиеся ID разделяют один объект"""
+    if ids is None:
+        return uuid_from_bytes(raw)
+    value = ids.get(raw)
+    if value is None:
+        value = ids[raw] = uuid_from_bytes(raw)
+    return value
+
+
+def _encode_outbox_event(sequence: int, event: DomainEvent) -> bytes:
+    event_type, payload = encode_event(event)
+    event_type, payload = event_type.encode(), payload.encode()
+    return _OUTBOX_EVENT.pack(sequence, len(event_type), len(payload)) + event_type + payload
+
+
+def _decode_outbox_event(buffer, offset: int) -> Tuple[int, DomainEvent]:
+    sequence, type_length, payload_length = _OUTBOX_EVENT.unpack_from(buffer, offset)
+    offset += _OUTBOX_EVENT.size
+    event_type = bytes(buffer[offset:offset + type_length]).decode()
+    offset += type_length
+    payload = bytes(buffer[offset:offset + payload_length]).decode()
+    return sequence, decode_event(event_type, payload)
+
+
+def _decode_line(
+    buffer, offset: int, ids: Optional[Dict[bytes, UUID]] = None
+) -> Tuple[OrderLine, int]:
+    product_id, units, scale, quantity, currency_length, name_length = (
+        _LINE_HEAD.unpack_from(buffer, offset)
+    )
+    offset += _LINE_HEAD.size
+    currency = bytes(buffer[offset:offset + currency_length]).decode()
+    offset += currency_length
+    name = bytes(buffer[offset:offset + name_length]).decode()
+    offset += name_length
+    line = OrderLine(
+        product_id=_shared_uuid(product_id, ids),
+        product_name=name,
+        price=Money.from_units(units, scale, currency),
+        quantity=quantity
+    )
+    return line, offset
+
+
+def _decode_order(
+    buffer, offset: int, ids: Optional[Dict[bytes, UUID]] = None
+) -> Tuple[UUID, _OrderState]:
+    order_id, customer_id, status, created_at, updated_at, version, line_count = (
+        _ORDER_HEAD.unpack_from(buffer, offset)
+    )
+    offset += _ORDER_HEAD.size
+    lines = []
+    for _ in range(line_count):
+        line, offset = _decode_line(buffer, offset, ids)
+        lines.append(line)
+    state = _OrderState(
+        _shared_uuid(customer_id, ids), _STATUSES[status], created_at, updated_at, version, lines
+    )
+    return uuid_from_bytes(order_id), state
+
+
+def _apply(
+    record_type: int,
+    buffer,
+    offset: int,
+    states: Dict[UUID, _OrderState],
+    ids: Optional[Dict[bytes, UUID]] = None
+) -> None:
+    """
+    Применяет запись журнала к состояниям заказов
+    
+    ids - общие объекты ID покупателей и товаров на время восстановления.
+    """
+    if record_type == ORDER_SNAPSHOT:
+        order_id, state = _decode_order(buffer, offset, ids)
+        states[order_id] = state
+    elif record_type == LINE_ADDED:
+        key, updated_at, version = _LINE_ADDED_HEAD.unpack_from(buffer, offset)
+        line, _ = _decode_line(buffer, offset + _LINE_ADDED_HEAD.size, ids)
+        state = states[uuid_from_bytes(key)]
+        state.lines.append(line)
+        state.updated_at = updated_at
+        state.version = version
+    elif record_type == LINE_REMOVED:
+        key, product_key, updated_at, version = _LINE_REMOVED.unpack_from(buffer, offset)
+        product_id = uuid_from_bytes(product_key)
+        state = states[uuid_from_bytes(key)]
+        state.lines = [line for line in state.lines if line.product_id != product_id]
+        state.updated_at = updated_at
+        state.version = version
+    elif record_type == QUANTITY_CHANGED:
+        key, product_key, quantity, updated_at, version = (
+            _QUANTITY_CHANGED.unpack_from(buffer, offset)
+        )
+        product_id = uuid_from_bytes(product_key)
+        state = states[uuid_from_bytes(key)]
+        state.lines = [
+            OrderLine(line.product_id, line.product_name, line.price, quantity)
+            if line.product_id == product_id else line
+            for line in state.lines
+        ]
+        state.updated_at = updated_at
+        state.version = version
+    elif record_type == STATUS_CHANGED:
+        key, status, updated_at, version = _STATUS_CHANGED.unpack_from(buffer, offset)
+        state = states[uuid_from_bytes(key)]
+        state.status = _STATUSES[status]
+        state.updated_at = updated_at
+        state.version = version
+    else:
+        raise ValueError(f"Unknown order log record type: {record_type}")
+
+
+# Работа с файлами
+
+def _peek_generation(path: str) -> Optional[int]:
+    """Читает поколение из заголовка файла журнала"""
+    with open(path, "rb") as file:
+        header = file.read(_FILE_HEADER.size)
+    if len(header) < _FILE_HEADER.size:
+        return None
+    magic, generation = _FILE_HEADER.unpack(header)
+    if magic != _LOG_MAGIC:
+        raise ValueError(f"{path} is not an order log")
+    return generation
+
+
+def _replay_file(
+    path: str,
+    magic: bytes,
+    states: Dict[UUID, _OrderState],
+    outbox: Optional[EventLogOutbox] = None
+) -> Tuple[Optional[int], int]:
+    """
+    Применяет записи файла к состояниям, читая его через mmap
+    
+    Returns:
+        (поколение файла, смещение конца последней целой записи)
+    """
+    with open(path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        if size < _FILE_HEADER.size:
+            return None, 0
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            file_magic, generation = _FILE_HEADER.unpack_from(mapped, 0)
+            if file_magic != magic:
+                raise ValueError(f"{path} has unexpected format")
+            
+            offset = _FILE_HEADER.size
+            ids: Dict[bytes, UUID] = {}
+            for record_type, payload_offset, end in _iter_records(mapped, offset, size):
+                if record_type == BATCH:
+                    for inner_type, inner_offset, _ in _iter_records(
+                        mapped, payload_offset, end
+                    ):
+                        _replay(inner_type, mapped, inner_offset, states, ids, outbox)
+                else:
+                    _replay(record_type, mapped, payload_offset, states, ids, outbox)
+                offset = end
+    return generation, offset
+
+
+def _replay(
+    record_type: int,
+    buffer,
+    offset: int,
+    states: Dict[UUID, _OrderState],
+    ids: Dict[bytes, UUID],
+    outbox: Optional[EventLogOutbox]
+) -> None:
+    """Применяет запись файла к состояниям заказов или к outbox"""
+    if record_type == OUTBOX_EVENT:
+        # Репозиторий без outbox пропускает события
+        if outbox is not None:
+            outbox._restore(*_decode_outbox_event(buffer, offset))
+    elif record_type == OUTBOX_ACKNOWLEDGED:
+        if outbox is not None:
+            outbox._restore_acknowledged(_OUTBOX_ACKNOWLEDGED.unpack_from(buffer, offset)[0])
+    else:
+        _apply(record_type, buffer, offset, states, ids)
+
+
+def _iter_records(buffer, offset: int, size: int) -> Iterator[Tuple[int, int, int]]:
+    """Перебирает целые записи с корректной контрольной суммой"""
+    while offset + _RECORD_HEADER.size <= size:
+        length, checksum, record_type = _RECORD_HEADER.unpack_from(buffer, offset)
+        payload_offset = offset + _RECORD_HEADER.size
+        end = payload_offset + length
+        if end > size:
+            return
+        actual = zlib.crc32(buffer[payload_offset:end], zlib.crc32(bytes((record_type,))))
+        if actual != checksum:
+            return
+        yield record_type, payload_offset, end
+        offset = end
+
+
+def _write_file_atomically(
+    path: str, magic: bytes, generation: int, records: Iterable[bytes]
+) -> None:
+    """Записывает файл во временный и атомарно заменяет им path"""
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "wb") as file:
+        file.write(_FILE_HEADER.pack(magic, generation))
+        for record in records:
+            file.write(record)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary_path, path)
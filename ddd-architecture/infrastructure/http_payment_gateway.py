@@ -0,0 +1,114 @@
+import http.client
+import json
+import threading
+from typing import List, Optional
+from urllib.parse import urlsplit
+from uuid import UUID
+
+from domain.money import Money
+from application.interfaces import PaymentGateway, PaymentGatewayError, PaymentResult
+
+
+class HttpPaymentGateway(PaymentGateway):
+    """
+    Платежный шлюз, работающий по HTTP с JSON
+    
+    charge отправляет POST {base_url}/charges с телом
+    {"order_id", "amount", "currency"} и заголовком Idempotency-Key,
+    равным ID заказа, поэтому повтор запроса не приводит к повторному
+    списанию. Ожидаемый ответ: {"success", "transaction_id", "message"}.
+    Ответы 5xx и сетевые ошибки поднимают PaymentGatewayError, ответы
+    4xx считаются отказом в платеже.
+    
+    Каждый поток использует собственное постоянное соединение (keep-alive).
+    """
+    
+    def __init__(self, base_url: str, timeout: float = 5.0):
+        """
+        Args:
+            base_url: адрес шлюза, например http://localhost:8080
+            timeout: таймаут сокета в секундах
+        """
+        parts = urlsplit(base_url)
+        if parts.scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported payment gateway URL: {base_url}")
+        
+        self._scheme = parts.scheme
+        self._host = parts.hostname
+        self._port = parts.port
+        self._path = parts.path.rstrip("/") + "/charges"
+        self._timeout = timeout
+        self._local = threading.local()
+        self._connections: List[http.client.HTTPConnection] = []
+        self._connections_lock = threading.Lock()
+    
+    def _connection(self) -> http.client.HTTPConnection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection_class = (
+                http.client.HTTPSConnection if self._scheme == "https"
+                else http.client.HTTPConnection
+            )
+            connection = connection_class(self._host, self._port, timeout=self._timeout)
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+    
+    def _reset_connection(self) -> None:
+        connection: Optional[http.client.HTTPConnection] = getattr(
+            self._local, "connection", None
+        )
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+            with self._connections_lock:
+                self._connections.remove(connection)
+    
+    def charge(self, order_id: UUID, amount: Money) -> PaymentResult:
+        body = json.dumps({
+            "order_id": str(order_id),
+            "amount": str(amount.amount),
+            "currency": amount.currency,
+        }).encode()
+        headers = {
+            "Content-Type": "application/json",
+            "Idempotency-Key": str(order_id),
+        }
+        
+        try:
+            connection = self._connection()
+            connection.request("POST", self._path, body=body, headers=headers)
+            response = connection.getresponse()
+            payload = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            self._reset_connection()
+            raise PaymentGatewayError(f"Payment gateway request failed: {e}") from e
+        
+        if response.status >= 500:
+            raise PaymentGatewayError(f"Payment gateway responded with {response.status}")
+        
+        try:
+            data = json.loads(payload) if payload else {}
+        except ValueError as e:
+            raise PaymentGatewayError("Payment gateway returned invalid JSON") from e
+        
+        if response.status >= 400:
+            return PaymentResult(
+                success=False,
+                transaction_id="",
+                message=data.get("message", f"Payment rejected with {response.status}")
+            )
+        return PaymentResult(
+            success=bool(data.get("success")),
+            transaction_id=data.get("transaction_id", ""),
+            message=data.get("message", "")
+        )
+    
+    def close(self) -> None:
+        """Закрывает соединения всех потоков"""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+        self._local = threading.local()
@@ -0,0 +1,78 @@
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+from uuid import UUID
+
+from domain.order_aggregate import Order
+from domain.order_status import OrderStatus
+from application.interfaces import OrderRepository
+
+# Подписчик получает заказы после успешного сохранения
+SaveListener = Callable[[List[Order]], None]
+
+
+class ObservableOrderRepository(OrderRepository):
+    """
+    Декоратор репозитория, уведомляющий подписчиков о сохранениях
+    
+    Подписчики вызываются после того, как обернутый репозиторий
+    сохранил заказы (например, RevenueReport.on_saved). Ошибка подписчика
+    не отменяет уже выполненное сохранение: она учитывается в
+    listener_failures, а состояние подписчика следует перестроить.
+    """
+    
+    def __init__(self, repository: OrderRepository, listeners: Iterable[SaveListener] = ()):
+        """
+        Args:
+            repository: обернутый репозиторий
+            listeners: подписчики на сохранения
+        """
+        self._repository = repository
+        self._listeners: List[SaveListener] = list(listeners)
+        self.outbox = repository.outbox
+        self.listener_failures = 0
+    
+    def subscribe(self, listener: SaveListener) -> None:
+        """Добавляет подписчика на сохранения"""
+        self._listeners.append(listener)
+    
+    def get_by_id(self, order_id: UUID) -> Optional[Order]:
+        return self._repository.get_by_id(order_id)
+    
+    def get_many(self, order_ids: Iterable[UUID]) -> Dict[UUID, Order]:
+        return self._repository.get_many(order_ids)
+    
+    def save(self, order: Order) -> None:
+        self._repository.save(order)
+        self._notify([order])
+    
+    def save_many(self, orders: Iterable[Order]) -> None:
+        orders = list(orders)
+        self._repository.save_many(orders)
+        self._notify(orders)
+    
+    def restore_many(self, orders: Iterable[Order]) -> None:
+        orders = list(orders)
+        self._repository.restore_many(orders)
+        self._notify(orders)
+    
+    def iter_orders(self) -> Iterator[Order]:
+        return self._repository.iter_orders()
+    
+    def _notify(self, orders: List[Order]) -> None:
+        for listener in self._listeners:
+            try:
+                listener(orders)
+            except Exception:
+                self.listener_failures += 1
+    
+    def find_by_customer(self, customer_id: UUID) -> List[Order]:
+        return self._repository.find_by_customer(customer_id)
+    
+    def find_by_status(self, status: OrderStatus) -> List[Order]:
+        return self._repository.find_by_status(status)
+    
+    def find_created_between(self, start: datetime, end: datetime) -> List[Order]:
+        return self._repository.find_created_between(start, end)
+    
+    def find_id_range(self, start: UUID, end: UUID) -> List[Order]:
+        return self._repository.find_id_range(start, end)
@@ -0,0 +1,244 @@
+"""
+Компактный бинарный формат заказов
+
+Поток: заголовок (сигнатура, версия формата, число заказов) и записи
+заказов. Запись начинается с длины, поэтому записи можно пропускать
+без разбора. UUID хранятся как 16 байт, цены - целыми единицами
+с масштабом (для цен в минимальных единицах масштаб равен показателю
+валюты), статус - кодом. Валюта одна на заказ (инвариант агрегата).
+"""
+import struct
+from typing import Iterable, Iterator, List, Optional
+from uuid import SafeUUID, UUID
+
+from domain.money import Money
+from domain.order_aggregate import Order, OrderLine
+from domain.order_status import OrderStatus
+from application.interfaces import OrderRepository
+from .order_repository import InMemoryOrderRepository
+
+CODEC_MAGIC = b"ORDC"
+CODEC_VERSION = 1
+
+# Заголовок потока: сигнатура, версия, число заказов
+_STREAM_HEAD = struct.Struct("<4sBI")
+# Запись заказа: длина записи без этого поля, ID, покупатель, статус,
+# время создания и изменения, версия, число строк, длина кода валюты
+_ORDER_HEAD = struct.Struct("<I16s16sBddQIB")
+# Строка: товар, единицы цены, масштаб, количество, длина названия
+_LINE_HEAD = struct.Struct("<16sqbqH")
+
+_INT64_MIN = -2 ** 63
+_INT64_MAX = 2 ** 63 - 1
+
+_STATUS_CODES = {
+    OrderStatus.DRAFT: 0,
+    OrderStatus.PENDING: 1,
+    OrderStatus.PAID: 2,
+    OrderStatus.CANCELLED: 3,
+}
+_STATUSES = {code: status for status, code in _STATUS_CODES.items()}
+
+_new_object = object.__new__
+_set_attribute = object.__setattr__
+
+
+def uuid_from_bytes(raw: bytes) -> UUID:
+    """UUID из 16 байт без проверок UUID.__init__ (в 2-3 раза быстрее)"""
+    value = _new_object(UUID)
+    _set_attribute(value, 'int', int.from_bytes(raw, 'big'))
+    _set_attribute(value, 'is_safe', SafeUUID.unknown)
+    return value
+
+
+class EncodedOrder:
+    """
+    Ленивое представление закодированного заказа
+    
+    Поля заголовка читаются прямо из буфера; строки разбираются
+    только при вызове decode().
+    """
+    
+    __slots__ = ('_buffer', '_offset', '_head')
+    
+    def __init__(self, buffer: memoryview, offset: int):
+        self._buffer = buffer
+        self._offset = offset
+        self._head = _ORDER_HEAD.unpack_from(buffer, offset)
+    
+    @property
+    def size(self) -> int:
+        """Размер записи в байтах"""
+        return 4 + self._head[0]
+    
+    @property
+    def id(self) -> UUID:
+        return uuid_from_bytes(self._head[1])
+    
+    @property
+    def customer_id(self) -> UUID:
+        return uuid_from_bytes(self._head[2])
+    
+    @property
+    def status(self) -> OrderStatus:
+        return _STATUSES[self._head[3]]
+    
+    @property
+    def version(self) -> int:
+        return self._head[6]
+    
+    @property
+    def line_count(self) -> int:
+        return self._head[7]
+    
+    def decode(self) -> Order:
+        """Материализует заказ со всеми строками"""
+        _, order_id, customer_id, status, created_at, updated_at, version, count, length = (
+            self._head
+        )
+        buffer = self._buffer
+        offset = self._offset + _ORDER_HEAD.size
+        currency = str(buffer[offset:offset + length], "ascii")
+        offset += length
+        
+        lines: List[OrderLine] = []
+        unpack_line = _LINE_HEAD.unpack_from
+        line_head_size = _LINE_HEAD.size
+        from_units = Money._from_units
+        for _ in range(count):
+            product_id, units, scale, quantity, name_length = unpack_line(buffer, offset)
+            offset += line_head_size
+            name = str(buffer[offset:offset + name_length], "utf-8")
+            offset += name_length
+            lines.append(OrderLine(
+                product_id=uuid_from_bytes(product_id),
+                product_name=name,
+                price=from_units(units, scale, currency),
+                quantity=quantity
+            ))
+        
+        return Order.reconstitute(
+            order_id=uuid_from_bytes(order_id),
+            customer_id=uuid_from_bytes(customer_id),
+            lines=lines,
+            status=_STATUSES[status],
+            created_timestamp=created_at,
+            updated_timestamp=updated_at,
+            version=version
+        )
+
+
+def encode_order(order: Order, buffer: Optional[bytearray] = None) -> bytearray:
+    """
+    Дописывает запись заказа в буфер
+    
+    Размер записи вычисляется заранее, буфер увеличивается один раз,
+    а поля пишутся в него на месте через pack_into.
+    
+    Raises:
+        ValueError: если цена не помещается в 64-битное целое или
+            название товара длиннее 65535 байт
+    """
+    if buffer is None:
+        buffer = bytearray()
+    
+    lines = order.line_view
+    currency = (lines[0].price.currency if lines else "USD").encode("ascii")
+    encoded_lines = []
+    size = _ORDER_HEAD.size + len(currency)
+    for line in lines:
+        units, scale = line.price.as_units()
+        if not _INT64_MIN <= units <= _INT64_MAX or not -128 <= scale <= 127:
+            raise ValueError(f"Price {line.price.amount} does not fit the order codec")
+        name = line.product_name.encode("utf-8")
+        if len(name) > 0xFFFF:
+            raise ValueError("Product name is too long for the order codec")
+        encoded_lines.append((line.product_id.bytes, units, scale, line.quantity, name))
+        size += _LINE_HEAD.size + len(name)
+    
+    offset = len(buffer)
+    buffer.extend(bytes(size))
+    _ORDER_HEAD.pack_into(
+        buffer, offset,
+        size - 4,
+        order.id.bytes,
+        order.customer_id.bytes,
+        _STATUS_CODES[order.status],
+        order.created_timestamp,
+        order.updated_timestamp,
+        order.version,
+        len(lines),
+        len(currency)
+    )
+    offset += _ORDER_HEAD.size
+    buffer[offset:offset + len(currency)] = currency
+    offset += len(currency)
+    
+    pack_line = _LINE_HEAD.pack_into
+    line_head_size = _LINE_HEAD.size
+    for product_id, units, scale, quantity, name in encoded_lines:
+        pack_line(buffer, offset, product_id, units, scale, quantity, len(name))
+        offset += line_head_size
+        buffer[offset:offset + len(name)] = name
+        offset += len(name)
+    return buffer
+
+
+def encode_orders(orders: Iterable[Order]) -> bytearray:
+    """Кодирует заказы в поток с заголовком"""
+    buffer = bytearray(_STREAM_HEAD.size)
+    count = 0
+    for order in orders:
+        encode_order(order, buffer)
+        count += 1
+    _STREAM_HEAD.pack_into(buffer, 0, CODEC_MAGIC, CODEC_VERSION, count)
+    return buffer
+
+
+def iter_encoded(data) -> Iterator[EncodedOrder]:
+    """
+    Перебирает записи потока без разбора строк заказов
+    
+    Args:
+        data: bytes, bytearray, memoryview или mmap с потоком
+    """
+    buffer = memoryview(data)
+    magic, version, count = _STREAM_HEAD.unpack_from(buffer, 0)
+    if magic != CODEC_MAGIC:
+        raise ValueError("Data is not an encoded order stream")
+    if version != CODEC_VERSION:
+        raise ValueError(f"Unsupported order codec version: {version}")
+    
+    offset = _STREAM_HEAD.size
+    for _ in range(count):
+        encoded = EncodedOrder(buffer, offset)
+        yield encoded
+        offset += encoded.size
+
+
+def decode_orders(data) -> Iterator[Order]:
+    """Декодирует заказы потока по одному"""
+    for encoded in iter_encoded(data):
+        yield encoded.decode()
+
+
+def snapshot_repository(repository: OrderRepository) -> bytearray:
+    """Кодирует все заказы репозитория"""
+    return encode_orders(repository.iter_orders())
+
+
+def restore_repository(
+    data, repository: Optional[OrderRepository] = None
+) -> OrderRepository:
+    """
+    Загружает заказы из снимка в репозиторий, сохраняя их версии
+    
+    Args:
+        data: снимок, созданный snapshot_repository
+        repository: репозиторий для загрузки (по умолчанию новый
+            InMemoryOrderRepository)
+    """
+    if repository is None:
+        repository = InMemoryOrderRepository()
+    repository.restore_many(decode_orders(data))
+    return repository
@@ -0,0 +1,345 @@
+import csv
+import json
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from uuid import UUID
+
+from domain.money import Money
+from domain.order_aggregate import Order, OrderLine
+from domain.order_status import OrderStatus
+from domain.domain_exceptions import ConcurrencyConflictException
+from application.interfaces import OrderRepository
+
+_STATUSES = {status.value: status for status in OrderStatus}
+
+# Предел кэша разобранных цен (число различных пар цена/валюта)
+_PRICE_CACHE_SIZE = 10_000
+
+
+@dataclass
+class RowError:
+    """Ошибка импорта, привязанная к строке входного файла"""
+    row: int
+    order_id: Optional[str]
+    message: str
+
+
+@dataclass
+class ImportCheckpoint:
+    """
+    Позиция, с которой можно продолжить импорт
+    
+    offset - смещение в байтах начала первого несохраненного заказа,
+    row - число уже обработанных записей (без заголовка CSV).
+    """
+    offset: int = 0
+    row: int = 0
+
+
+@dataclass
+class ImportReport:
+    """Итоги импорта"""
+    orders: int = 0
+    lines: int = 0
+    rejected_orders: int = 0
+    # Заказы, сохраненные до сбоя, но после последней контрольной точки
+    already_imported: int = 0
+    error_count: int = 0
+    errors: List[RowError] = field(default_factory=list)
+    checkpoint: ImportCheckpoint = field(default_factory=ImportCheckpoint)
+
+
+class _Group:
+    """Записи одного заказа, идущие в файле подряд"""
+    
+    __slots__ = (
+        'order_id', 'customer_key', 'customer_id', 'status', 'lines',
+        'first_row', 'last_row', 'end', 'errors'
+    )
+    
+    def __init__(self, order_id: Optional[str], first_row: int):
+        self.order_id = order_id
+        # Исходная строка customer_id: UUID разбирается один раз на заказ
+        self.customer_key: Optional[str] = None
+        self.customer_id: Optional[UUID] = None
+        self.status = OrderStatus.DRAFT
+        self.lines: List[OrderLine] = []
+        self.first_row = first_row
+        self.last_row = first_row
+        # Смещение конца последней записи группы
+        self.end = 0
+        self.errors: List[RowError] = []
+
+
+class OrderImporter:
+    """
+    Потоковый импорт заказов из CSV или JSONL
+    
+    Файл читается построчно за постоянную память. Записи одного заказа
+    должны идти подряд: они собираются в Order (инварианты проверяются
+    агрегатом) и сохраняются пакетами через save_many. Ошибки
+    сообщаются по номерам записей; заказ с ошибкой не сохраняется.
+    После каждого сохраненного пакета обновляется контрольная точка,
+    с которой импорт можно продолжить после сбоя. Сбой между сохранением
+    пакета и контрольной точкой повторяет пакет при возобновлении: заказы,
+    которые уже есть в репозитории, считаются импортированными.
+    
+    Каждая запись - строка заказа с полями order_id, customer_id,
+    product_id, product_name, price, quantity и необязательными status
+    и currency. В JSONL запись может также описывать весь заказ
+    с массивом lines.
+    """
+    
+    def __init__(
+        self,
+        repository: OrderRepository,
+        batch_size: int = 1000,
+        max_errors: int = 1000,
+        on_checkpoint: Optional[Callable[[ImportCheckpoint], None]] = None
+    ):
+        """
+        Args:
+            repository: репозиторий, в который сохраняются заказы
+            batch_size: число заказов в одном вызове save_many
+            max_errors: сколько ошибок хранить в отчете (счет ведется по всем)
+            on_checkpoint: вызывается после каждого сохраненного пакета
+        """
+        self._repository = repository
+        self._batch_size = batch_size
+        self._max_errors = max_errors
+        self._on_checkpoint = on_checkpoint
+    
+    def import_file(
+        self,
+        path: str,
+        file_format: Optional[str] = None,
+        resume_from: Optional[ImportCheckpoint] = None
+    ) -> ImportReport:
+        """
+        Импортирует заказы из файла
+        
+        Args:
+            path: путь к файлу
+            file_format: "csv" или "jsonl" (по умолчанию - по расширению)
+            resume_from: контрольная точка прерванного импорта
+        
+        Returns:
+            ImportReport: итоги импорта с последней контрольной точкой
+        """
+        if file_format is None:
+            file_format = "jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv"
+        if file_format not in ("csv", "jsonl"):
+            raise ValueError(f"Unsupported import format: {file_format}")
+        
+        checkpoint = resume_from or ImportCheckpoint()
+        report = ImportReport(checkpoint=ImportCheckpoint(checkpoint.offset, checkpoint.row))
+        
+        with open(path, "rb") as file:
+            if file_format == "csv":
+                records = _read_csv(file, checkpoint)
+            else:
+                records = _read_jsonl(file, checkpoint)
+            
+            batch: List[Tuple[Order, _Group]] = []
+            group = None
+            for group in _group_records(records):
+                order = self._build(group, report)
+                if order is not None:
+                    batch.append((order, group))
+                if len(batch) >= self._batch_size:
+                    self._flush(batch, report, group, resume_from is not None)
+                    batch = []
+                elif order is None and not batch:
+                    # Отклоненный заказ можно пропустить при возобновлении
+                    self._advance(report, group)
+            
+            if batch:
+                self._flush(batch, report, group, resume_from is not None)
+        return report
+    
+    def _build(self, group: _Group, report: ImportReport) -> Optional[Order]:
+        """Собирает заказ из записей группы или регистрирует ошибки"""
+        if not group.errors:
+            try:
+                return Order(
+                    order_id=UUID(str(group.order_id)),
+                    customer_id=group.customer_id,
+                    lines=group.lines,
+                    status=group.status
+                )
+            except ValueError as e:
+                group.errors.append(RowError(group.first_row, group.order_id, str(e)))
+        
+        report.rejected_orders += 1
+        for error in group.errors:
+            self._error(report, error)
+        return None
+    
+    def _flush(
+        self,
+        batch: List[Tuple[Order, _Group]],
+        report: ImportReport,
+        last: _Group,
+        resuming: bool
+    ) -> None:
+        """
+        Сохраняет пакет; при ошибке пакета сохраняет заказы по одному
+        
+        При возобновлении конфликт версий с уже сохраненным заказом
+        означает, что заказ записан до сбоя, и ошибкой не считается.
+        """
+        try:
+            self._repository.save_many(order for order, _ in batch)
+            saved = batch
+        except Exception:
+            saved = []
+            for order, group in batch:
+                try:
+                    self._repository.save(order)
+                except ConcurrencyConflictException as e:
+                    if resuming and self._repository.get_by_id(order.id) is not None:
+                        report.already_imported += 1
+                        continue
+                    report.rejected_orders += 1
+                    self._error(report, RowError(group.first_row, group.order_id, str(e)))
+                    continue
+                except Exception as e:
+                    report.rejected_orders += 1
+                    self._error(report, RowError(group.first_row, group.order_id, str(e)))
+                    continue
+                saved.append((order, group))
+        
+        report.orders += len(saved)
+        report.lines += sum(len(group.lines) for _, group in saved)
+        self._advance(report, last)
+    
+    def _advance(self, report: ImportReport, last: _Group) -> None:
+        """Переносит контрольную точку за последнюю обработанную группу"""
+        report.checkpoint = ImportCheckpoint(last.end, last.last_row)
+        if self._on_checkpoint is not None:
+            self._on_checkpoint(report.checkpoint)
+    
+    def _error(self, report: ImportReport, error: RowError) -> None:
+        report.error_count += 1
+        if len(report.errors) < self._max_errors:
+            report.errors.append(error)
+
+
+# Чтение записей: (номер записи, смещение конца записи, словарь полей)
+
+Record = Tuple[int, int, dict]
+
+
+def _read_jsonl(file, checkpoint: ImportCheckpoint) -> Iterator[Record]:
+    file.seek(checkpoint.offset)
+    offset = checkpoint.offset
+    row = checkpoint.row
+    for raw in iter(file.readline, b""):
+        offset += len(raw)
+        if not raw.strip():
+            continue
+        row += 1
+        try:
+            record = json.loads(raw)
+        except ValueError as e:
+            yield row, offset, {"_error": f"Invalid JSON: {e}"}
+            continue
+        
+        lines = record.pop("lines", None) if isinstance(record, dict) else None
+        if lines is None:
+            yield row, offset, record
+            continue
+        if not lines or not isinstance(lines, list) or not all(
+            isinstance(line, dict) for line in lines
+        ):
+            yield row, offset, {
+                **record, "_error": "Field 'lines' must be a non-empty array of objects"
+            }
+            continue
+        # Запись заказа с массивом строк раскладывается на записи строк
+        for index, line in enumerate(lines):
+            yield row, offset if index == len(lines) - 1 else -1, {**record, **line}
+
+
+def _read_csv(file, checkpoint: ImportCheckpoint) -> Iterator[Record]:
+    header_line = file.readline()
+    header = next(csv.reader([header_line.decode("utf-8-sig")]))
+    if checkpoint.offset:
+        file.seek(checkpoint.offset)
+    offset = file.tell()
+    consumed = [offset]
+    
+    def lines() -> Iterator[str]:
+        # Считаем байты, чтобы знать смещение конца каждой записи
+        for raw in iter(file.readline, b""):
+            consumed[0] += len(raw)
+            yield raw.decode("utf-8")
+    
+    row = checkpoint.row
+    for values in csv.reader(lines()):
+        if not values:
+            continue
+        row += 1
+        yield row, consumed[0], dict(zip(header, values))
+
+
+def _group_records(records: Iterator[Record]) -> Iterator[_Group]:
+    """Объединяет идущие подряд записи одного заказа в группы"""
+    group: Optional[_Group] = None
+    prices: Dict[Tuple[str, str], Money] = {}
+    for row, end, record in records:
+        order_id = record.get("order_id") if isinstance(record, dict) else None
+        if group is not None and order_id != group.order_id:
+            yield group
+            group = None
+        if group is None:
+            group = _Group(order_id, row)
+        group.last_row = row
+        if end >= 0:
+            group.end = end
+        _parse_line(record, row, group, prices)
+    if group is not None:
+        yield group
+
+
+def _parse_line(
+    record: dict, row: int, group: _Group, prices: Dict[Tuple[str, str], Money]
+) -> None:
+    """Разбирает запись строки заказа и добавляет ее в группу"""
+    try:
+        if not isinstance(record, dict):
+            raise ValueError("Record must be an object")
+        if "_error" in record:
+            raise ValueError(record["_error"])
+        
+        customer_key = str(record["customer_id"])
+        if group.customer_key is None:
+            UUID(str(record["order_id"]))
+            group.customer_id = UUID(customer_key)
+            group.customer_key = customer_key
+        elif customer_key != group.customer_key:
+            raise ValueError("Rows of one order have different customer_id")
+        
+        status = record.get("status")
+        if status:
+            group.status = _STATUSES[status]
+        
+        # Цены в выгрузках повторяются: одинаковые Money переиспользуются
+        price_key = (str(record["price"]), record.get("currency") or "USD")
+        price = prices.get(price_key)
+        if price is None:
+            if len(prices) >= _PRICE_CACHE_SIZE:
+                prices.clear()
+            price = prices[price_key] = Money(Decimal(price_key[0]), price_key[1])
+        
+        group.lines.append(OrderLine(
+            product_id=UUID(str(record["product_id"])),
+            product_name=str(record["product_name"]),
+            price=price,
+            quantity=int(record["quantity"])
+        ))
+    except KeyError as e:
+        group.errors.append(RowError(row, group.order_id, f"Missing or invalid field {e}"))
+    except (ValueError, InvalidOperation) as e:
+        group.errors.append(RowError(row, group.order_id, f"Invalid row: {e}"))
@@ -0,0 +1,131 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Union
+from uuid import UUID
+
+from domain.order_aggregate import Order
+from domain.order_status import OrderStatus
+
+
+class OrderIndexes:
+    """
+    Вторичные индексы заказов: по покупателю, статусу, времени создания и ID
+    
+    Индексы хранят ID заказов и обновляются при каждом сохранении,
+    в том числе когда сохранение меняет статус заказа. Значения
+    индексируются на момент сохранения: изменения объекта заказа,
+    которые не были сохранены, в индексах не отражаются.
+    """
+    
+    def __init__(self):
+        # Ключ - UUID.int покупателя (Order.customer_key). У покупателя
+        # с одним заказом хранится сам ID заказа, множество создается
+        # только при втором заказе
+        self._by_customer: Dict[int, Union[UUID, Set[UUID]]] = {}
+        self._by_status: Dict[OrderStatus, Dict[UUID, None]] = {
+            status: {} for status in OrderStatus
+        }
+        # Время создания и ID заказов, отсортированные по времени
+        self._created_at = array('d')
+        self._created_ids: List[UUID] = []
+        # Отсортированные ID; новые ID не по порядку копятся в _new_ids
+        # и вливаются в _ids одной сортировкой при следующем запросе диапазона
+        self._ids: List[UUID] = []
+        self._new_ids: List[UUID] = []
+    
+    def update(self, order: Order, previous: Optional[Order] = None) -> None:
+        """
+        Обновляет индексы после сохранения заказа
+        
+        Args:
+            order: сохраненный заказ
+            previous: заказ, который хранился под этим ID до сохранения
+                (может быть тем же объектом), или None для нового заказа
+        """
+        order_id = order.id
+        status = order.status
+        by_status = self._by_status
+        
+        if previous is None:
+            self._add_customer(order.customer_key, order_id)
+            by_status[status][order_id] = None
+            self._add_created(order.created_timestamp, order_id)
+            ids = self._ids
+            # ID из TimeOrderedIdProvider возрастают и добавляются в конец
+            if not self._new_ids and (not ids or ids[-1] < order_id):
+                ids.append(order_id)
+            else:
+                self._new_ids.append(order_id)
+            return
+        
+        if order_id not in by_status[status]:
+            # Хранимый объект мог измениться на месте, поэтому прежний
+            # статус берется из самого индекса статусов
+            for ids_with_status in by_status.values():
+                if order_id in ids_with_status:
+                    del ids_with_status[order_id]
+                    break
+            by_status[status][order_id] = None
+        if previous.customer_key != order.customer_key:
+            self._remove_customer(previous.customer_key, order_id)
+            self._add_customer(order.customer_key, order_id)
+    
+    def _add_customer(self, customer_key: int, order_id: UUID) -> None:
+        by_customer = self._by_customer
+        orders = by_customer.get(customer_key)
+        if orders is None:
+            by_customer[customer_key] = order_id
+        elif type(orders) is set:
+            orders.add(order_id)
+        elif orders != order_id:
+            by_customer[customer_key] = {orders, order_id}
+    
+    def _remove_customer(self, customer_key: int, order_id: UUID) -> None:
+        by_customer = self._by_customer
+        orders = by_customer[customer_key]
+        if type(orders) is not set:
+            del by_customer[customer_key]
+            return
+        orders.discard(order_id)
+        if len(orders) == 1:
+            by_customer[customer_key] = orders.pop()
+    
+    def _add_created(self, timestamp: float, order_id: UUID) -> None:
+        created_at = self._created_at
+        if not created_at or created_at[-1] <= timestamp:
+            created_at.append(timestamp)
+            self._created_ids.append(order_id)
+        else:
+            index = bisect_right(created_at, timestamp)
+            created_at.insert(index, timestamp)
+            self._created_ids.insert(index, order_id)
+    
+    def ids_by_customer(self, customer_id: UUID) -> List[UUID]:
+        orders = self._by_customer.get(customer_id.int)
+        if orders is None:
+            return []
+        if type(orders) is set:
+            return list(orders)
+        return [orders]
+    
+    def ids_by_status(self, status: OrderStatus) -> List[UUID]:
+        return list(self._by_status[status])
+    
+    def ids_created_between(self, start: datetime, end: datetime) -> List[UUID]:
+        created_at = self._created_at
+        low = bisect_left(created_at, start.timestamp())
+        high = bisect_left(created_at, end.timestamp())
+        return self._created_ids[low:high]
+    
+    def ids_in_range(self, start: UUID, end: UUID) -> List[UUID]:
+        """ID заказов из диапазона [start, end) в порядке возрастания"""
+        ids = self._ids
+        if self._new_ids:
+            # Два отсортированных участка timsort сливает за линейное время
+            ids.extend(self._new_ids)
+            ids.sort()
+            self._new_ids = []
+        low = bisect_left(ids, start)
+        high = bisect_left(ids, end)
+        return ids[low:high]
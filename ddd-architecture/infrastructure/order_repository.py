@@ -1,18 +1,150 @@
-from typing import Dict, Optional
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional
 from uuid import UUID
 
 from domain.order_aggregate import Order
-from application.interfaces import OrderRepository
+from domain.order_status import OrderStatus
+from domain.domain_exceptions import ConcurrencyConflictException
+from application.interfaces import AsyncOrderRepository, OrderRepository
+from .order_index import OrderIndexes
+from .outbox import InMemoryOutbox
+
+
+def unique_orders(orders: Iterable[Order]) -> List[Order]:
+    """
+    Заказы пакета без повторов
+    
+    Повтор того же объекта сохраняется один раз, чтобы версия заказа
+    выросла на единицу. Другой объект с тем же ID в одном пакете -
+    конфликт версий, как и при сохранении этих объектов по очереди.
+    
+    Raises:
+        ConcurrencyConflictException: в пакете разные объекты одного заказа
+    """
+    unique: Dict[UUID, Order] = {}
+    for order in orders:
+        seen = unique.setdefault(order.id, order)
+        if seen is not order:
+            raise ConcurrencyConflictException(
+                f"Order {order.id} was modified concurrently"
+            )
+    return list(unique.values())
 
 
 class InMemoryOrderRepository(OrderRepository):
-    """In-memory реализация репозитория заказов"""
+    """
+    In-memory реализация репозитория заказов
     
-    def __init__(self):
+    Хранит сами переданные объекты заказов. save проверяет версию,
+    если сохраняется другой объект с тем же ID; для параллельной
+    работы из многих потоков предназначен ShardedOrderRepository.
+    """
+    
+    def __init__(self, outbox: Optional[InMemoryOutbox] = None):
+        """
+        Args:
+            outbox: outbox для доменных событий сохраняемых заказов
+        """
         self._storage: Dict[UUID, Order] = {}
+        self._indexes = OrderIndexes()
+        self.outbox = outbox
     
     def get_by_id(self, order_id: UUID) -> Optional[Order]:
         return self._storage.get(order_id)
     
     def save(self, order: Order) -> None:
+        self._check_version(order)
+        order.increment_version()
+        self._put(order)
+        self._publish([order])
+    
+    def get_many(self, order_ids: Iterable[UUID]) -> Dict[UUID, Order]:
+        storage = self._storage
+        return {
+            order_id: storage[order_id]
+            for order_id in order_ids
+            if order_id in storage
+        }
+    
+    def save_many(self, orders: Iterable[Order]) -> None:
+        orders = unique_orders(orders)
+        for order in orders:
+            self._check_version(order)
+        
+        storage = self._storage
+        indexes = self._indexes
+        for order in orders:
+            order.increment_version()
+            previous = storage.get(order.id)
+            storage[order.id] = order
+            indexes.update(order, previous)
+        self._publish(orders)
+    
+    def iter_orders(self) -> Iterator[Order]:
+        return iter(list(self._storage.values()))
+    
+    def restore_many(self, orders: Iterable[Order]) -> None:
+        for order in orders:
+            self._put(order)
+    
+    def _publish(self, orders: List[Order]) -> None:
+        """Переносит события сохраненных заказов в outbox"""
+        outbox = self.outbox
+        if outbox is not None:
+            outbox.append([event for order in orders for event in order.pending_events])
+        for order in orders:
+            order.clear_events()
+    
+    def _put(self, order: Order) -> None:
+        """Сохраняет заказ без проверки версии"""
+        previous = self._storage.get(order.id)
+        self._storage[order.id] = order
+        self._indexes.update(order, previous)
+    
+    def _check_version(self, order: Order) -> None:
+        stored = self._storage.get(order.id)
+        if stored is not None and stored is not order and stored.version != order.version:
+            raise ConcurrencyConflictException(
+                f"Order {order.id} was modified concurrently"
+            )
+    
+    def find_by_customer(self, customer_id: UUID) -> List[Order]:
+        return self._load(self._indexes.ids_by_customer(customer_id))
+    
+    def find_by_status(self, status: OrderStatus) -> List[Order]:
+        return self._load(self._indexes.ids_by_status(status))
+    
+    def find_created_between(self, start: datetime, end: datetime) -> List[Order]:
+        return self._load(self._indexes.ids_created_between(start, end))
+    
+    def find_id_range(self, start: UUID, end: UUID) -> List[Order]:
+        return self._load(self._indexes.ids_in_range(start, end))
+    
+    def _load(self, order_ids: List[UUID]) -> List[Order]:
+        storage = self._storage
+        return [storage[order_id] for order_id in order_ids]
+
+
+class AsyncInMemoryOrderRepository(AsyncOrderRepository):
+    """
+    Асинхронная in-memory реализация репозитория заказов
+    
+    Как и InMemoryOrderRepository, хранит сами переданные объекты
+    и проверяет версию, если сохраняется другой объект с тем же ID.
+    """
+    
+    def __init__(self):
+        self._storage: Dict[UUID, Order] = {}
+    
+    async def get_by_id(self, order_id: UUID) -> Optional[Order]:
+        return self._storage.get(order_id)
+    
+    async def save(self, order: Order) -> None:
+        stored = self._storage.get(order.id)
+        if stored is not None and stored is not order and stored.version != order.version:
+            raise ConcurrencyConflictException(
+                f"Order {order.id} was modified concurrently"
+            )
+        order.increment_version()
+        order.clear_events()
         self._storage[order.id] = order
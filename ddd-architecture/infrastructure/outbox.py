@@ -0,0 +1,99 @@
+import json
+import threading
+from collections import deque
+from dataclasses import fields
+from typing import Deque, Dict, Iterable, List, Tuple, Type
+from uuid import UUID
+
+from domain.money import Money
+from domain.domain_events import (
+    DomainEvent,
+    LineAdded,
+    LineQuantityChanged,
+    LineRemoved,
+    OrderPaid
+)
+from application.interfaces import Outbox, OutboxRecord
+
+
+class InMemoryOutbox(Outbox):
+    """
+    Outbox в памяти для in-memory репозиториев
+    
+    Репозиторий добавляет события в том же вызове save, в котором
+    сохраняет заказ. Доступ защищен блокировкой: диспетчер читает
+    outbox из своего потока.
+    """
+    
+    def __init__(self):
+        self._records: Deque[OutboxRecord] = deque()
+        self._sequence = 0
+        self._lock = threading.Lock()
+    
+    def append(self, events: Iterable[DomainEvent]) -> None:
+        """Добавляет события, присваивая им порядковые номера"""
+        with self._lock:
+            sequence = self._sequence
+            for event in events:
+                sequence += 1
+                self._records.append(OutboxRecord(sequence, event))
+            self._sequence = sequence
+    
+    def fetch(self, after: int, limit: int) -> List[OutboxRecord]:
+        with self._lock:
+            records = self._records
+            if not records:
+                return []
+            # Номера идут подряд, поэтому начало находится без поиска
+            start = max(0, after - records[0].sequence + 1)
+            return [records[i] for i in range(start, min(len(records), start + limit))]
+    
+    def acknowledge(self, sequence: int) -> None:
+        with self._lock:
+            records = self._records
+            while records and records[0].sequence <= sequence:
+                records.popleft()
+    
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._records)
+
+
+# Сериализация событий для хранилищ: тип события и JSON его полей
+
+_EVENT_TYPES: Dict[str, Type[DomainEvent]] = {
+    event_type.__name__: event_type for event_type in (LineAdded, LineRemoved, LineQuantityChanged, OrderPaid)
+}
+_EVENT_FIELDS: Dict[Type[DomainEvent], Tuple[Tuple[str, type], ...]] = {
+    event_type: tuple((field.name, field.type) for field in fields(event_type))
+    for event_type in _EVENT_TYPES.values()
+}
+
+
+def encode_event(event: DomainEvent) -> Tuple[str, str]:
+    """Возвращает имя типа события и JSON его полей"""
+    payload = {}
+    for name, field_type in _EVENT_FIELDS[type(event)]:
+        value = getattr(event, name)
+        if field_type is UUID:
+            value = value.hex
+        elif field_type is Money:
+            units, scale = value.as_units()
+            value = [units, scale, value.currency]
+        payload[name] = value
+    return type(event).__name__, json.dumps(payload, separators=(",", ":"))
+
+
+def decode_event(event_type: str, payload: str) -> DomainEvent:
+    """Восстанавливает событие из имени типа и JSON"""
+    cls = _EVENT_TYPES[event_type]
+    data = json.loads(payload)
+    values = []
+    for name, field_type in _EVENT_FIELDS[cls]:
+        value = data[name]
+        if field_type is UUID:
+            value = UUID(value)
+        elif field_type is Money:
+            value = Money.from_units(*value)
+        values.append(value)
+    return cls(*values)
@@ -1,45 +1,239 @@
+import asyncio
+import math
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import dataclass
 from datetime import datetime
+from decimal import Decimal
+from typing import Callable, Deque, Dict, List, Optional, Sequence, Tuple
 from uuid import uuid4, UUID
 
-from domain.money import Money
-from application.interfaces import PaymentGateway, PaymentResult
+from domain.money import Money, MoneyAccumulator
+from application.interfaces import (
+    AsyncPaymentGateway,
+    PaymentGateway,
+    PaymentGatewayError,
+    PaymentResult
+)
+
+
+class LatencyModel(ABC):
+    """Распределение задержки ответа шлюза"""
+    
+    @abstractmethod
+    def sample(self, rng: random.Random) -> float:
+        """Возвращает задержку в секундах"""
+        pass
+
+
+class FixedLatency(LatencyModel):
+    """Постоянная задержка"""
+    
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+    
+    def sample(self, rng: random.Random) -> float:
+        return self.seconds
+
+
+class NormalLatency(LatencyModel):
+    """Нормально распределенная задержка (отрицательные значения обрезаются до 0)"""
+    
+    def __init__(self, mean: float, stddev: float):
+        self.mean = mean
+        self.stddev = stddev
+    
+    def sample(self, rng: random.Random) -> float:
+        return max(0.0, rng.gauss(self.mean, self.stddev))
+
+
+class LongTailLatency(LatencyModel):
+    """
+    Логнормальная задержка с длинным хвостом
+    
+    Большинство ответов близки к медиане, но редкие ответы
+    в разы медленнее (sigma задает тяжесть хвоста).
+    """
+    
+    def __init__(self, median: float, sigma: float = 1.0):
+        self.median = median
+        self.sigma = sigma
+    
+    def sample(self, rng: random.Random) -> float:
+        return self.median * math.exp(rng.gauss(0.0, self.sigma))
+
+
+@dataclass
+class GatewayStats:
+    """Агрегированные счетчики фейкового шлюза"""
+    charges: int = 0
+    succeeded: int = 0
+    declined: int = 0
+    errors: int = 0
+    simulated_latency: float = 0.0
 
 
 class FakePaymentGateway(PaymentGateway):
-    """Фейковый платежный шлюз для тестирования"""
+    """
+    Фейковый платежный шлюз для тестирования
+    
+    Помимо режима "всегда успешно / всегда отказ" умеет имитировать
+    нагрузку: задержку по заданному распределению, вероятность отказа
+    и временной ошибки, ограничение пропускной способности. История
+    платежей хранится в кольцевом буфере фиксированного размера,
+    а итоги - в счетчиках stats, поэтому шлюз пригоден для
+    длительных прогонов на миллионах платежей.
+    """
     
-    def __init__(self, always_succeed: bool = True):
+    def __init__(
+        self,
+        always_succeed: bool = True,
+        latency: Optional[LatencyModel] = None,
+        failure_probability: float = 0.0,
+        error_probability: float = 0.0,
+        max_throughput: Optional[float] = None,
+        seed: Optional[int] = None,
+        history_size: int = 10_000,
+        sleep: Callable[[float], None] = time.sleep
+    ):
         """
         Args:
-            always_succeed: если True, все платежи успешны
+            always_succeed: если True, все платежи успешны (с учетом failure_probability)
+            latency: распределение задержки ответа (None - без задержки)
+            failure_probability: вероятность отказа в платеже
+            error_probability: вероятность временной ошибки PaymentGatewayError
+            max_throughput: максимальное число платежей в секунду (None - без ограничения)
+            seed: начальное значение генератора случайных чисел
+            history_size: число последних платежей в processed_payments
+            sleep: функция ожидания (для тестов)
         """
         self.always_succeed = always_succeed
-        self.processed_payments = []
+        self.latency = latency
+        self.failure_probability = failure_probability
+        self.error_probability = error_probability
+        self.processed_payments: Deque[dict] = deque(maxlen=history_size)
+        self.stats = GatewayStats()
+        self._charged: Dict[str, MoneyAccumulator] = {}
+        self._rng = random.Random(seed)
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        # Ограничение пропускной способности: момент, раньше которого
+        # не может начаться следующий платеж
+        self._interval = 1.0 / max_throughput if max_throughput else 0.0
+        self._next_slot = 0.0
     
     def charge(self, order_id: UUID, amount: Money) -> PaymentResult:
         """Имитирует процесс платежа"""
+        return self.charge_batch([(order_id, amount)])[0]
+    
+    def charge_batch(
+        self, charges: Sequence[Tuple[UUID, Money]]
+    ) -> List[PaymentResult]:
+        """Имитирует пакетный платеж одним вызовом"""
+        delay = self._reserve(len(charges))
+        if delay > 0:
+            self._sleep(delay)
+        
+        timestamp = datetime.now()
+        results = []
+        with self._lock:
+            rng = self._rng
+            stats = self.stats
+            stats.simulated_latency += delay
+            if self.error_probability and rng.random() < self.error_probability:
+                stats.errors += 1
+                raise PaymentGatewayError("Payment gateway is temporarily unavailable")
+            
+            for order_id, amount in charges:
+                # Записываем информацию о платеже для тестирования
+                self.processed_payments.append({
+                    'order_id': order_id,
+                    'amount': amount,
+                    'timestamp': timestamp
+                })
+                stats.charges += 1
+                
+                success = self.always_succeed and not (
+                    self.failure_probability and rng.random() < self.failure_probability
+                )
+                if success:
+                    stats.succeeded += 1
+                    accumulator = self._charged.get(amount.currency)
+                    if accumulator is None:
+                        accumulator = self._charged[amount.currency] = MoneyAccumulator()
+                    accumulator.add(amount)
+                    message = "Payment processed successfully"
+                else:
+                    stats.declined += 1
+                    message = "Payment declined by gateway"
+                
+                results.append(PaymentResult(
+                    success=success,
+                    transaction_id=str(uuid4()),
+                    message=message
+                ))
+        return results
+    
+    def _reserve(self, count: int) -> float:
+        """Возвращает задержку ответа: ожидание слота пропускной способности и латентность"""
+        with self._lock:
+            delay = self.latency.sample(self._rng) if self.latency is not None else 0.0
+            if self._interval:
+                now = time.monotonic()
+                start = max(now, self._next_slot)
+                self._next_slot = start + self._interval * count
+                delay += start - now
+        return delay
+    
+    def charged_total(self, currency: str = "USD") -> Money:
+        """Сумма успешных платежей в валюте"""
+        with self._lock:
+            accumulator = self._charged.get(currency)
+            return accumulator.total() if accumulator else Money(Decimal("0"), currency)
+
+
+class AsyncFakePaymentGateway(AsyncPaymentGateway):
+    """Асинхронный фейковый платежный шлюз для тестирования"""
+    
+    def __init__(
+        self,
+        always_succeed: bool = True,
+        latency: float = 0.0,
+        history_size: int = 10_000
+    ):
+        """
+        Args:
+            always_succeed: если True, все платежи успешны
+            latency: имитируемая задержка ответа шлюза в секундах
+            history_size: число последних платежей в processed_payments
+        """
+        self.always_succeed = always_succeed
+        self.latency = latency
+        self.processed_payments: Deque[dict] = deque(maxlen=history_size)
+    
+    async def charge(self, order_id: UUID, amount: Money) -> PaymentResult:
+        """Имитирует процесс платежа с сетевой задержкой"""
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
         
-        # Записываем информацию о платеже для тестирования
-        payment_record = {
+        self.processed_payments.append({
             'order_id': order_id,
             'amount': amount,
             'timestamp': datetime.now()
-        }
-        self.processed_payments.append(payment_record)
+        })
         
-        # Генерируем случайный transaction_id
         transaction_id = str(uuid4())
-        
-        # Возвращаем результат в зависимости от настройки
         if self.always_succeed:
             return PaymentResult(
                 success=True,
                 transaction_id=transaction_id,
                 message="Payment processed successfully"
             )
-        else:
-            return PaymentResult(
-                success=False,
-                transaction_id=transaction_id,
-                message="Payment declined by gateway"
-            )
+        return PaymentResult(
+            success=False,
+            transaction_id=transaction_id,
+            message="Payment declined by gateway"
+        )
@@ -0,0 +1,118 @@
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Sequence
+
+from application.instrumentation import PaymentInstrumentation
+
+# Границы корзин гистограммы в секундах (как в клиентах Prometheus)
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами корзин"""
+    
+    __slots__ = ('bounds', 'counts', 'count', 'sum')
+    
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = tuple(bounds)
+        # Последняя корзина - значения больше всех границ (+Inf)
+        self.counts: List[int] = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+    
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+    
+    def quantile(self, q: float) -> float:
+        """
+        Оценивает квантиль линейной интерполяцией внутри корзины
+        
+        Значения из корзины +Inf оцениваются последней границей.
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for bound, count in zip(self.bounds, self.counts):
+            if count and seen + count >= rank:
+                return lower + (bound - lower) * (rank - seen) / count
+            seen += count
+            lower = bound
+        return self.bounds[-1]
+
+
+class InMemoryPaymentMetrics(PaymentInstrumentation):
+    """
+    Сборщик метрик PayOrderUseCase в памяти процесса
+    
+    Хранит гистограмму длительности для каждой фазы и счетчики
+    исходов; to_prometheus() возвращает их в текстовом формате
+    Prometheus для отдачи по /metrics.
+    """
+    
+    enabled = True
+    
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """
+        Args:
+            buckets: границы корзин гистограмм в секундах (по возрастанию)
+        """
+        self._buckets = tuple(buckets)
+        self._phases: Dict[str, Histogram] = {}
+        self._outcomes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+    
+    def observe_phase(self, phase: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self._phases.get(phase)
+            if histogram is None:
+                histogram = self._phases[phase] = Histogram(self._buckets)
+            histogram.observe(seconds)
+    
+    def count_outcome(self, outcome: str) -> None:
+        with self._lock:
+            self._outcomes[outcome] = self._outcomes.get(outcome, 0) + 1
+    
+    def phase_quantile(self, phase: str, q: float) -> float:
+        """Оценка квантиля длительности фазы, например phase_quantile("charge", 0.99)"""
+        with self._lock:
+            histogram = self._phases.get(phase)
+            return histogram.quantile(q) if histogram is not None else 0.0
+    
+    def outcome_count(self, outcome: str) -> int:
+        with self._lock:
+            return self._outcomes.get(outcome, 0)
+    
+    def to_prometheus(self) -> str:
+        """Экспортирует метрики в текстовом формате Prometheus"""
+        lines = [
+            "# HELP pay_order_phase_seconds Duration of PayOrderUseCase phases",
+            "# TYPE pay_order_phase_seconds histogram",
+        ]
+        with self._lock:
+            for phase, histogram in sorted(self._phases.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.bounds, histogram.counts):
+                    cumulative += count
+                    lines.append(
+                        f'pay_order_phase_seconds_bucket{{phase="{phase}",le="{bound:g}"}} '
+                        f'{cumulative}'
+                    )
+                lines.append(
+                    f'pay_order_phase_seconds_bucket{{phase="{phase}",le="+Inf"}} '
+                    f'{histogram.count}'
+                )
+                lines.append(f'pay_order_phase_seconds_sum{{phase="{phase}"}} {histogram.sum!r}')
+                lines.append(f'pay_order_phase_seconds_count{{phase="{phase}"}} {histogram.count}')
+            
+            lines.append("# HELP pay_order_outcomes_total Payment outcomes by type")
+            lines.append("# TYPE pay_order_outcomes_total counter")
+            for outcome, count in sorted(self._outcomes.items()):
+                lines.append(f'pay_order_outcomes_total{{outcome="{outcome}"}} {count}')
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,214 @@
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Optional, Set
+from uuid import UUID
+
+from domain.money import Money
+from application.interfaces import PaymentGateway, PaymentResult
+
+
+class CircuitBreaker:
+    """
+    Автоматический выключатель для вызовов внешнего сервиса
+    
+    После failure_threshold ошибок подряд переходит в состояние open
+    и отклоняет вызовы без обращения к сервису. Через reset_timeout
+    пропускает один пробный вызов (half_open): успех закрывает
+    выключатель, ошибка снова открывает его.
+    """
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            failure_threshold: число ошибок подряд, открывающее выключатель
+            reset_timeout: время в секундах до пробного вызова
+            clock: источник монотонного времени (для тестов)
+        """
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._clock = clock
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+    
+    @property
+    def state(self) -> str:
+        return self._state
+    
+    def allow(self) -> bool:
+        """Разрешает ли выключатель очередной вызов"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and (
+                self._clock() - self._opened_at >= self._reset_timeout
+            ):
+                # Пропускаем ровно один пробный вызов
+                self._state = self.HALF_OPEN
+                return True
+            return False
+    
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+    
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self._failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+
+
+class ResilientPaymentGateway(PaymentGateway):
+    """
+    Декоратор платежного шлюза: таймауты, повторы, выключатель и хеджирование
+    
+    Каждый вызов charge ограничен таймаутом. Ошибки и таймауты
+    повторяются с экспоненциальной задержкой со случайным разбросом,
+    пока не исчерпаны попытки или общий бюджет времени. Отказ в платеже
+    (PaymentResult с success=False) - это ответ шлюза, он не повторяется.
+    Если задан hedge_after, то при отсутствии ответа за это время
+    параллельно отправляется второй запрос и берется первый ответ.
+    
+    Повторы и хеджирование безопасны, только если оборачиваемый шлюз
+    идемпотентен по order_id (HttpPaymentGateway передает order_id
+    в заголовке Idempotency-Key). Запрос, не уложившийся в таймаут,
+    продолжает выполняться в пуле потоков, но его результат не ждут.
+    """
+    
+    def __init__(
+        self,
+        gateway: PaymentGateway,
+        timeout: float = 2.0,
+        max_attempts: int = 3,
+        budget: float = 5.0,
+        backoff: float = 0.05,
+        max_backoff: float = 1.0,
+        hedge_after: Optional[float] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        max_workers: int = 32,
+        rng: Optional[random.Random] = None
+    ):
+        """
+        Args:
+            gateway: оборачиваемый платежный шлюз
+            timeout: таймаут одной попытки в секундах
+            max_attempts: максимальное число попыток
+            budget: общий бюджет времени на все попытки в секундах
+            backoff: базовая задержка перед повтором в секундах
+            max_backoff: максимальная задержка перед повтором
+            hedge_after: задержка перед хеджирующим запросом (None - без хеджирования)
+            circuit_breaker: выключатель (по умолчанию CircuitBreaker())
+            max_workers: число потоков для вызовов шлюза
+            rng: генератор случайных чисел для разброса задержек
+        """
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be positive")
+        
+        self._gateway = gateway
+        self._timeout = timeout
+        self._max_attempts = max_attempts
+        self._budget = budget
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self._hedge_after = hedge_after
+        self.circuit_breaker = (
+            circuit_breaker if circuit_breaker is not None else CircuitBreaker()
+        )
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="payment-gateway"
+        )
+        self._rng = rng or random.Random()
+    
+    def charge(self, order_id: UUID, amount: Money) -> PaymentResult:
+        deadline = time.monotonic() + self._budget
+        error: Optional[BaseException] = None
+        
+        for attempt in range(self._max_attempts):
+            # Бюджет проверяется до allow(): пропущенный выключателем
+            # пробный вызов должен завершиться record_success/record_failure
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            
+            if not self.circuit_breaker.allow():
+                return _failed("Payment gateway circuit is open")
+            
+            try:
+                result = self._call(order_id, amount, min(self._timeout, remaining))
+            except Exception as e:
+                error = e
+                self.circuit_breaker.record_failure()
+            else:
+                self.circuit_breaker.record_success()
+                return result
+            
+            # Полный разброс: задержка равномерно распределена в [0, предел)
+            delay = self._rng.uniform(0, min(self._max_backoff, self._backoff * 2 ** attempt))
+            if attempt + 1 == self._max_attempts or time.monotonic() + delay >= deadline:
+                break
+            time.sleep(delay)
+        
+        return _failed(f"Payment gateway unavailable: {error or 'latency budget exhausted'}")
+    
+    def _call(self, order_id: UUID, amount: Money, timeout: float) -> PaymentResult:
+        """Одна попытка: запрос (и, возможно, хеджирующий запрос) с таймаутом"""
+        deadline = time.monotonic() + timeout
+        pending = {self._executor.submit(self._gateway.charge, order_id, amount)}
+        
+        if self._hedge_after is not None and self._hedge_after < timeout:
+            done, pending = wait(pending, timeout=self._hedge_after)
+            result = _first_result(done)
+            if result is not None:
+                return result
+            if not done:
+                pending.add(self._executor.submit(self._gateway.charge, order_id, amount))
+            else:
+                # Первый запрос завершился ошибкой раньше порога хеджирования
+                raise done.pop().exception()
+        
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(
+                pending, timeout=deadline - time.monotonic(), return_when=FIRST_COMPLETED
+            )
+            if not done:
+                break
+            result = _first_result(done)
+            if result is not None:
+                return result
+            error = next(iter(done)).exception()
+        
+        if error is not None and not pending:
+            raise error
+        raise TimeoutError(f"Payment gateway did not respond within {timeout:.3f} s")
+    
+    def close(self) -> None:
+        """Останавливает пул потоков, не дожидаясь незавершенных запросов"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _first_result(futures: Set[Future]) -> Optional[PaymentResult]:
+    """Возвращает результат первого успешно завершенного запроса"""
+    for future in futures:
+        if future.exception() is None:
+            return future.result()
+    return None
+
+
+def _failed(message: str) -> PaymentResult:
+    return PaymentResult(success=False, transaction_id="", message=message)
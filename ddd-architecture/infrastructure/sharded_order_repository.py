@@ -0,0 +1,162 @@
+import heapq
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional
+from uuid import UUID
+
+from domain.order_aggregate import Order
+from domain.order_status import OrderStatus
+from domain.domain_exceptions import ConcurrencyConflictException
+from application.interfaces import OrderRepository
+from .order_index import OrderIndexes
+from .order_repository import unique_orders
+from .outbox import InMemoryOutbox
+
+
+class _Shard:
+    """Часть хранилища со своей блокировкой и индексами"""
+    
+    __slots__ = ('lock', 'storage', 'indexes')
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.storage: Dict[UUID, Order] = {}
+        self.indexes = OrderIndexes()
+
+
+class ShardedOrderRepository(OrderRepository):
+    """
+    Потокобезопасный in-memory репозиторий с блокировками по шардам
+    
+    Заказы распределяются по шардам по ID (order_id.int % shards),
+    у каждого шарда своя блокировка и свои индексы, поэтому операции
+    с заказами из разных шардов не конкурируют. Репозиторий хранит
+    копии заказов и возвращает вызывающим собственные копии; save
+    выполняет сравнение с обменом по версии и отклоняет устаревшие
+    записи исключением ConcurrencyConflictException.
+    """
+    
+    def __init__(self, shards: int = 64, outbox: Optional[InMemoryOutbox] = None):
+        """
+        Args:
+            shards: число шардов (и независимых блокировок)
+            outbox: outbox для доменных событий сохраняемых заказов
+        """
+        if shards < 1:
+            raise ValueError("shards must be positive")
+        self._shards = [_Shard() for _ in range(shards)]
+        self.outbox = outbox
+    
+    def _shard(self, order_id: UUID) -> _Shard:
+        return self._shards[order_id.int % len(self._shards)]
+    
+    def get_by_id(self, order_id: UUID) -> Optional[Order]:
+        shard = self._shard(order_id)
+        with shard.lock:
+            stored = shard.storage.get(order_id)
+        # Сохраненные копии не изменяются, поэтому копируются без блокировки
+        return stored.clone() if stored is not None else None
+    
+    def get_many(self, order_ids: Iterable[UUID]) -> Dict[UUID, Order]:
+        found = {}
+        for order_id in order_ids:
+            order = self.get_by_id(order_id)
+            if order is not None:
+                found[order_id] = order
+        return found
+    
+    def save(self, order: Order) -> None:
+        self.save_many([order])
+    
+    def save_many(self, orders: Iterable[Order]) -> None:
+        """
+        Сохраняет заказы атомарно: если версия хотя бы одного заказа
+        устарела, не сохраняется ни один
+        """
+        orders = unique_orders(orders)
+        by_shard: Dict[int, List[Order]] = {}
+        for order in orders:
+            by_shard.setdefault(order.id.int % len(self._shards), []).append(order)
+        copies = {id(order): order.clone() for order in orders}
+        
+        # Блокировки берутся в порядке номеров шардов, чтобы избежать взаимоблокировок
+        indices = sorted(by_shard)
+        for index in indices:
+            self._shards[index].lock.acquire()
+        try:
+            for index in indices:
+                storage = self._shards[index].storage
+                for order in by_shard[index]:
+                    stored = storage.get(order.id)
+                    if stored is not None and stored.version != order.version:
+                        raise ConcurrencyConflictException(
+                            f"Order {order.id} was modified concurrently"
+                        )
+            
+            for index in indices:
+                shard = self._shards[index]
+                for order in by_shard[index]:
+                    copy = copies[id(order)]
+                    copy.increment_version()
+                    previous = shard.storage.get(order.id)
+                    shard.storage[order.id] = copy
+                    shard.indexes.update(copy, previous)
+                    order.increment_version()
+            
+            # События попадают в outbox, пока заказы еще заблокированы
+            if self.outbox is not None:
+                self.outbox.append(
+                    [event for order in orders for event in order.pending_events]
+                )
+        finally:
+            for index in indices:
+                self._shards[index].lock.release()
+        
+        for order in orders:
+            order.clear_events()
+    
+    def iter_orders(self) -> Iterator[Order]:
+        for shard in self._shards:
+            with shard.lock:
+                stored = list(shard.storage.values())
+            for order in stored:
+                yield order.clone()
+    
+    def restore_many(self, orders: Iterable[Order]) -> None:
+        for order in orders:
+            copy = order.clone()
+            shard = self._shard(order.id)
+            with shard.lock:
+                previous = shard.storage.get(order.id)
+                shard.storage[order.id] = copy
+                shard.indexes.update(copy, previous)
+    
+    def find_by_customer(self, customer_id: UUID) -> List[Order]:
+        return self._query(lambda indexes: indexes.ids_by_customer(customer_id))
+    
+    def find_by_status(self, status: OrderStatus) -> List[Order]:
+        return self._query(lambda indexes: indexes.ids_by_status(status))
+    
+    def find_created_between(self, start: datetime, end: datetime) -> List[Order]:
+        per_shard = self._query_shards(
+            lambda indexes: indexes.ids_created_between(start, end)
+        )
+        return list(heapq.merge(
+            *per_shard, key=lambda order: (order.created_timestamp, order.id)
+        ))
+    
+    def find_id_range(self, start: UUID, end: UUID) -> List[Order]:
+        per_shard = self._query_shards(lambda indexes: indexes.ids_in_range(start, end))
+        return list(heapq.merge(*per_shard, key=lambda order: order.id.int))
+    
+    def _query(self, select_ids) -> List[Order]:
+        return [order for orders in self._query_shards(select_ids) for order in orders]
+    
+    def _query_shards(self, select_ids) -> List[List[Order]]:
+        """Выполняет запрос к индексам каждого шарда по очереди"""
+        results = []
+        for shard in self._shards:
+            with shard.lock:
+                stored = [shard.storage[order_id] for order_id in select_ids(shard.indexes)]
+            results.append([order.clone() for order in stored])
+        return results
@@ -0,0 +1,185 @@
+import multiprocessing
+import queue
+import traceback
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from uuid import UUID
+
+from application.interfaces import OrderRepository, PaymentGateway, PaymentResult
+from application.pay_order_usecase import PayOrderUseCase
+
+# Сообщения воркеров: (шард, вид, данные)
+_RESULTS = "results"
+_DONE = "done"
+_FAILED = "failed"
+
+# Период проверки, не упал ли воркер, пока родитель ждет результатов
+_POLL_INTERVAL = 0.5
+
+
+class ShardedPaymentRunner:
+    """
+    Оплата заказов в пуле процессов с разбиением по шардам
+    
+    ID заказа определяет шард (order_id.int % workers), каждый шард
+    обслуживает ровно один процесс со своим репозиторием и своим
+    PayOrderUseCase, поэтому межпроцессные блокировки не нужны.
+    Родительский процесс раскладывает ID по очередям воркеров пакетами
+    и отдает результаты одним потоком по мере готовности.
+    
+    Фабрики вызываются внутри воркеров и получают номер шарда;
+    при запуске через spawn они должны быть функциями уровня модуля.
+    """
+    
+    def __init__(
+        self,
+        workers: int,
+        repository_factory: Callable[[int], OrderRepository],
+        gateway_factory: Callable[[int], PaymentGateway],
+        batch_size: int = 1000,
+        queue_depth: int = 4,
+        context: Optional[multiprocessing.context.BaseContext] = None
+    ):
+        """
+        Args:
+            workers: число процессов (и шардов)
+            repository_factory: создает репозиторий шарда
+            gateway_factory: создает платежный шлюз шарда
+            batch_size: число ID в одном пакете для execute_many
+            queue_depth: число пакетов в очереди воркера (ограничивает память)
+            context: контекст multiprocessing (по умолчанию системный)
+        """
+        if workers < 1:
+            raise ValueError("workers must be positive")
+        self._workers = workers
+        self._repository_factory = repository_factory
+        self._gateway_factory = gateway_factory
+        self._batch_size = batch_size
+        self._queue_depth = queue_depth
+        self._context = context or multiprocessing.get_context()
+    
+    def shard_of(self, order_id: UUID) -> int:
+        """Номер шарда заказа"""
+        return order_id.int % self._workers
+    
+    def run(self, order_ids: Iterable[UUID]) -> Iterator[Tuple[UUID, PaymentResult]]:
+        """
+        Оплачивает заказы и отдает результаты по мере готовности
+        
+        Порядок результатов не совпадает с порядком входных ID.
+        
+        Raises:
+            RuntimeError: если воркер завершился с ошибкой
+        """
+        context = self._context
+        inputs = [context.Queue(maxsize=self._queue_depth) for _ in range(self._workers)]
+        output = context.Queue()
+        processes = [
+            context.Process(
+                target=_worker,
+                args=(
+                    shard,
+                    self._repository_factory,
+                    self._gateway_factory,
+                    inputs[shard],
+                    output
+                ),
+                daemon=True
+            )
+            for shard in range(self._workers)
+        ]
+        for process in processes:
+            process.start()
+        
+        running = set(range(self._workers))
+        try:
+            batches: Dict[int, List[UUID]] = {shard: [] for shard in running}
+            for order_id in order_ids:
+                shard = order_id.int % self._workers
+                batch = batches[shard]
+                batch.append(order_id)
+                if len(batch) >= self._batch_size:
+                    # Queue сериализует сообщение в фоновом потоке,
+                    # поэтому отправленный список больше не изменяем
+                    self._send(inputs[shard], processes[shard], batch)
+                    batches[shard] = []
+                    yield from self._drain(output, running, processes, block=False)
+            
+            for shard, batch in batches.items():
+                if batch:
+                    self._send(inputs[shard], processes[shard], batch)
+            for shard in range(self._workers):
+                self._send(inputs[shard], processes[shard], None)
+            
+            yield from self._drain(output, running, processes, block=True)
+        finally:
+            for process in processes:
+                if process.is_alive() and running:
+                    process.terminate()
+                process.join()
+    
+    @staticmethod
+    def _send(inbox, process, message: Optional[List[UUID]]) -> None:
+        """Кладет пакет в очередь воркера; пока очередь полна, следит за процессом"""
+        while True:
+            try:
+                inbox.put(message, timeout=_POLL_INTERVAL)
+                return
+            except queue.Full:
+                # Воркеры пишут в output без блокировки, а после ошибки
+                # продолжают вычитывать свою очередь, поэтому ожидание конечно
+                if process.exitcode not in (None, 0):
+                    raise RuntimeError(f"Payment worker has died with exit code {process.exitcode}")
+    
+    @staticmethod
+    def _drain(
+        output,
+        running: Set[int],
+        processes: list,
+        block: bool
+    ) -> Iterator[Tuple[UUID, PaymentResult]]:
+        """
+        Отдает накопившиеся результаты воркеров
+        
+        В блокирующем режиме ждет, пока все воркеры не сообщат о завершении.
+        """
+        while running:
+            try:
+                shard, kind, payload = (
+                    output.get(timeout=_POLL_INTERVAL) if block else output.get_nowait()
+                )
+            except queue.Empty:
+                if not block:
+                    return
+                # Штатно завершенный воркер успевает отправить _DONE или _FAILED
+                crashed = [s for s in running if processes[s].exitcode not in (None, 0)]
+                if crashed:
+                    raise RuntimeError(f"Payment worker for shard {crashed[0]} has died")
+                continue
+            
+            if kind == _RESULTS:
+                yield from payload
+            elif kind == _DONE:
+                running.discard(shard)
+            else:
+                running.discard(shard)
+                raise RuntimeError(f"Payment worker for shard {shard} failed:\n{payload}")
+
+
+def _worker(shard, repository_factory, gateway_factory, inputs, output) -> None:
+    """Цикл воркера: оплачивает пакеты своего шарда"""
+    try:
+        repository = repository_factory(shard)
+        use_case = PayOrderUseCase(repository, gateway_factory(shard))
+        for batch in iter(inputs.get, None):
+            results = use_case.execute_many(batch)
+            output.put((shard, _RESULTS, list(results.items())))
+        close = getattr(repository, "close", None)
+        if close is not None:
+            close()
+    except Exception:
+        output.put((shard, _FAILED, traceback.format_exc()))
+        # Освобождаем очередь, чтобы родитель не ждал на заполненной очереди
+        for _ in iter(inputs.get, None):
+            pass
+        return
+    output.put((shard, _DONE, None))
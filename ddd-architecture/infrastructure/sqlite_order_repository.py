@@ -0,0 +1,418 @@
+import sqlite3
+import threading
+from datetime import datetime
+from decimal import Decimal
+from functools import partial
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from domain.money import Money
+from domain.order_aggregate import Order, OrderLine
+from domain.line_store import LazyLineStore
+from domain.order_status import OrderStatus
+from domain.domain_exceptions import ConcurrencyConflictException
+from application.interfaces import Outbox, OutboxRecord, OrderRepository
+from .order_repository import unique_orders
+from .outbox import decode_event, encode_event
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    id BLOB PRIMARY KEY,
+    customer_id BLOB NOT NULL,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0,
+    total TEXT NOT NULL,
+    currency TEXT NOT NULL,
+    line_count INTEGER NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS order_lines (
+    order_id BLOB NOT NULL REFERENCES orders (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    product_id BLOB NOT NULL,
+    product_name TEXT NOT NULL,
+    price_units INTEGER NOT NULL,
+    price_scale INTEGER NOT NULL,
+    currency TEXT NOT NULL,
+    quantity INTEGER NOT NULL,
+    PRIMARY KEY (order_id, position)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS outbox (
+    sequence INTEGER PRIMARY KEY AUTOINCREMENT,
+    event_type TEXT NOT NULL,
+    payload TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS orders_by_customer ON orders (customer_id);
+CREATE INDEX IF NOT EXISTS orders_by_status ON orders (status);
+CREATE INDEX IF NOT EXISTS orders_by_created_at ON orders (created_at);
+"""
+
+# SQL-запросы неизменны, поэтому sqlite3 повторно использует
+# подготовленные выражения из кэша соединения
+_RESTORE_ORDER = """
+INSERT INTO orders (
+    id, customer_id, status, created_at, updated_at, version, total, currency, line_count
+)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET
+    customer_id = excluded.customer_id,
+    status = excluded.status,
+    created_at = excluded.created_at,
+    updated_at = excluded.updated_at,
+    version = excluded.version,
+    total = excluded.total,
+    currency = excluded.currency,
+    line_count = excluded.line_count
+"""
+# Обновление выполняется, только если сохраненная версия не изменилась
+# с момента чтения (новая версия = прочитанная + 1)
+_UPSERT_ORDER = _RESTORE_ORDER + "WHERE orders.version = excluded.version - 1\n"
+_DELETE_LINES = "DELETE FROM order_lines WHERE order_id = ?"
+_INSERT_LINE = """
+INSERT INTO order_lines (
+    order_id, position, product_id, product_name,
+    price_units, price_scale, currency, quantity
+)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+_SELECT_ORDER_COLUMNS = (
+    "SELECT id, customer_id, status, created_at, updated_at, version, "
+    "total, currency, line_count FROM orders"
+)
+_SELECT_LINE_COLUMNS = """
+SELECT order_id, product_id, product_name, price_units, price_scale, currency, quantity
+FROM order_lines
+"""
+
+_SELECT_ORDER = f"{_SELECT_ORDER_COLUMNS} WHERE id = ?"
+_SELECT_IDS_BY_CUSTOMER = "SELECT id FROM orders WHERE customer_id = ?"
+_SELECT_IDS_BY_STATUS = "SELECT id FROM orders WHERE status = ?"
+_SELECT_IDS_CREATED_BETWEEN = (
+    "SELECT id FROM orders WHERE created_at >= ? AND created_at < ? ORDER BY created_at, id"
+)
+_SELECT_IDS_IN_RANGE = "SELECT id FROM orders WHERE id >= ? AND id < ? ORDER BY id"
+_SELECT_LINES = f"{_SELECT_LINE_COLUMNS} WHERE order_id = ? ORDER BY position"
+
+_INSERT_EVENT = "INSERT INTO outbox (event_type, payload) VALUES (?, ?)"
+_SELECT_EVENTS = (
+    "SELECT sequence, event_type, payload FROM outbox WHERE sequence > ? ORDER BY sequence LIMIT ?"
+)
+_DELETE_EVENTS = "DELETE FROM outbox WHERE sequence <= ?"
+_COUNT_EVENTS = "SELECT COUNT(*) FROM outbox"
+
+# Размер пакета для запросов с IN (...): последний пакет дополняется
+# повтором ID, чтобы текст запроса (и подготовленное выражение) не менялся
+_BATCH_SIZE = 256
+_IN_PLACEHOLDERS = ", ".join("?" * _BATCH_SIZE)
+_SELECT_ORDERS_BATCH = f"{_SELECT_ORDER_COLUMNS} WHERE id IN ({_IN_PLACEHOLDERS})"
+_SELECT_LINES_BATCH = (
+    f"{_SELECT_LINE_COLUMNS} WHERE order_id IN ({_IN_PLACEHOLDERS}) ORDER BY order_id, position"
+)
+
+_STATUSES = {status.value: status for status in OrderStatus}
+
+
+class SqliteOrderRepository(OrderRepository):
+    """
+    Репозиторий заказов на SQLite
+    
+    Заказы и строки хранятся в нормализованных таблицах, база работает
+    в режиме WAL. Каждый поток получает собственное соединение из пула;
+    пакетные save_many/get_many выполняются через executemany и запросы
+    с IN (...) в одной транзакции. save проверяет версию заказа и
+    откатывает всю транзакцию, если хотя бы один заказ устарел.
+    С outbox=True доменные события заказов записываются в таблицу outbox
+    в той же транзакции.
+    
+    Вместе с заказом хранятся итоговая сумма и число строк. С lazy_lines=True
+    заказы загружаются без строк (LazyLineStore): статус, сумма и проверки
+    оплаты обходятся одним заголовком, строки читаются при первом обращении,
+    а сохранение заказа с незагруженными строками обновляет только заголовок.
+    Строки читаются отдельным запросом: если заказ изменили между чтением
+    заголовка и строк, сохранение такой копии отклонит проверка версии.
+    """
+    
+    def __init__(
+        self,
+        path: str,
+        cached_statements: int = 64,
+        outbox: bool = False,
+        lazy_lines: bool = False
+    ):
+        """
+        Args:
+            path: путь к файлу базы данных
+            cached_statements: размер кэша подготовленных выражений соединения
+            outbox: сохранять доменные события в таблицу outbox
+            lazy_lines: загружать строки заказов при первом обращении
+        """
+        self._path = path
+        self._cached_statements = cached_statements
+        self._lazy_lines = lazy_lines
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        
+        with self._connection() as connection:
+            connection.executescript(_SCHEMA)
+        
+        self.outbox = SqliteOutbox(self) if outbox else None
+    
+    def _connection(self) -> sqlite3.Connection:
+        """Возвращает соединение текущего потока, создавая его при первом вызове"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self._path,
+                cached_statements=self._cached_statements,
+                check_same_thread=False
+            )
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            connection.execute("PRAGMA foreign_keys = ON")
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+    
+    def close(self) -> None:
+        """Закрывает соединения всех потоков"""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+        self._local = threading.local()
+    
+    def get_by_id(self, order_id: UUID) -> Optional[Order]:
+        connection = self._connection()
+        key = order_id.bytes
+        header = connection.execute(_SELECT_ORDER, (key,)).fetchone()
+        if header is None:
+            return None
+        if self._lazy_lines:
+            return self._lazy_order_from_row(header)
+        return _order_from_row(header, self._load_lines(key))
+    
+    def _load_lines(self, key: bytes) -> List[OrderLine]:
+        """Загружает строки заказа (соединением потока, который к ним обратился)"""
+        rows = self._connection().execute(_SELECT_LINES, (key,))
+        return [_line_from_row(row) for row in rows]
+    
+    def _lazy_order_from_row(self, header: tuple) -> Order:
+        key, total, currency, line_count = header[0], header[6], header[7], header[8]
+        store = LazyLineStore(
+            partial(self._load_lines, key), line_count, Money(Decimal(total), currency)
+        )
+        return _order_from_row(header, [], store)
+    
+    def get_many(self, order_ids: Iterable[UUID]) -> Dict[UUID, Order]:
+        keys = [order_id.bytes for order_id in dict.fromkeys(order_ids)]
+        if not keys:
+            return {}
+        
+        connection = self._connection()
+        headers = {}
+        lines: Dict[bytes, List[OrderLine]] = {}
+        for batch in _batches(keys):
+            eager = []
+            for row in connection.execute(_SELECT_ORDERS_BATCH, batch):
+                headers[row[0]] = row
+                if not self._lazy_lines:
+                    lines[row[0]] = []
+                    eager.append(row[0])
+            if eager:
+                for row in connection.execute(_SELECT_LINES_BATCH, _pad(eager)):
+                    lines[row[0]].append(_line_from_row(row))
+        
+        orders = {}
+        for key in keys:
+            header = headers.get(key)
+            if header is None:
+                continue
+            if key in lines:
+                order = _order_from_row(header, lines[key])
+            else:
+                order = self._lazy_order_from_row(header)
+            orders[order.id] = order
+        return orders
+    
+    def find_by_customer(self, customer_id: UUID) -> List[Order]:
+        return self._find(_SELECT_IDS_BY_CUSTOMER, (customer_id.bytes,))
+    
+    def find_by_status(self, status: OrderStatus) -> List[Order]:
+        return self._find(_SELECT_IDS_BY_STATUS, (status.value,))
+    
+    def find_created_between(self, start: datetime, end: datetime) -> List[Order]:
+        return self._find(_SELECT_IDS_CREATED_BETWEEN, (start.timestamp(), end.timestamp()))
+    
+    def find_id_range(self, start: UUID, end: UUID) -> List[Order]:
+        # BLOB сравниваются побайтно, поэтому порядок ключей совпадает с порядком UUID.int
+        return self._find(_SELECT_IDS_IN_RANGE, (start.bytes, end.bytes))
+    
+    def _find(self, query: str, parameters: tuple) -> List[Order]:
+        """Находит ID по индексу и загружает заказы пакетами"""
+        order_ids = [
+            UUID(bytes=key) for key, in self._connection().execute(query, parameters)
+        ]
+        return list(self.get_many(order_ids).values())
+    
+    def save(self, order: Order) -> None:
+        self.save_many([order])
+    
+    def save_many(self, orders: Iterable[Order]) -> None:
+        orders = unique_orders(orders)
+        order_rows, line_rows, changed_lines = _rows(orders, version_step=1, all_lines=False)
+        if not order_rows:
+            return
+        
+        event_rows = []
+        if self.outbox is not None:
+            event_rows = [
+                encode_event(event) for order in orders for event in order.pending_events
+            ]
+        
+        connection = self._connection()
+        with connection:
+            # Строки, не прошедшие проверку версии, не изменяются
+            # и не попадают в rowcount
+            changed = connection.executemany(_UPSERT_ORDER, order_rows).rowcount
+            if changed != len(order_rows):
+                raise ConcurrencyConflictException(
+                    f"{len(order_rows) - changed} of {len(order_rows)} orders "
+                    f"were modified concurrently"
+                )
+            connection.executemany(_DELETE_LINES, changed_lines)
+            connection.executemany(_INSERT_LINE, line_rows)
+            if event_rows:
+                connection.executemany(_INSERT_EVENT, event_rows)
+        
+        for order in orders:
+            order.increment_version()
+            order.clear_events()
+    
+    def restore_many(self, orders: Iterable[Order]) -> None:
+        orders = list(orders)
+        order_rows, line_rows, changed_lines = _rows(orders, version_step=0, all_lines=True)
+        connection = self._connection()
+        with connection:
+            connection.executemany(_RESTORE_ORDER, order_rows)
+            connection.executemany(_DELETE_LINES, changed_lines)
+            connection.executemany(_INSERT_LINE, line_rows)
+
+
+class SqliteOutbox(Outbox):
+    """Outbox в таблице outbox базы SqliteOrderRepository"""
+    
+    def __init__(self, repository: SqliteOrderRepository):
+        self._repository = repository
+    
+    def fetch(self, after: int, limit: int) -> List[OutboxRecord]:
+        rows = self._repository._connection().execute(_SELECT_EVENTS, (after, limit))
+        return [
+            OutboxRecord(sequence, decode_event(event_type, payload))
+            for sequence, event_type, payload in rows
+        ]
+    
+    def acknowledge(self, sequence: int) -> None:
+        with self._repository._connection() as connection:
+            connection.execute(_DELETE_EVENTS, (sequence,))
+    
+    def pending_count(self) -> int:
+        return self._repository._connection().execute(_COUNT_EVENTS).fetchone()[0]
+
+
+def _batches(keys: Sequence[bytes]) -> Iterable[List[bytes]]:
+    """Разбивает ключи на пакеты фиксированного размера"""
+    for start in range(0, len(keys), _BATCH_SIZE):
+        yield _pad(keys[start:start + _BATCH_SIZE])
+
+
+def _pad(keys: Sequence[bytes]) -> List[bytes]:
+    """Дополняет пакет повтором последнего ключа до _BATCH_SIZE"""
+    batch = list(keys)
+    batch.extend([batch[-1]] * (_BATCH_SIZE - len(batch)))
+    return batch
+
+
+def _rows(
+    orders: List[Order], version_step: int, all_lines: bool
+) -> Tuple[List[tuple], List[tuple], List[tuple]]:
+    """
+    Строки таблиц для записи заказов
+    
+    Args:
+        orders: записываемые заказы
+        version_step: прибавка к версии заказа (1 при сохранении, 0 при загрузке)
+        all_lines: записывать и незагруженные строки (они загружаются)
+    
+    Returns:
+        (строки orders, строки order_lines, ключи заказов, чьи строки перезаписываются)
+    """
+    order_rows = []
+    line_rows = []
+    changed_lines = []
+    for order in orders:
+        key = order.id.bytes
+        lines = order.line_view
+        total = order.total_amount
+        order_rows.append((
+            key,
+            order.customer_id.bytes,
+            order.status.value,
+            order.created_timestamp,
+            order.updated_timestamp,
+            order.version + version_step,
+            str(total.amount),
+            total.currency,
+            len(lines)
+        ))
+        # Незагруженные строки не менялись: перезаписывать их не нужно
+        if not (all_lines or order.lines_loaded):
+            continue
+        changed_lines.append((key,))
+        for position, line in enumerate(lines):
+            units, scale = line.price.as_units()
+            line_rows.append((
+                key,
+                position,
+                line.product_id.bytes,
+                line.product_name,
+                units,
+                scale,
+                line.price.currency,
+                line.quantity
+            ))
+    return order_rows, line_rows, changed_lines
+
+
+def _line_from_row(row: tuple) -> OrderLine:
+    _, product_id, name, units, scale, currency, quantity = row
+    return OrderLine(
+        product_id=UUID(bytes=product_id),
+        product_name=name,
+        price=Money.from_units(units, scale, currency),
+        quantity=quantity
+    )
+
+
+def _order_from_row(
+    row: tuple,
+    lines: List[OrderLine],
+    line_store: Optional[LazyLineStore] = None
+) -> Order:
+    order_id, customer_id, status, created_at, updated_at, version = row[:6]
+    return Order.reconstitute(
+        order_id=UUID(bytes=order_id),
+        customer_id=UUID(bytes=customer_id),
+        lines=lines,
+        status=_STATUSES[status],
+        created_timestamp=created_at,
+        updated_timestamp=updated_at,
+        line_store=line_store,
+        version=version
+    )
@@ -0,0 +1,257 @@
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+from uuid import UUID
+
+from domain.order_aggregate import Order
+from domain.order_status import OrderStatus
+from domain.domain_exceptions import ConcurrencyConflictException
+from application.interfaces import OrderRepository
+
+
+@dataclass
+class WriteBehindStats:
+    """Счетчики отложенной записи"""
+    saves: int = 0
+    writes: int = 0
+    flushes: int = 0
+    failures: int = 0
+
+
+class FlushError(Exception):
+    """
+    Часть заказов не удалось записать в обернутый репозиторий
+    
+    failures содержит исключение для каждого такого заказа. Заказы
+    с конфликтом версий отбрасываются (их нужно перечитать и изменить
+    заново), остальные остаются в буфере и записываются следующим сбросом.
+    """
+    
+    def __init__(self, failures: Dict[UUID, Exception]):
+        super().__init__(f"Failed to write {len(failures)} order(s)")
+        self.failures = failures
+
+
+class WriteBehindOrderRepository(OrderRepository):
+    """
+    Декоратор репозитория с отложенной пакетной записью
+    
+    save только помещает заказ в буфер измененных заказов; повторные
+    сохранения одного заказа до сброса сливаются в одну запись последнего
+    состояния. Буфер сбрасывается в обернутый репозиторий одним вызовом
+    save_many, когда в нем накопилось max_pending заказов, когда с прошлого
+    сброса прошло flush_interval секунд, и при явном вызове flush().
+    
+    Чтение по ID видит заказы из буфера, запросы find_* сначала сбрасывают
+    буфер. Долговечным состояние становится только после сброса: заказы
+    в буфере теряются при падении процесса.
+    """
+    
+    def __init__(
+        self,
+        repository: OrderRepository,
+        max_pending: int = 500,
+        flush_interval: Optional[float] = 1.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            repository: оборачиваемый репозиторий
+            max_pending: число заказов в буфере, при котором save сбрасывает его
+            flush_interval: максимальное время между сбросами в секундах
+                (None - только по размеру и явному flush)
+            clock: источник монотонного времени (для тестов)
+        """
+        if max_pending < 1:
+            raise ValueError("max_pending must be positive")
+        
+        self._repository = repository
+        self._max_pending = max_pending
+        self._flush_interval = flush_interval
+        self._clock = clock
+        self._dirty: Dict[UUID, Order] = {}
+        # Заказы сбрасываемого пакета остаются видимы для чтения до конца записи
+        self._flushing: Dict[UUID, Order] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._last_flush = clock()
+        # Ошибки фоновых сбросов, которые еще не переданы вызывающему
+        self._unreported: Dict[UUID, Exception] = {}
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.stats = WriteBehindStats()
+        # События сохраняет обернутый репозиторий при сбросе
+        self.outbox = repository.outbox
+    
+    def __len__(self) -> int:
+        """Число заказов, ожидающих записи"""
+        return len(self._dirty) + len(self._flushing)
+    
+    def get_by_id(self, order_id: UUID) -> Optional[Order]:
+        with self._lock:
+            order = self._dirty.get(order_id) or self._flushing.get(order_id)
+        if order is not None:
+            return order
+        return self._repository.get_by_id(order_id)
+    
+    def get_many(self, order_ids: Iterable[UUID]) -> Dict[UUID, Order]:
+        order_ids = list(dict.fromkeys(order_ids))
+        buffered = {}
+        with self._lock:
+            for order_id in order_ids:
+                order = self._dirty.get(order_id) or self._flushing.get(order_id)
+                if order is not None:
+                    buffered[order_id] = order
+        missing = [order_id for order_id in order_ids if order_id not in buffered]
+        loaded = self._repository.get_many(missing) if missing else {}
+        return {
+            order_id: buffered.get(order_id) or loaded[order_id]
+            for order_id in order_ids
+            if order_id in buffered or order_id in loaded
+        }
+    
+    def save(self, order: Order) -> None:
+        self.save_many([order])
+    
+    def save_many(self, orders: Iterable[Order]) -> None:
+        """
+        Помещает заказы в буфер и сбрасывает его при достижении порога
+        
+        Raises:
+            ConcurrencyConflictException: в буфере другой объект того же заказа
+            FlushError: сброс, вызванный этим сохранением, записал не все заказы
+        """
+        orders = list(orders)
+        with self._lock:
+            dirty = self._dirty
+            for order in orders:
+                buffered = dirty.get(order.id) or self._flushing.get(order.id)
+                if buffered is not None and buffered is not order:
+                    raise ConcurrencyConflictException(
+                        f"Order {order.id} was modified concurrently"
+                    )
+            for order in orders:
+                dirty[order.id] = order
+            self.stats.saves += len(orders)
+            due = len(dirty) >= self._max_pending or (
+                self._flush_interval is not None
+                and self._clock() - self._last_flush >= self._flush_interval
+            )
+        if due:
+            self.flush()
+    
+    def flush(self) -> int:
+        """
+        Записывает буфер в обернутый репозиторий
+        
+        Пакет записывается одним save_many; если он отклонен, заказы
+        записываются по одному, чтобы ошибка одного заказа не задерживала
+        остальные.
+        
+        Returns:
+            число записанных заказов
+        
+        Raises:
+            FlushError: часть заказов не записана (включая ошибки
+                предыдущих фоновых сбросов)
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch = self._flushing = self._dirty
+                self._dirty = {}
+                self._last_flush = self._clock()
+            failures = self._write(list(batch.values()))
+            with self._lock:
+                self._flushing = {}
+                # Заказы с временной ошибкой возвращаются в буфер, если
+                # их не сохранили заново за время записи
+                for order_id, error in failures.items():
+                    if not isinstance(error, ConcurrencyConflictException):
+                        self._dirty.setdefault(order_id, batch[order_id])
+                written = len(batch) - len(failures)
+                self.stats.flushes += 1
+                self.stats.writes += written
+                self.stats.failures += len(failures)
+                unreported, self._unreported = self._unreported, {}
+        if failures or unreported:
+            raise FlushError({**unreported, **failures})
+        return written
+    
+    def _write(self, orders: List[Order]) -> Dict[UUID, Exception]:
+        """Записывает пакет и возвращает ошибки по ID заказов"""
+        if not orders:
+            return {}
+        try:
+            self._repository.save_many(orders)
+            return {}
+        except Exception:
+            pass
+        failures = {}
+        for order in orders:
+            try:
+                self._repository.save(order)
+            except Exception as e:
+                failures[order.id] = e
+        return failures
+    
+    def restore_many(self, orders: Iterable[Order]) -> None:
+        """Сбрасывает буфер и загружает заказы в обернутый репозиторий"""
+        self.flush()
+        self._repository.restore_many(orders)
+    
+    def iter_orders(self) -> Iterator[Order]:
+        self.flush()
+        return self._repository.iter_orders()
+    
+    def start(self) -> None:
+        """Запускает фоновый поток, сбрасывающий буфер каждые flush_interval секунд"""
+        if self._flush_interval is None:
+            raise ValueError("flush_interval is required for background flushing")
+        if self._thread is not None:
+            raise RuntimeError("Background flushing is already running")
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Останавливает фоновый поток и сбрасывает оставшиеся заказы
+        
+        Raises:
+            FlushError: часть заказов не записана
+        """
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+    
+    def _run(self) -> None:
+        """Фоновый поток: ошибки сбросов передаются следующему flush()"""
+        while not self._stopping.wait(self._flush_interval):
+            try:
+                self.flush()
+            except FlushError as e:
+                with self._lock:
+                    self._unreported.update(e.failures)
+            except Exception:
+                with self._lock:
+                    self.stats.failures += 1
+    
+    def find_by_customer(self, customer_id: UUID) -> List[Order]:
+        self.flush()
+        return self._repository.find_by_customer(customer_id)
+    
+    def find_by_status(self, status: OrderStatus) -> List[Order]:
+        self.flush()
+        return self._repository.find_by_status(status)
+    
+    def find_created_between(self, start: datetime, end: datetime) -> List[Order]:
+        self.flush()
+        return self._repository.find_created_between(start, end)
+    
+    def find_id_range(self, start: UUID, end: UUID) -> List[Order]:
+        self.flush()
+        return self._repository.find_id_range(start, end)
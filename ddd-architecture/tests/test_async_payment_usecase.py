@@ -0,0 +1,170 @@
+import asyncio
+import pytest
+from decimal import Decimal
+from uuid import uuid4
+
+from domain.order_aggregate import Order, OrderLine
+from domain.money import Money
+from domain.order_status import OrderStatus
+from application.async_pay_order_usecase import AsyncPayOrderUseCase
+from infrastructure.order_repository import AsyncInMemoryOrderRepository
+from infrastructure.payment_gateway import AsyncFakePaymentGateway
+
+
+def create_order() -> Order:
+    """Создает тестовый заказ с одной строкой"""
+    order = Order()
+    order.add_line(OrderLine(
+        product_id=uuid4(),
+        product_name="Test Product",
+        price=Money(Decimal("25.00")),
+        quantity=3
+    ))
+    return order
+
+
+class CopyingRepository(AsyncInMemoryOrderRepository):
+    """Репозиторий, который, как внешнее хранилище, отдает копии заказов"""
+    
+    async def get_by_id(self, order_id):
+        await asyncio.sleep(0)
+        order = await super().get_by_id(order_id)
+        return order.clone() if order is not None else None
+    
+    async def save(self, order):
+        await super().save(order)
+        self._storage[order.id] = order.clone()
+
+
+class FailingPaidSaveRepository(CopyingRepository):
+    """Репозиторий, который не может сохранить оплаченный заказ, пока fail=True"""
+    
+    fail = True
+    
+    async def save(self, order):
+        if self.fail and order.status == OrderStatus.PAID:
+            raise ConnectionError("database unavailable")
+        await super().save(order)
+
+
+class TestAsyncPayOrderUseCase:
+    """Тесты для асинхронного use-case оплаты заказа"""
+    
+    def test_successful_payment(self):
+        """Тест успешной асинхронной оплаты"""
+        async def scenario():
+            repository = AsyncInMemoryOrderRepository()
+            gateway = AsyncFakePaymentGateway()
+            order = create_order()
+            await repository.save(order)
+            use_case = AsyncPayOrderUseCase(repository, gateway)
+            
+            result = await use_case.execute(order.id)
+            stored = await repository.get_by_id(order.id)
+            return result, stored, gateway
+        
+        result, stored, gateway = asyncio.run(scenario())
+        
+        assert result.success is True
+        assert stored.status == OrderStatus.PAID
+        assert gateway.processed_payments[0]['amount'].amount == Decimal("75.00")
+    
+    def test_declined_payment_restores_status(self):
+        """Тест: при отказе шлюза заказ остается неоплаченным"""
+        async def scenario():
+            repository = AsyncInMemoryOrderRepository()
+            order = create_order()
+            await repository.save(order)
+            use_case = AsyncPayOrderUseCase(repository, AsyncFakePaymentGateway(always_succeed=False))
+            
+            result = await use_case.execute(order.id)
+            return result, await repository.get_by_id(order.id)
+        
+        result, stored = asyncio.run(scenario())
+        
+        assert result.success is False
+        assert stored.status == OrderStatus.DRAFT
+    
+    def test_concurrent_payments_charge_once(self):
+        """Тест: из параллельных оплат одного заказа до шлюза доходит одна"""
+        async def scenario():
+            repository = CopyingRepository()
+            gateway = AsyncFakePaymentGateway(latency=0.001)
+            order = create_order()
+            await repository.save(order)
+            use_case = AsyncPayOrderUseCase(repository, gateway)
+            
+            results = await asyncio.gather(
+                *(use_case.execute(order.id) for _ in range(5))
+            )
+            return results, await repository.get_by_id(order.id), gateway
+        
+        results, stored, gateway = asyncio.run(scenario())
+        
+        assert [result.success for result in results].count(True) == 1
+        assert len(gateway.processed_payments) == 1
+        assert stored.status == OrderStatus.PAID
+    
+    def test_unrecorded_payment_keeps_transaction_and_recovers(self):
+        """Тест: списание без сохранения возвращает ID транзакции и восстанавливается"""
+        async def scenario():
+            repository = FailingPaidSaveRepository()
+            order = create_order()
+            await repository.save(order)
+            use_case = AsyncPayOrderUseCase(repository, AsyncFakePaymentGateway())
+            
+            result = await use_case.execute(order.id)
+            pending_status = (await repository.get_by_id(order.id)).status
+            repeated = await use_case.execute(order.id)
+            
+            repository.fail = False
+            recovered = await use_case.recover_pending(order.id, result.transaction_id)
+            return result, pending_status, repeated, recovered, await repository.get_by_id(order.id)
+        
+        result, pending_status, repeated, recovered, stored = asyncio.run(scenario())
+        
+        assert result.success is True
+        assert result.transaction_id
+        assert "not recorded" in result.message
+        assert pending_status == OrderStatus.PENDING
+        assert repeated.success is False
+        assert recovered.success is True
+        assert recovered.transaction_id == result.transaction_id
+        assert stored.status == OrderStatus.PAID
+    
+    def test_execute_many_respects_concurrency_limit(self):
+        """Тест: число одновременных платежей не превышает лимит"""
+        in_flight = 0
+        peak = 0
+        
+        class TrackingGateway(AsyncFakePaymentGateway):
+            async def charge(self, order_id, amount):
+                nonlocal in_flight, peak
+                in_flight += 1
+                peak = max(peak, in_flight)
+                try:
+                    return await super().charge(order_id, amount)
+                finally:
+                    in_flight -= 1
+        
+        async def scenario():
+            repository = AsyncInMemoryOrderRepository()
+            orders = [create_order() for _ in range(20)]
+            for order in orders:
+                await repository.save(order)
+            use_case = AsyncPayOrderUseCase(
+                repository, TrackingGateway(latency=0.001), max_concurrency=5
+            )
+            return orders, await use_case.execute_many(o.id for o in orders)
+        
+        orders, results = asyncio.run(scenario())
+        
+        assert all(results[o.id].success for o in orders)
+        assert 1 < peak <= 5
+    
+    def test_invalid_concurrency_limit(self):
+        """Тест: лимит конкурентности должен быть положительным"""
+        with pytest.raises(ValueError):
+            AsyncPayOrderUseCase(
+                AsyncInMemoryOrderRepository(), AsyncFakePaymentGateway(), max_concurrency=0
+            )
@@ -0,0 +1,35 @@
+from benchmarks import hot_path_benchmark
+
+
+class TestHotPathBenchmark:
+    """Тесты набора бенчмарков горячих путей"""
+    
+    def test_run_produces_all_results(self):
+        """Тест: прогон возвращает метрики для каждого бенчмарка"""
+        # Act
+        report = hot_path_benchmark.run(repeat=1, orders=10)
+        
+        # Assert
+        results = report["results"]
+        assert "pay_order.execute" in results
+        assert "order.add_line[10000]" in results
+        assert all(values["ops_per_sec"] > 0 for values in results.values())
+    
+    def test_compare_reports_regressions(self):
+        """Тест: замедление больше допуска считается регрессией"""
+        # Arrange
+        baseline = {"results": {
+            "fast": {"seconds_per_op": 1.0},
+            "slow": {"seconds_per_op": 1.0},
+        }}
+        current = {"results": {
+            "fast": {"seconds_per_op": 1.1},
+            "slow": {"seconds_per_op": 1.5},
+            "new": {"seconds_per_op": 9.0},
+        }}
+        
+        # Act
+        regressions = hot_path_benchmark.compare(current, baseline, tolerance=0.2)
+        
+        # Assert
+        assert regressions == ["slow"]
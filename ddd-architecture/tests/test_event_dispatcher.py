@@ -0,0 +1,125 @@
+import threading
+import time
+import pytest
+from uuid import uuid4
+
+from domain.domain_events import LineRemoved
+from application.event_dispatcher import OutboxDispatcher
+from infrastructure.outbox import InMemoryOutbox
+
+
+class CountingOutbox(InMemoryOutbox):
+    """Outbox, считающий прочитанные пакеты"""
+    
+    def __init__(self):
+        super().__init__()
+        self.fetched_batches = 0
+    
+    def fetch(self, after, limit):
+        records = super().fetch(after, limit)
+        if records:
+            self.fetched_batches += 1
+        return records
+
+
+def fill_outbox(count: int) -> CountingOutbox:
+    outbox = CountingOutbox()
+    outbox.append(LineRemoved(uuid4(), float(i), uuid4()) for i in range(count))
+    return outbox
+
+
+def wait_until(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition was not met in time"
+        time.sleep(0.005)
+
+
+class TestOutboxDispatcher:
+    """Тесты доставки событий из outbox"""
+    
+    def test_dispatch_pending_in_batches(self):
+        """Тест: события доставляются пакетами по порядку и подтверждаются"""
+        # Arrange
+        outbox = fill_outbox(25)
+        batches = []
+        dispatcher = OutboxDispatcher(outbox, batches.append, batch_size=10)
+        
+        # Act
+        delivered = dispatcher.dispatch_pending()
+        
+        # Assert
+        assert delivered == 25
+        assert [len(batch) for batch in batches] == [10, 10, 5]
+        assert [event.occurred_at for batch in batches for event in batch] == list(range(25))
+        assert outbox.pending_count() == 0
+    
+    def test_failed_batch_stays_in_outbox(self):
+        """Тест: пакет, который обработчик не принял, не подтверждается"""
+        # Arrange
+        outbox = fill_outbox(5)
+        
+        def reject(events):
+            raise ConnectionError("broker is down")
+        
+        dispatcher = OutboxDispatcher(outbox, reject, batch_size=2)
+        
+        # Act
+        with pytest.raises(ConnectionError):
+            dispatcher.dispatch_pending()
+        
+        # Assert
+        assert outbox.pending_count() == 5
+    
+    def test_background_delivery_with_backpressure(self):
+        """Тест: при медленном обработчике в памяти не больше max_pending_batches пакетов"""
+        # Arrange
+        outbox = fill_outbox(100)
+        release = threading.Event()
+        received = []
+        
+        def slow_handler(events):
+            release.wait()
+            received.extend(events)
+        
+        dispatcher = OutboxDispatcher(
+            outbox, slow_handler, batch_size=5, max_pending_batches=2, poll_interval=0.01
+        )
+        
+        # Act
+        dispatcher.start()
+        time.sleep(0.1)
+        fetched_while_blocked = outbox.fetched_batches
+        release.set()
+        wait_until(lambda: outbox.pending_count() == 0)
+        dispatcher.stop()
+        
+        # Assert
+        # Пакет у обработчика, два в очереди и один ждет места в очереди
+        assert fetched_while_blocked == 4
+        assert [event.occurred_at for event in received] == list(range(100))
+        assert dispatcher.delivered == 100
+    
+    def test_background_delivery_retries_failures(self):
+        """Тест: пакет повторяется после ошибки обработчика"""
+        # Arrange
+        outbox = fill_outbox(6)
+        calls = []
+        
+        def flaky_handler(events):
+            calls.append(len(events))
+            if len(calls) == 1:
+                raise ConnectionError("temporary failure")
+        
+        dispatcher = OutboxDispatcher(
+            outbox, flaky_handler, batch_size=3, poll_interval=0.01, sleep=lambda _: None
+        )
+        
+        # Act
+        dispatcher.start()
+        wait_until(lambda: outbox.pending_count() == 0)
+        dispatcher.stop()
+        
+        # Assert
+        assert calls == [3, 3, 3]
+        assert dispatcher.failures == 1
@@ -0,0 +1,303 @@
+import os
+import pytest
+from decimal import Decimal
+from uuid import uuid4
+
+from domain.order_aggregate import Order, OrderLine
+from domain.money import Money
+from domain.order_status import OrderStatus
+from domain.domain_events import LineAdded, OrderPaid
+from infrastructure.event_log_repository import EventLogOrderRepository
+
+
+def make_line(price: str = "10.00", quantity: int = 1) -> OrderLine:
+    return OrderLine(
+        product_id=uuid4(),
+        product_name="Товар",
+        price=Money(Decimal(price)),
+        quantity=quantity
+    )
+
+
+def make_order() -> Order:
+    """Заказ с одной строкой, добавленной событием"""
+    order = Order()
+    order.add_line(make_line())
+    return order
+
+
+class TestEventLogOrderRepository:
+    """Тесты для репозитория на журнале событий"""
+    
+    @pytest.fixture
+    def path(self, tmp_path):
+        return str(tmp_path / "orders.log")
+    
+    def reopen(self, repository: EventLogOrderRepository, path: str, **kwargs):
+        repository.close()
+        return EventLogOrderRepository(path, **kwargs)
+    
+    def test_mutations_survive_restart(self, path):
+        """Тест: добавление, удаление строк и оплата восстанавливаются из журнала"""
+        # Arrange
+        repository = EventLogOrderRepository(path)
+        order = Order()
+        first, second = make_line("1.5", 2), make_line("3.25")
+        order.add_line(first)
+        repository.save(order)
+        
+        # Act
+        order.add_line(second)
+        order.remove_line(first.product_id)
+        repository.save(order)
+        order.pay()
+        repository.save(order)
+        restored = self.reopen(repository, path).get_by_id(order.id)
+        
+        # Assert
+        assert restored.lines == [second]
+        assert restored.status == OrderStatus.PAID
+        assert restored.total_amount == Money(Decimal("3.25"))
+        assert restored.customer_id == order.customer_id
+        assert restored.updated_timestamp == order.updated_timestamp
+    
+    def test_small_records_are_appended(self, path):
+        """Тест: изменение заказа дописывает небольшую запись, а не весь заказ"""
+        # Arrange
+        repository = EventLogOrderRepository(path)
+        order = Order(lines=[make_line() for _ in range(50)])
+        repository.save(order)
+        size_after_create = os.path.getsize(path)
+        
+        # Act
+        order.pay()
+        repository.save(order)
+        
+        # Assert
+        assert os.path.getsize(path) - size_after_create < 64
+    
+    def test_snapshot_compacts_log(self, path):
+        """Тест: снимок очищает журнал и не теряет заказы"""
+        # Arrange
+        repository = EventLogOrderRepository(path, snapshot_every=10)
+        orders = [Order(lines=[make_line()]) for _ in range(25)]
+        
+        # Act
+        for order in orders:
+            repository.save(order)
+        restored = self.reopen(repository, path)
+        
+        # Assert
+        assert os.path.exists(path + ".snapshot")
+        for order in orders:
+            assert restored.get_by_id(order.id).lines == order.lines
+    
+    def test_version_survives_restart(self, path):
+        """Тест: версия заказа восстанавливается из журнала и снимка"""
+        # Arrange
+        repository = EventLogOrderRepository(path)
+        order = Order(lines=[make_line()])
+        for _ in range(3):
+            repository.save(order)
+        
+        # Act
+        restored = self.reopen(repository, path)
+        restored.snapshot()
+        restored_again = self.reopen(restored, path)
+        
+        # Assert
+        assert restored.get_by_id(order.id).version == 3
+        assert restored_again.get_by_id(order.id).version == 3
+    
+    def test_torn_tail_is_discarded(self, path):
+        """Тест: недописанная запись в конце журнала отбрасывается"""
+        # Arrange
+        repository = EventLogOrderRepository(path)
+        order = Order(lines=[make_line()])
+        repository.save(order)
+        repository.close()
+        with open(path, "ab") as log:
+            log.write(b"\x40\x00\x00\x00garbage")
+        
+        # Act
+        repository = EventLogOrderRepository(path)
+        second = Order(lines=[make_line()])
+        repository.save(second)
+        restored = self.reopen(repository, path)
+        
+        # Assert
+        assert restored.get_by_id(order.id) == order
+        assert restored.get_by_id(second.id).lines == second.lines
+    
+    def test_quantity_change_survives_restart(self, path):
+        """Тест: изменение количества записывается событием и восстанавливается"""
+        # Arrange
+        repository = EventLogOrderRepository(path)
+        line = make_line("2.00", 1)
+        order = Order(lines=[line, make_line()])
+        repository.save(order)
+        
+        # Act
+        order.change_quantity(line.product_id, 5)
+        repository.save(order)
+        restored = self.reopen(repository, path).get_by_id(order.id)
+        
+        # Assert
+        assert restored.find_line(line.product_id).quantity == 5
+        assert restored.total_amount == Money(Decimal("20.00"))
+        assert restored.version == 2
+    
+    def test_copy_without_events_is_written_in_full(self, path):
+        """Тест: копия заказа без событий записывается целиком, изменения не теряются"""
+        # Arrange
+        repository = EventLogOrderRepository(path)
+        order = Order(lines=[make_line()])
+        repository.save(order)
+        
+        # Act
+        order.add_line(make_line("5.00"))
+        copy = order.clone()
+        repository.save(copy)
+        restored = self.reopen(repository, path).get_by_id(order.id)
+        
+        # Assert
+        assert restored.lines == copy.lines
+    
+    def test_failed_log_write_keeps_state_consistent(self, path):
+        """Тест: после ошибки записи журнала изменение записывается следующим сохранением"""
+        # Arrange
+        repository = EventLogOrderRepository(path)
+        order = Order(lines=[make_line()])
+        repository.save(order)
+        size = os.path.getsize(path)
+        added = make_line("7.00")
+        order.add_line(added)
+        log = repository._log
+        repository._log = FailingFile(log)
+        
+        # Act
+        with pytest.raises(OSError):
+            repository.save(order)
+        size_after_failure = os.path.getsize(path)
+        repository._log = log
+        repository.save(order)
+        restored = self.reopen(repository, path).get_by_id(order.id)
+        
+        # Assert
+        assert size_after_failure == size
+        assert order.version == 2
+        assert restored.lines == order.lines
+        assert restored.find_line(added.product_id) == added
+    
+    def test_repeated_order_in_batch_is_logged_once(self, path):
+        """Тест: повтор заказа в пакете не дублирует его записи в журнале"""
+        # Arrange
+        repository = EventLogOrderRepository(path)
+        order = Order(lines=[make_line("1.00")])
+        repository.save(order)
+        
+        # Act
+        order.add_line(make_line("2.00"))
+        repository.save_many([order, order])
+        restored = self.reopen(repository, path).get_by_id(order.id)
+        
+        # Assert
+        assert restored.lines == order.lines
+        assert restored.total_amount == Money(Decimal("3.00"))
+        assert restored.version == order.version == 2
+    
+    def test_restored_orders_share_repeated_ids(self, path):
+        """Тест: восстановленные заказы одного покупателя разделяют число ID"""
+        # Arrange
+        repository = EventLogOrderRepository(path)
+        customer_id = uuid4()
+        first, second = Order(customer_id=customer_id), Order(customer_id=customer_id)
+        repository.save_many([first, second])
+        
+        # Act
+        restored = self.reopen(repository, path)
+        
+        # Assert
+        assert (
+            restored.get_by_id(first.id).customer_key
+            is restored.get_by_id(second.id).customer_key
+        )
+    
+    def test_outbox_survives_restart(self, path):
+        """Тест: недоставленные события и номера outbox восстанавливаются из журнала"""
+        # Arrange
+        repository = EventLogOrderRepository(path, outbox=True)
+        first, second = make_order(), make_order()
+        repository.save_many([first, second])
+        first.pay()
+        repository.save(first)
+        delivered = repository.outbox.fetch(0, 1)[0]
+        repository.outbox.acknowledge(delivered.sequence)
+        pending = repository.outbox.fetch(0, 10)
+        
+        # Act
+        restored = self.reopen(repository, path, outbox=True)
+        restored_pending = restored.outbox.fetch(0, 10)
+        loaded = restored.get_by_id(second.id)
+        loaded.pay()
+        restored.save(loaded)
+        
+        # Assert
+        assert restored_pending == pending
+        assert [type(record.event) for record in restored_pending] == [LineAdded, OrderPaid]
+        assert restored.outbox.fetch(0, 10)[-1].sequence == pending[-1].sequence + 1
+    
+    def test_snapshot_keeps_outbox(self, path):
+        """Тест: снимок сохраняет недоставленные события и последний номер"""
+        # Arrange
+        repository = EventLogOrderRepository(path, outbox=True)
+        repository.save_many([make_order() for _ in range(3)])
+        records = repository.outbox.fetch(0, 10)
+        repository.outbox.acknowledge(records[0].sequence)
+        
+        # Act
+        repository.snapshot()
+        restored = self.reopen(repository, path, outbox=True)
+        pending = restored.outbox.fetch(0, 10)
+        restored.outbox.acknowledge(pending[-1].sequence)
+        restored.snapshot()
+        emptied = self.reopen(restored, path, outbox=True)
+        emptied.save(make_order())
+        
+        # Assert
+        assert pending == records[1:]
+        assert emptied.outbox.fetch(0, 10)[0].sequence == records[-1].sequence + 1
+    
+    def test_torn_batch_is_discarded_whole(self, path):
+        """Тест: недописанный пакет не восстанавливает ни заказы, ни события"""
+        # Arrange
+        repository = EventLogOrderRepository(path, outbox=True)
+        kept = make_order()
+        repository.save(kept)
+        batch = [make_order() for _ in range(3)]
+        repository.save_many(batch)
+        repository.close()
+        os.truncate(path, os.path.getsize(path) - 1)
+        
+        # Act
+        restored = EventLogOrderRepository(path, outbox=True)
+        
+        # Assert
+        assert restored.get_by_id(kept.id) == kept
+        assert all(restored.get_by_id(order.id) is None for order in batch)
+        assert restored.outbox.pending_count() == 1
+
+
+class FailingFile:
+    """Файл журнала, запись в который обрывается ошибкой"""
+    
+    def __init__(self, file):
+        self._file = file
+    
+    def write(self, data):
+        self._file.write(data[:5])
+        self._file.flush()
+        raise OSError("disk full")
+    
+    def __getattr__(self, name):
+        return getattr(self._file, name)
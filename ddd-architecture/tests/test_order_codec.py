@@ -0,0 +1,130 @@
+import mmap
+import pytest
+from decimal import Decimal
+from uuid import uuid4
+
+from domain.money import Money
+from domain.order_aggregate import Order, OrderLine
+from domain.order_status import OrderStatus
+from infrastructure.caching_repository import CachingOrderRepository
+from infrastructure.event_log_repository import EventLogOrderRepository
+from infrastructure.order_repository import InMemoryOrderRepository
+from infrastructure.sharded_order_repository import ShardedOrderRepository
+from infrastructure.sqlite_order_repository import SqliteOrderRepository
+from infrastructure.order_codec import (
+    decode_orders,
+    encode_orders,
+    iter_encoded,
+    restore_repository,
+    snapshot_repository
+)
+
+
+def make_order(lines: int = 3, currency: str = "USD") -> Order:
+    return Order(lines=[
+        OrderLine(
+            product_id=uuid4(),
+            product_name=f"Товар {i}",
+            price=Money(Decimal("19.99") + i, currency),
+            quantity=i + 1
+        )
+        for i in range(lines)
+    ])
+
+
+class TestOrderCodec:
+    """Тесты бинарного кодека заказов"""
+    
+    def test_round_trip(self):
+        """Тест: декодированный заказ совпадает с исходным"""
+        # Arrange
+        order = make_order(currency="JPY")
+        order.pay()
+        empty = Order()
+        
+        # Act
+        decoded, decoded_empty = decode_orders(encode_orders([order, empty]))
+        
+        # Assert
+        assert decoded.id == order.id
+        assert decoded.customer_id == order.customer_id
+        assert decoded.status == OrderStatus.PAID
+        assert decoded.lines == order.lines
+        assert decoded.total_amount == order.total_amount
+        assert decoded.created_timestamp == order.created_timestamp
+        assert decoded_empty.lines == []
+    
+    def test_lazy_view_reads_header_only(self):
+        """Тест: ленивое представление отдает поля заголовка без разбора строк"""
+        # Arrange
+        orders = [make_order(lines=100) for _ in range(3)]
+        data = encode_orders(orders)
+        
+        # Act
+        views = list(iter_encoded(data))
+        
+        # Assert
+        assert [view.id for view in views] == [order.id for order in orders]
+        assert all(view.line_count == 100 for view in views)
+        assert sum(view.size for view in views) == len(data) - 9
+    
+    def test_rejects_unknown_data_and_huge_prices(self):
+        """Тест: чужие данные и цены вне диапазона формата отклоняются"""
+        # Arrange
+        order = Order(lines=[OrderLine(uuid4(), "Big", Money(Decimal("100000000000000000000")), 1)])
+        
+        # Act / Assert
+        with pytest.raises(ValueError):
+            list(iter_encoded(b"NOPE\x01\x00\x00\x00\x00"))
+        with pytest.raises(ValueError):
+            encode_orders([order])
+    
+    def test_repository_snapshot_and_restore(self, tmp_path):
+        """Тест: снимок репозитория восстанавливается с версиями и индексами"""
+        # Arrange
+        repository = InMemoryOrderRepository()
+        orders = [make_order() for _ in range(50)]
+        repository.save_many(orders)
+        orders[0].pay()
+        repository.save(orders[0])
+        path = tmp_path / "orders.snapshot"
+        path.write_bytes(snapshot_repository(repository))
+        
+        # Act
+        with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            restored = restore_repository(data)
+        
+        # Assert
+        assert restored.get_by_id(orders[0].id).version == 2
+        assert [o.id for o in restored.find_by_status(OrderStatus.PAID)] == [orders[0].id]
+        assert restored.get_many(o.id for o in orders).keys() == {o.id for o in orders}
+    
+    @pytest.mark.parametrize("factory", [
+        lambda path: ShardedOrderRepository(shards=4),
+        lambda path: CachingOrderRepository(ShardedOrderRepository(shards=4)),
+        lambda path: SqliteOrderRepository(str(path / "orders.db"), lazy_lines=True),
+        lambda path: EventLogOrderRepository(str(path / "orders.log")),
+    ], ids=["sharded", "caching", "sqlite", "event_log"])
+    def test_snapshot_between_repository_types(self, tmp_path, factory):
+        """Тест: снимок переносится между репозиториями через публичные методы"""
+        # Arrange
+        (tmp_path / "source").mkdir()
+        (tmp_path / "target").mkdir()
+        source = factory(tmp_path / "source")
+        orders = [make_order() for _ in range(10)]
+        source.save_many(orders)
+        orders[0].pay()
+        source.save(orders[0])
+        data = snapshot_repository(source)
+        
+        # Act
+        target = restore_repository(data, factory(tmp_path / "target"))
+        
+        # Assert
+        restored = target.get_by_id(orders[0].id)
+        assert restored.version == 2
+        assert restored.lines == orders[0].lines
+        assert [o.id for o in target.find_by_status(OrderStatus.PAID)] == [orders[0].id]
+        assert sorted(o.id.int for o in target.iter_orders()) == sorted(o.id.int for o in orders)
+        target.save(restored)
+        assert target.get_by_id(orders[0].id).version == 3
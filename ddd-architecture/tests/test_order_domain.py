@@ -1,17 +1,104 @@
 import pytest
+import random
+from datetime import datetime
 from decimal import Decimal
 from uuid import uuid4
 
 from domain.order_status import OrderStatus
-from domain.money import Money
+from domain.money import Money, MoneyAccumulator
 from domain.order_aggregate import Order, OrderLine
+from domain.line_store import ColumnarLineStore, LazyLineStore, ListLineStore
+from domain.domain_events import LineAdded, LineQuantityChanged, LineRemoved, OrderPaid
+from domain.identity import TimeOrderedIdProvider, id_range
 from domain.domain_exceptions import (
     EmptyOrderException,
     OrderAlreadyPaidException,
-    OrderModificationException
+    OrderModificationException,
+    PaymentInProgressException
 )
 
 
+class TestMoney:
+    """Тесты для Value Object Money"""
+    
+    @pytest.mark.parametrize("left, right", [
+        ("10.50", "3.25"),
+        ("10.5", "0.125"),
+        ("0.00", "7"),
+        ("1E+2", "0.1"),
+        ("99999.999", "0.001"),
+    ])
+    def test_arithmetic_matches_decimal(self, left, right):
+        """Тест: целочисленная арифметика совпадает с вычислениями в Decimal"""
+        # Arrange
+        a = Money(Decimal(left))
+        b = Money(Decimal(right))
+        
+        # Act
+        total = a + b
+        product = a * 3
+        
+        # Assert
+        expected_total = Decimal(left) + Decimal(right)
+        expected_product = Decimal(left) * 3
+        assert str(total.amount) == str(expected_total)
+        assert str(product.amount) == str(expected_product)
+        assert str(total) == f"USD {expected_total:.2f}"
+        assert str(product) == f"USD {expected_product:.2f}"
+    
+    def test_money_is_immutable_value_object(self):
+        """Тест: Money неизменяемый и сравнивается по значению"""
+        # Arrange
+        money = Money(Decimal("10.5"))
+        
+        # Act & Assert
+        assert money == Money(Decimal("10.50"))
+        assert hash(money) == hash(Money(Decimal("10.50")))
+        assert money != Money(Decimal("10.50"), "EUR")
+        with pytest.raises(AttributeError):
+            money.amount = Decimal("1")
+    
+    def test_negative_amount_rejected(self):
+        """Тест: отрицательная сумма недопустима"""
+        with pytest.raises(ValueError):
+            Money(Decimal("-1"))
+        with pytest.raises(ValueError):
+            Money(Decimal("1")) * -1
+    
+    def test_zero_times_negative_quantity_matches_decimal(self):
+        """Тест: ноль на отрицательное количество допустим, как в Decimal"""
+        # Act
+        product = Money(Decimal("0.00")) * -3
+        
+        # Assert
+        assert product.amount == Decimal("0.00") * -3
+        assert product == Money(Decimal("0"))
+    
+    def test_minor_units(self):
+        """Тест перевода в минимальные единицы валюты"""
+        assert Money(Decimal("10.5")).minor_units == 1050
+        assert Money(Decimal("300"), "JPY").minor_units == 300
+        assert Money.from_minor_units(1050, "USD") == Money(Decimal("10.50"))
+        with pytest.raises(ValueError):
+            Money(Decimal("0.001")).minor_units
+    
+    def test_accumulator_sums_without_allocations(self):
+        """Тест накопителя суммы"""
+        # Arrange
+        accumulator = MoneyAccumulator()
+        
+        # Act
+        accumulator.add(Money(Decimal("1.5")), 3)
+        accumulator += Money(Decimal("0.25"))
+        accumulator.subtract(Money(Decimal("1.5")))
+        
+        # Assert
+        assert accumulator.total() == Money(Decimal("3.25"))
+        assert str(accumulator.total()) == "USD 3.25"
+        with pytest.raises(ValueError):
+            accumulator.add(Money(Decimal("1"), "EUR"))
+
+
 class TestOrderLine:
     """Тесты для OrderLine"""
     
@@ -81,6 +168,26 @@ class TestOrder:
         with pytest.raises(OrderAlreadyPaidException):
             order.pay()
     
+    def test_start_payment_claims_order_once(self):
+        """Тест: заказ в ожидании оплаты нельзя занять повторно, но можно оплатить"""
+        # Arrange
+        order = Order(lines=[OrderLine(
+            product_id=uuid4(),
+            product_name="Product",
+            price=Money(Decimal("10.00")),
+            quantity=1
+        )])
+        
+        # Act
+        order.start_payment()
+        
+        # Assert
+        assert order.status == OrderStatus.PENDING
+        with pytest.raises(PaymentInProgressException):
+            order.start_payment()
+        order.pay()
+        assert order.status == OrderStatus.PAID
+    
     def test_cannot_modify_order_after_payment(self):
         """Тест: нельзя изменить заказ после оплаты"""
         # Arrange
@@ -177,3 +284,534 @@ class TestOrder:
         # Act & Assert
         with pytest.raises(OrderModificationException):
             order.remove_line(product_id)
+    
+    def test_total_amount_is_maintained_incrementally(self):
+        """Тест: итоговая сумма обновляется при добавлении и удалении строк"""
+        # Arrange
+        order = Order()
+        product_ids = [uuid4() for _ in range(100)]
+        for i, product_id in enumerate(product_ids):
+            order.add_line(OrderLine(
+                product_id=product_id,
+                product_name=f"Product {i}",
+                price=Money(Decimal("1.25")),
+                quantity=i + 1
+            ))
+        
+        # Act
+        for product_id in product_ids[::2]:
+            order.remove_line(product_id)
+        
+        # Assert
+        expected_total = sum(
+            (line.total.amount for line in order.lines), Decimal("0")
+        )
+        assert order.total_amount.amount == expected_total
+        
+        for product_id in product_ids[1::2]:
+            order.remove_line(product_id)
+        assert order.total_amount == Money(Decimal("0"), "USD")
+    
+    def test_debug_invariants_detect_total_mismatch(self, monkeypatch):
+        """Тест: в режиме отладки расхождение суммы обнаруживается полным пересчётом"""
+        # Arrange
+        monkeypatch.setattr(Order, "debug_invariants", True)
+        order = Order()
+        order.add_line(OrderLine(
+            product_id=uuid4(),
+            product_name="Product",
+            price=Money(Decimal("10.00")),
+            quantity=1
+        ))
+        order._lines._total.add(Money(Decimal("1.00")))
+        
+        # Act & Assert
+        with pytest.raises(ValueError, match="Total amount mismatch"):
+            order._validate_invariants()
+    
+    def test_cannot_add_line_with_other_currency(self):
+        """Тест: строка в другой валюте отклоняется без изменения заказа"""
+        # Arrange
+        order = Order()
+        order.add_line(OrderLine(
+            product_id=uuid4(),
+            product_name="Product",
+            price=Money(Decimal("10.00"), "EUR"),
+            quantity=1
+        ))
+        
+        # Act & Assert
+        with pytest.raises(ValueError):
+            order.add_line(OrderLine(
+                product_id=uuid4(),
+                product_name="Product",
+                price=Money(Decimal("10.00"), "USD"),
+                quantity=1
+            ))
+        assert len(order.lines) == 1
+        assert order.total_amount == Money(Decimal("10.00"), "EUR")
+    
+    def test_domain_objects_are_slotted(self):
+        """Тест: доменные объекты не хранят __dict__ на экземпляр"""
+        # Arrange
+        order = Order()
+        line = OrderLine(
+            product_id=uuid4(),
+            product_name="Product",
+            price=Money(Decimal("1.00")),
+            quantity=1
+        )
+        order.add_line(line)
+        
+        # Assert
+        for obj in (order, line, line.price):
+            assert not hasattr(obj, "__dict__")
+        assert order.created_at <= order.updated_at
+
+
+class TestLineStores:
+    """Тесты хранилищ строк заказа"""
+    
+    @staticmethod
+    def make_lines(count, product_ids=None):
+        product_ids = product_ids or [uuid4() for _ in range(count)]
+        return [
+            OrderLine(
+                product_id=product_ids[i % len(product_ids)],
+                product_name=f"Product {i}",
+                price=Money(Decimal(f"{i % 7 + 1}.{i % 100:02d}")),
+                quantity=i % 5 + 1
+            )
+            for i in range(count)
+        ]
+    
+    @pytest.mark.parametrize("count", [3, 200])
+    def test_columnar_store_matches_list_store(self, count):
+        """Тест: колоночное хранилище ведёт себя как списочное"""
+        # Arrange
+        product_ids = [uuid4() for _ in range(count // 2 + 1)]
+        lines = self.make_lines(count, product_ids)
+        list_order = Order(line_store=ListLineStore())
+        columnar_order = Order(line_store=ColumnarLineStore())
+        
+        # Act
+        list_order.add_lines(lines)
+        columnar_order.add_lines(lines)
+        for product_id in product_ids[::3]:
+            list_order.remove_line(product_id)
+            columnar_order.remove_line(product_id)
+        
+        # Assert
+        assert columnar_order.lines == list_order.lines
+        assert columnar_order.total_amount == list_order.total_amount
+        assert columnar_order._lines.recalculate_total() == list_order.total_amount
+        bounds = dict(
+            min_price=Money(Decimal("2.005")),
+            max_price=Money(Decimal("5.50")),
+            min_quantity=2
+        )
+        assert columnar_order.filter_lines(**bounds) == list_order.filter_lines(**bounds)
+    
+    def test_columnar_store_rescales_prices(self):
+        """Тест: цена с большей точностью переводит хранилище в мелкий масштаб"""
+        # Arrange
+        store = ColumnarLineStore(self.make_lines(2))
+        precise_line = OrderLine(
+            product_id=uuid4(),
+            product_name="Precise",
+            price=Money(Decimal("0.125")),
+            quantity=4
+        )
+        expected = store.total() + precise_line.total
+        
+        # Act
+        store.append(precise_line)
+        
+        # Assert
+        assert store.total() == expected
+        assert store.to_list()[-1].price == Money(Decimal("0.125"))
+    
+    def test_empty_list_store_allocates_on_first_line(self):
+        """Тест: пустое списочное хранилище создает словарь и сумму при первой строке"""
+        # Arrange
+        store = ListLineStore()
+        line = self.make_lines(1)[0]
+        
+        # Act
+        store.extend([])
+        empty_lines = store._lines
+        
+        # Assert
+        assert empty_lines is None
+        assert len(store) == 0 and store.to_list() == []
+        assert store.find(line.product_id) is None
+        assert store.count(line.product_id) == 0
+        assert store.remove(line.product_id) == 0
+        assert store.total() == Money(Decimal("0"))
+        with pytest.raises(KeyError):
+            store.set_quantity(line.product_id, 1)
+        store.append(line)
+        assert store.to_list() == [line]
+        assert store.total() == line.total
+    
+    @pytest.mark.parametrize("store_class", [ListLineStore, ColumnarLineStore])
+    def test_bulk_add_is_atomic(self, store_class):
+        """Тест: пакет с ошибочной строкой не добавляется целиком"""
+        # Arrange
+        order = Order(line_store=store_class())
+        lines = self.make_lines(3)
+        lines.append(OrderLine(
+            product_id=uuid4(),
+            product_name="Other currency",
+            price=Money(Decimal("1.00"), "EUR"),
+            quantity=1
+        ))
+        
+        # Act & Assert
+        with pytest.raises(ValueError):
+            order.add_lines(lines)
+        assert order.lines == []
+        assert order.total_amount == Money(Decimal("0"), "USD")
+
+
+class TestDomainEvents:
+    """Тесты доменных событий заказа"""
+    
+    def make_line(self, price: str = "10.00") -> OrderLine:
+        return OrderLine(
+            product_id=uuid4(),
+            product_name="Product",
+            price=Money(Decimal(price)),
+            quantity=2
+        )
+    
+    def test_order_records_events(self):
+        """Тест: добавление, удаление строк и оплата записывают события"""
+        # Arrange
+        order = Order()
+        first, second, third = self.make_line("1.00"), self.make_line("2.00"), self.make_line()
+        
+        # Act
+        order.add_line(first)
+        order.add_lines([second, third])
+        order.remove_line(second.product_id)
+        order.pay()
+        
+        # Assert
+        events = order.pending_events
+        assert [type(event) for event in events] == [
+            LineAdded, LineAdded, LineAdded, LineRemoved, OrderPaid
+        ]
+        assert all(event.order_id == order.id for event in events)
+        assert events[0].product_id == first.product_id
+        assert events[0].price == Money(Decimal("1.00"))
+        assert events[3].product_id == second.product_id
+        assert events[4].amount == Money(Decimal("22.00"))
+    
+    def test_failed_operations_record_nothing(self):
+        """Тест: отклоненные операции не записывают событий"""
+        # Arrange
+        order = Order(lines=[self.make_line()])
+        
+        # Act
+        order.start_payment()
+        with pytest.raises(ValueError):
+            order.add_line(OrderLine(
+                product_id=uuid4(),
+                product_name="Other currency",
+                price=Money(Decimal("1.00"), "EUR"),
+                quantity=1
+            ))
+        
+        # Assert
+        assert order.pending_events == []
+    
+    def test_clear_events_and_clone(self):
+        """Тест: очистка событий и копия заказа без событий"""
+        # Arrange
+        order = Order()
+        order.add_line(self.make_line())
+        
+        # Act
+        copy = order.clone()
+        order.clear_events()
+        
+        # Assert
+        assert copy.pending_events == []
+        assert order.pending_events == []
+
+
+class TestLineViews:
+    """Тесты представления строк и ленивого хранилища"""
+    
+    def make_lines(self, count: int):
+        return [
+            OrderLine(
+                product_id=uuid4(),
+                product_name=f"Product {i}",
+                price=Money(Decimal("1.25") * (i + 1)),
+                quantity=i + 1
+            )
+            for i in range(count)
+        ]
+    
+    @pytest.mark.parametrize("store_class", [ListLineStore, ColumnarLineStore])
+    def test_view_reflects_order_without_copying(self, store_class):
+        """Тест: представление только читает строки и видит изменения заказа"""
+        # Arrange
+        lines = self.make_lines(3)
+        order = Order(lines=lines, line_store=store_class())
+        
+        # Act
+        view = order.line_view
+        order.remove_line(lines[0].product_id)
+        
+        # Assert
+        assert len(view) == 2
+        assert view[0] == lines[1]
+        assert view[-1] == lines[2]
+        assert view[:1] == [lines[1]]
+        assert list(view) == lines[1:]
+        assert lines[2] in view
+        assert not hasattr(view, "append")
+    
+    @pytest.mark.parametrize("store_class", [ListLineStore, ColumnarLineStore])
+    def test_clone_copies_store(self, store_class):
+        """Тест: копия заказа не зависит от строк исходного"""
+        # Arrange
+        lines = self.make_lines(2)
+        order = Order(lines=lines, line_store=store_class())
+        
+        # Act
+        copy = order.clone()
+        order.remove_line(lines[0].product_id)
+        
+        # Assert
+        assert copy.lines == lines
+        assert copy.total_amount == lines[0].total + lines[1].total
+    
+    def test_lazy_store_loads_once_on_access(self):
+        """Тест: ленивое хранилище читает строки один раз и только при обращении"""
+        # Arrange
+        lines = self.make_lines(2)
+        loads = []
+        
+        def loader():
+            loads.append(1)
+            return lines
+        
+        total = lines[0].total + lines[1].total
+        order = Order.reconstitute(
+            uuid4(), uuid4(), [], OrderStatus.DRAFT, 0.0, 0.0,
+            line_store=LazyLineStore(loader, 2, total)
+        )
+        
+        # Act
+        order.start_payment()
+        order.pay()
+        before = len(loads)
+        copy = order.clone()
+        first = order.line_view[0]
+        order.lines
+        
+        # Assert
+        assert before == 0
+        assert first == lines[0]
+        assert loads == [1]
+        assert order.pending_events[-1].amount == total
+        assert copy.lines == lines
+
+
+class TestKeyedLines:
+    """Тесты индекса строк по ID товара"""
+    
+    def make_line(self, price: str = "2.50", quantity: int = 1, product_id=None) -> OrderLine:
+        return OrderLine(
+            product_id=product_id or uuid4(),
+            product_name="Product",
+            price=Money(Decimal(price)),
+            quantity=quantity
+        )
+    
+    @pytest.mark.parametrize("store_class", [ListLineStore, ColumnarLineStore])
+    def test_change_quantity_keeps_order_and_total(self, store_class):
+        """Тест: изменение количества обновляет сумму и не меняет порядок строк"""
+        # Arrange
+        lines = [self.make_line(str(i + 1)) for i in range(3)]
+        order = Order(lines=lines, line_store=store_class())
+        
+        # Act
+        order.change_quantity(lines[1].product_id, 5)
+        
+        # Assert
+        assert [line.product_id for line in order.lines] == [line.product_id for line in lines]
+        assert order.find_line(lines[1].product_id).quantity == 5
+        assert order.total_amount == Money(Decimal("14.00"))
+        assert order.pending_events == [
+            LineQuantityChanged(order.id, order.updated_timestamp, lines[1].product_id, 5)
+        ]
+        assert lines[1].quantity == 1
+    
+    def test_change_quantity_errors(self):
+        """Тест: нельзя менять количество отсутствующей, повторной или оплаченной строки"""
+        # Arrange
+        line = self.make_line()
+        order = Order(lines=[line, self.make_line(product_id=line.product_id)])
+        paid = Order(lines=[self.make_line()])
+        paid.pay()
+        
+        # Act & Assert
+        with pytest.raises(KeyError):
+            order.change_quantity(uuid4(), 1)
+        with pytest.raises(ValueError):
+            order.change_quantity(line.product_id, 2)
+        with pytest.raises(OrderModificationException):
+            paid.change_quantity(paid.lines[0].product_id, 2)
+    
+    def test_remove_drops_all_lines_of_product(self):
+        """Тест: удаление без слияния убирает все строки товара и сохраняет порядок"""
+        # Arrange
+        first = self.make_line("1.00")
+        lines = [first, self.make_line("2.00"), self.make_line("3.00", product_id=first.product_id)]
+        order = Order(lines=lines)
+        
+        # Act
+        order.remove_line(first.product_id)
+        order.add_line(self.make_line("4.00", product_id=first.product_id))
+        
+        # Assert
+        assert [line.price for line in order.lines] == [
+            Money(Decimal("2.00")), Money(Decimal("4.00"))
+        ]
+        assert order.total_amount == Money(Decimal("6.00"))
+    
+    def test_merge_on_add(self):
+        """Тест: в режиме слияния повторный товар увеличивает количество"""
+        # Arrange
+        line = self.make_line(quantity=2)
+        order = Order(lines=[line], merge_lines=True)
+        
+        # Act
+        order.add_line(self.make_line(quantity=3, product_id=line.product_id))
+        order.add_lines([
+            self.make_line(quantity=1, product_id=line.product_id),
+            self.make_line("1.00"),
+        ])
+        
+        # Assert
+        assert len(order.lines) == 2
+        assert order.find_line(line.product_id).quantity == 6
+        assert order.total_amount == Money(Decimal("16.00"))
+        assert [type(event) for event in order.pending_events] == [
+            LineQuantityChanged, LineAdded, LineQuantityChanged
+        ]
+        assert order.clone().find_line(line.product_id).quantity == 6
+    
+    def test_merge_rejects_different_price_atomically(self):
+        """Тест: строки с другой ценой не сливаются, пакет не применяется"""
+        # Arrange
+        line = self.make_line()
+        order = Order(lines=[line], merge_lines=True)
+        
+        # Act & Assert
+        with pytest.raises(ValueError):
+            order.add_lines([
+                self.make_line("1.00"),
+                self.make_line("9.99", product_id=line.product_id),
+            ])
+        assert order.lines == [line]
+        assert order.pending_events == []
+    
+    def test_merge_rejects_product_with_several_lines_atomically(self):
+        """Тест: товар с несколькими строками не сливается, новые строки не добавляются"""
+        # Arrange
+        line = self.make_line()
+        duplicate = self.make_line(product_id=line.product_id)
+        order = Order(line_store=ListLineStore([line, duplicate]), merge_lines=True)
+        
+        # Act & Assert
+        with pytest.raises(ValueError, match="several lines"):
+            order.add_lines([
+                self.make_line("1.00"),
+                self.make_line(product_id=line.product_id),
+            ])
+        assert order.lines == [line, duplicate]
+        assert order.total_amount == Money(Decimal("5.00"))
+        assert order.pending_events == []
+
+
+class TestIdentity:
+    """Тесты источников ID и часов"""
+    
+    def test_ids_are_uuid7_and_strictly_increasing(self):
+        """Тест: ID монотонно возрастают при остановленных и отстающих часах"""
+        # Arrange
+        times = iter([1000.0] * 50 + [999.0] * 50 + [1000.002] * 50)
+        provider = TimeOrderedIdProvider(clock=lambda: next(times), rng=random.Random(1))
+        
+        # Act
+        ids = [provider() for _ in range(150)]
+        
+        # Assert
+        assert ids == sorted(ids, key=lambda order_id: order_id.int)
+        assert len(set(ids)) == 150
+        assert all(order_id.version == 7 for order_id in ids)
+        assert all(order_id.variant == "specified in RFC 4122" for order_id in ids)
+        assert ids[0].int >> 80 == 1_000_000
+        assert ids[-1].int >> 80 == 1_000_002
+    
+    def test_counter_overflow_moves_to_next_millisecond(self):
+        """Тест: при исчерпании счетчика ID переходят к следующей миллисекунде"""
+        # Arrange
+        rng = random.Random(1)
+        rng.getrandbits = lambda bits: (1 << bits) - 1
+        provider = TimeOrderedIdProvider(clock=lambda: 5.0, rng=rng)
+        
+        # Act
+        first, second = provider(), provider()
+        
+        # Assert
+        assert first.int >> 80 == 5000
+        assert second.int >> 80 == 5001
+        assert second.version == 7
+    
+    def test_id_range_bounds_ids_by_creation_time(self):
+        """Тест: id_range отделяет ID, созданные в интервале времени"""
+        # Arrange
+        now = [100.0]
+        provider = TimeOrderedIdProvider(clock=lambda: now[0])
+        early = provider()
+        now[0] = 200.0
+        inside = provider()
+        now[0] = 300.0
+        late = provider()
+        
+        # Act
+        start, end = id_range(datetime.fromtimestamp(150.0), datetime.fromtimestamp(300.0))
+        
+        # Assert
+        assert not start.int <= early.int < end.int
+        assert start.int <= inside.int < end.int
+        assert not start.int <= late.int < end.int
+    
+    def test_order_uses_injected_providers(self):
+        """Тест: заказ берет ID и время из переданных источников"""
+        # Arrange
+        now = [10.0]
+        
+        # Act
+        order = Order(id_provider=TimeOrderedIdProvider(), clock=lambda: now[0])
+        now[0] = 20.0
+        order.add_line(OrderLine(uuid4(), "Product", Money(Decimal("1.00")), 1))
+        now[0] = 30.0
+        copy = order.clone()
+        copy.remove_line(order.lines[0].product_id)
+        
+        # Assert
+        assert order.id.version == 7
+        assert order.customer_id.version == 7
+        assert order.created_timestamp == 10.0
+        assert order.updated_timestamp == 20.0
+        assert order.pending_events[0].occurred_at == 20.0
+        assert copy.updated_timestamp == 30.0
+        assert Order().id.version == 4
@@ -0,0 +1,196 @@
+import csv
+import json
+import pytest
+from decimal import Decimal
+from uuid import UUID, uuid4
+
+from domain.order_status import OrderStatus
+from infrastructure.order_repository import InMemoryOrderRepository
+from infrastructure.order_importer import ImportCheckpoint, OrderImporter
+
+FIELDS = [
+    "order_id", "customer_id", "status", "product_id",
+    "product_name", "price", "currency", "quantity",
+]
+
+
+def make_rows(orders: int, lines_per_order: int = 2):
+    rows = []
+    for _ in range(orders):
+        order_id, customer_id = str(uuid4()), str(uuid4())
+        for j in range(lines_per_order):
+            rows.append({
+                "order_id": order_id,
+                "customer_id": customer_id,
+                "status": "draft",
+                "product_id": str(uuid4()),
+                "product_name": f"Product {j}",
+                "price": "10.50",
+                "currency": "USD",
+                "quantity": str(j + 1),
+            })
+    return rows
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+class CountingRepository(InMemoryOrderRepository):
+    """Репозиторий, считающий пакетные сохранения и умеющий падать"""
+    
+    def __init__(self, fail_after_batches=None):
+        super().__init__()
+        self.batches = 0
+        self.fail_after_batches = fail_after_batches
+    
+    def save_many(self, orders):
+        if self.fail_after_batches is not None and self.batches >= self.fail_after_batches:
+            raise KeyboardInterrupt("crash")
+        self.batches += 1
+        super().save_many(orders)
+
+
+class TestOrderImporter:
+    """Тесты потокового импорта заказов"""
+    
+    def test_csv_import_in_batches(self, tmp_path):
+        """Тест: заказы из CSV собираются из строк и сохраняются пакетами"""
+        # Arrange
+        path = tmp_path / "orders.csv"
+        rows = make_rows(25)
+        write_csv(path, rows)
+        repository = CountingRepository()
+        
+        # Act
+        report = OrderImporter(repository, batch_size=10).import_file(str(path))
+        
+        # Assert
+        assert (report.orders, report.lines, report.error_count) == (25, 50, 0)
+        assert repository.batches == 3
+        order = repository.get_by_id(UUID(rows[0]["order_id"]))
+        assert order.total_amount.amount == Decimal("31.50")
+    
+    def test_invalid_rows_reject_their_order(self, tmp_path):
+        """Тест: ошибочная запись отклоняет свой заказ и сообщается по номеру"""
+        # Arrange
+        path = tmp_path / "orders.csv"
+        rows = make_rows(3)
+        rows[3]["price"] = "abc"
+        rows[5]["currency"] = "EUR"
+        write_csv(path, rows)
+        repository = InMemoryOrderRepository()
+        
+        # Act
+        report = OrderImporter(repository).import_file(str(path))
+        
+        # Assert
+        assert report.orders == 1
+        assert report.rejected_orders == 2
+        assert [error.row for error in report.errors] == [4, 5]
+        assert "different currencies" in report.errors[1].message
+    
+    def test_resume_after_crash(self, tmp_path):
+        """Тест: импорт продолжается с контрольной точки без повторов"""
+        # Arrange
+        path = tmp_path / "orders.csv"
+        write_csv(path, make_rows(30))
+        repository = CountingRepository(fail_after_batches=2)
+        checkpoints = []
+        importer = OrderImporter(repository, batch_size=10, on_checkpoint=checkpoints.append)
+        with pytest.raises(KeyboardInterrupt):
+            importer.import_file(str(path))
+        checkpoint = checkpoints[-1]
+        
+        # Act
+        repository.fail_after_batches = None
+        report = importer.import_file(str(path), resume_from=checkpoint)
+        
+        # Assert
+        assert checkpoint.row == 40
+        assert report.orders == 10
+        assert len(repository.find_by_status(OrderStatus.DRAFT)) == 30
+    
+    def test_crash_before_checkpoint_does_not_fail_saved_orders(self, tmp_path):
+        """Тест: пакет, сохраненный до сбоя без контрольной точки, не дает ошибок"""
+        # Arrange
+        path = tmp_path / "orders.csv"
+        write_csv(path, make_rows(30))
+        repository = InMemoryOrderRepository()
+        checkpoints = []
+        
+        def crash_on_second(checkpoint):
+            if checkpoints:
+                raise KeyboardInterrupt("crash")
+            checkpoints.append(checkpoint)
+        
+        with pytest.raises(KeyboardInterrupt):
+            OrderImporter(
+                repository, batch_size=10, on_checkpoint=crash_on_second
+            ).import_file(str(path))
+        
+        # Act
+        report = OrderImporter(repository, batch_size=10).import_file(
+            str(path), resume_from=checkpoints[0]
+        )
+        
+        # Assert
+        assert report.error_count == 0
+        assert report.already_imported == 10
+        assert report.orders == 10
+        assert len(repository.find_by_status(OrderStatus.DRAFT)) == 30
+    
+    @pytest.mark.parametrize("lines", ["abc", [1, 2], {"product_id": "x"}, [], None])
+    def test_jsonl_invalid_lines_are_row_errors(self, tmp_path, lines):
+        """Тест: некорректное поле lines - ошибка записи, импорт продолжается"""
+        # Arrange
+        path = tmp_path / "orders.jsonl"
+        valid = make_rows(1, lines_per_order=1)[0]
+        with open(path, "w") as file:
+            file.write(json.dumps({
+                "order_id": str(uuid4()), "customer_id": str(uuid4()), "lines": lines
+            }) + "\n")
+            file.write(json.dumps(valid) + "\n")
+        repository = InMemoryOrderRepository()
+        
+        # Act
+        report = OrderImporter(repository).import_file(str(path))
+        
+        # Assert
+        assert report.orders == 1
+        assert report.rejected_orders == 1
+        assert report.errors[0].row == 1
+        assert report.checkpoint == ImportCheckpoint(path.stat().st_size, 2)
+    
+    def test_jsonl_with_nested_lines(self, tmp_path):
+        """Тест: JSONL с заказами и массивами строк"""
+        # Arrange
+        path = tmp_path / "orders.jsonl"
+        with open(path, "w") as file:
+            for _ in range(5):
+                file.write(json.dumps({
+                    "order_id": str(uuid4()),
+                    "customer_id": str(uuid4()),
+                    "status": "paid",
+                    "lines": [
+                        {"product_id": str(uuid4()), "product_name": "A",
+                         "price": "1.00", "quantity": 2},
+                        {"product_id": str(uuid4()), "product_name": "B",
+                         "price": "2.00", "quantity": 1},
+                    ],
+                }) + "\n")
+            file.write("{not json\n")
+        repository = InMemoryOrderRepository()
+        
+        # Act
+        report = OrderImporter(repository, batch_size=2).import_file(str(path))
+        
+        # Assert
+        assert report.orders == 5
+        assert report.lines == 10
+        assert report.errors[0].row == 6
+        assert len(repository.find_by_status(OrderStatus.PAID)) == 5
+        assert report.checkpoint == ImportCheckpoint(path.stat().st_size, 6)
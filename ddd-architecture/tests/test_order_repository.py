@@ -0,0 +1,610 @@
+import pytest
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from uuid import UUID, uuid4
+
+from domain.order_aggregate import Order, OrderLine
+from domain.money import Money
+from domain.order_status import OrderStatus
+from infrastructure.order_repository import InMemoryOrderRepository
+from infrastructure.sqlite_order_repository import SqliteOrderRepository
+from infrastructure.event_log_repository import EventLogOrderRepository
+from infrastructure.caching_repository import CachingOrderRepository
+from infrastructure.sharded_order_repository import ShardedOrderRepository
+from infrastructure.outbox import InMemoryOutbox
+from infrastructure.write_behind_repository import FlushError, WriteBehindOrderRepository
+from domain.domain_events import LineAdded, OrderPaid
+from domain.domain_exceptions import ConcurrencyConflictException
+
+
+def create_order(customer_id=None) -> Order:
+    order = Order(customer_id=customer_id)
+    order.add_line(OrderLine(
+        product_id=uuid4(),
+        product_name="Product",
+        price=Money(Decimal("10.00")),
+        quantity=1
+    ))
+    return order
+
+
+@pytest.fixture(params=["in_memory", "sqlite", "event_log", "sharded"])
+def repository(request, tmp_path):
+    if request.param == "in_memory":
+        yield InMemoryOrderRepository()
+    elif request.param == "sqlite":
+        repository = SqliteOrderRepository(str(tmp_path / "orders.db"))
+        yield repository
+        repository.close()
+    elif request.param == "event_log":
+        repository = EventLogOrderRepository(str(tmp_path / "orders.log"))
+        yield repository
+        repository.close()
+    else:
+        yield ShardedOrderRepository(shards=4)
+
+
+class TestRepositoryQueries:
+    """Тесты запросов по вторичным индексам репозиториев"""
+    
+    def test_find_by_customer(self, repository):
+        """Тест поиска заказов покупателя"""
+        # Arrange
+        customer_id = uuid4()
+        orders = [create_order(customer_id) for _ in range(3)]
+        repository.save_many(orders + [create_order() for _ in range(5)])
+        
+        # Act
+        found = repository.find_by_customer(customer_id)
+        
+        # Assert
+        assert sorted(o.id for o in found) == sorted(o.id for o in orders)
+        assert repository.find_by_customer(uuid4()) == []
+    
+    def test_customer_index_follows_restored_orders(self, repository):
+        """Тест: заказ, восстановленный с другим покупателем, переходит в его индекс"""
+        # Arrange
+        customer_id, other_customer_id = uuid4(), uuid4()
+        first, second = create_order(customer_id), create_order(customer_id)
+        repository.save_many([first, second])
+        
+        # Act
+        repository.restore_many([Order(order_id=second.id, customer_id=other_customer_id)])
+        moved = [o.id for o in repository.find_by_customer(other_customer_id)]
+        remaining = [o.id for o in repository.find_by_customer(customer_id)]
+        repository.restore_many([Order(order_id=first.id, customer_id=other_customer_id)])
+        
+        # Assert
+        assert moved == [second.id]
+        assert remaining == [first.id]
+        assert repository.find_by_customer(customer_id) == []
+        assert {o.id for o in repository.find_by_customer(other_customer_id)} == {
+            first.id, second.id
+        }
+    
+    def test_status_index_follows_saves(self, repository):
+        """Тест: сохранение со сменой статуса переносит заказ в другой индекс"""
+        # Arrange
+        orders = [create_order() for _ in range(4)]
+        for order in orders:
+            repository.save(order)
+        
+        # Act
+        orders[0].pay()
+        repository.save(orders[0])
+        orders[1].pay()  # изменение без сохранения не попадает в индекс
+        
+        # Assert
+        assert [o.id for o in repository.find_by_status(OrderStatus.PAID)] == [orders[0].id]
+        draft_ids = {o.id for o in repository.find_by_status(OrderStatus.DRAFT)}
+        assert draft_ids == {o.id for o in orders[1:]}
+    
+    def test_find_created_between(self, repository):
+        """Тест поиска заказов по времени создания"""
+        # Arrange
+        before = datetime.now() - timedelta(seconds=1)
+        orders = [create_order() for _ in range(3)]
+        repository.save_many(orders)
+        after = datetime.now() + timedelta(seconds=1)
+        
+        # Act
+        found = repository.find_created_between(before, after)
+        
+        # Assert
+        assert {o.id for o in found} == {o.id for o in orders}
+        assert repository.find_created_between(after, after + timedelta(days=1)) == []
+    
+    def test_find_id_range(self, repository):
+        """Тест поиска по диапазону ID в порядке ID"""
+        # Arrange
+        orders = [create_order() for _ in range(6)]
+        repository.save_many(orders)
+        ordered = sorted(orders, key=lambda order: order.id.int)
+        
+        # Act
+        found = repository.find_id_range(ordered[1].id, ordered[4].id)
+        later = [create_order() for _ in range(6)]
+        repository.save_many(later)
+        everything = repository.find_id_range(UUID(int=0), UUID(int=(1 << 128) - 1))
+        
+        # Assert
+        assert [o.id for o in found] == [o.id for o in ordered[1:4]]
+        assert [o.id for o in everything] == sorted(
+            (o.id for o in orders + later), key=lambda order_id: order_id.int
+        )
+
+
+class TestOptimisticConcurrency:
+    """Тесты сохранения со сравнением версии"""
+    
+    def test_save_increments_version(self, repository):
+        """Тест: каждое сохранение увеличивает версию заказа"""
+        # Arrange
+        order = create_order()
+        
+        # Act
+        repository.save(order)
+        repository.save(order)
+        
+        # Assert
+        assert order.version == 2
+        assert repository.get_by_id(order.id).version == 2
+    
+    def test_stale_save_is_rejected(self, repository):
+        """Тест: сохранение устаревшей копии отклоняется"""
+        # Arrange
+        order = create_order()
+        repository.save(order)
+        first, second = order.clone(), order.clone()
+        
+        # Act
+        first.pay()
+        repository.save(first)
+        
+        # Assert
+        with pytest.raises(ConcurrencyConflictException):
+            repository.save(second)
+        assert repository.get_by_id(order.id).status == OrderStatus.PAID
+        assert second.version == 1
+    
+    def test_stale_batch_is_rejected_entirely(self, repository):
+        """Тест: пакет с устаревшим заказом не сохраняется целиком"""
+        # Arrange
+        stale, fresh = create_order(), create_order()
+        repository.save_many([stale, fresh])
+        repository.save(stale.clone())
+        fresh.pay()
+        
+        # Act
+        with pytest.raises(ConcurrencyConflictException):
+            repository.save_many([fresh, stale])
+        
+        # Assert
+        assert fresh.version == 1
+        assert repository.get_by_id(fresh.id).version == 1
+    
+    def test_repeated_order_in_batch_is_saved_once(self, repository):
+        """Тест: повтор заказа в пакете сохраняется один раз, копия - конфликт"""
+        # Arrange
+        order = create_order()
+        repository.save(order)
+        
+        # Act
+        repository.save_many([order, order])
+        
+        # Assert
+        assert order.version == 2
+        assert repository.get_by_id(order.id).version == 2
+        with pytest.raises(ConcurrencyConflictException):
+            repository.save_many([order, order.clone()])
+
+
+class TestShardedOrderRepository:
+    """Тесты репозитория с блокировками по шардам"""
+    
+    def test_returns_independent_copies(self):
+        """Тест: изменения полученной копии не видны без сохранения"""
+        # Arrange
+        repository = ShardedOrderRepository(shards=2)
+        order = create_order()
+        repository.save(order)
+        
+        # Act
+        copy = repository.get_by_id(order.id)
+        copy.pay()
+        
+        # Assert
+        assert copy is not order
+        assert repository.get_by_id(order.id).status == OrderStatus.DRAFT
+
+
+@pytest.fixture(params=["in_memory", "sqlite", "event_log", "sharded"])
+def outbox_repository(request, tmp_path):
+    if request.param == "in_memory":
+        yield InMemoryOrderRepository(outbox=InMemoryOutbox())
+    elif request.param == "sqlite":
+        repository = SqliteOrderRepository(str(tmp_path / "orders.db"), outbox=True)
+        yield repository
+        repository.close()
+    elif request.param == "event_log":
+        repository = EventLogOrderRepository(str(tmp_path / "orders.log"), outbox=True)
+        yield repository
+        repository.close()
+    else:
+        yield ShardedOrderRepository(shards=4, outbox=InMemoryOutbox())
+
+
+class TestOutbox:
+    """Тесты сохранения доменных событий в outbox"""
+    
+    def test_save_moves_events_to_outbox(self, outbox_repository):
+        """Тест: события сохраняются вместе с заказом и снимаются с агрегата"""
+        # Arrange
+        order = create_order()
+        outbox = outbox_repository.outbox
+        
+        # Act
+        outbox_repository.save(order)
+        order.pay()
+        outbox_repository.save_many([order])
+        
+        # Assert
+        records = outbox.fetch(0, 10)
+        assert [type(record.event) for record in records] == [LineAdded, OrderPaid]
+        assert records[0].event == LineAdded(
+            order.id,
+            records[0].event.occurred_at,
+            order.lines[0].product_id,
+            "Product",
+            Money(Decimal("10.00")),
+            1
+        )
+        assert records[1].event.amount == Money(Decimal("10.00"))
+        assert order.pending_events == []
+        assert outbox.fetch(records[0].sequence, 10) == records[1:]
+    
+    def test_acknowledge_removes_delivered_events(self, outbox_repository):
+        """Тест: подтвержденные события удаляются из outbox"""
+        # Arrange
+        outbox_repository.save_many([create_order() for _ in range(3)])
+        outbox = outbox_repository.outbox
+        records = outbox.fetch(0, 2)
+        
+        # Act
+        outbox.acknowledge(records[-1].sequence)
+        
+        # Assert
+        assert outbox.pending_count() == 1
+        assert outbox.fetch(0, 10)[0].sequence > records[-1].sequence
+    
+    def test_conflict_keeps_events_on_order(self, outbox_repository):
+        """Тест: при конфликте версий события не попадают в outbox"""
+        # Arrange
+        order = create_order()
+        outbox_repository.save(order)
+        stale = outbox_repository.get_by_id(order.id).clone()
+        order.pay()
+        outbox_repository.save(order)
+        stale.add_line(create_order().lines[0])
+        outbox = outbox_repository.outbox
+        pending = outbox.pending_count()
+        
+        # Act
+        with pytest.raises(ConcurrencyConflictException):
+            outbox_repository.save(stale)
+        
+        # Assert
+        assert outbox.pending_count() == pending
+        assert len(stale.pending_events) == 1
+    
+    def test_events_are_discarded_without_outbox(self, repository):
+        """Тест: репозиторий без outbox снимает события с агрегата"""
+        # Arrange
+        order = create_order()
+        
+        # Act
+        repository.save(order)
+        
+        # Assert
+        assert repository.outbox is None
+        assert order.pending_events == []
+
+
+class CountingRepository(InMemoryOrderRepository):
+    """In-memory репозиторий, считающий обращения к хранилищу"""
+    
+    def __init__(self):
+        super().__init__()
+        self.reads = 0
+    
+    def get_by_id(self, order_id):
+        self.reads += 1
+        return super().get_by_id(order_id)
+    
+    def get_many(self, order_ids):
+        order_ids = list(order_ids)
+        self.reads += len(order_ids)
+        return super().get_many(order_ids)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+
+class TestCachingOrderRepository:
+    """Тесты кэширующего декоратора репозитория"""
+    
+    def test_hot_order_is_served_from_cache(self):
+        """Тест: повторное чтение не обращается к хранилищу"""
+        # Arrange
+        backend = CountingRepository()
+        order = create_order()
+        backend.save(order)
+        repository = CachingOrderRepository(backend)
+        
+        # Act
+        copies = [repository.get_by_id(order.id) for _ in range(5)]
+        
+        # Assert
+        assert all(copy == order and copy is not order for copy in copies[1:])
+        assert len({id(copy) for copy in copies}) == 5
+        assert backend.reads == 1
+        assert repository.stats.hits == 4
+        assert repository.stats.misses == 1
+    
+    def test_lru_eviction_and_ttl(self):
+        """Тест вытеснения по размеру и по времени жизни"""
+        # Arrange
+        backend = CountingRepository()
+        orders = [create_order() for _ in range(3)]
+        backend.save_many(orders)
+        clock = FakeClock()
+        repository = CachingOrderRepository(backend, max_size=2, ttl=10, clock=clock)
+        
+        # Act
+        repository.get_many([o.id for o in orders])
+        clock.now = 11
+        repository.get_by_id(orders[2].id)
+        
+        # Assert
+        assert repository.stats.evictions == 1
+        assert repository.stats.expirations == 1
+        assert backend.reads == 4
+    
+    @pytest.mark.parametrize("write_through", [True, False])
+    def test_save_updates_or_invalidates_cache(self, write_through):
+        """Тест: save записывает заказ в кэш или сбрасывает его"""
+        # Arrange
+        backend = CountingRepository()
+        repository = CachingOrderRepository(backend, write_through=write_through)
+        order = create_order()
+        
+        # Act
+        repository.save(order)
+        repository.get_by_id(order.id)
+        
+        # Assert
+        assert backend.reads == (0 if write_through else 1)
+        assert backend.get_by_id(order.id) is order
+    
+    @pytest.mark.parametrize("backend_type", ["in_memory", "sqlite"])
+    def test_concurrent_copies_cannot_both_claim_payment(self, backend_type, tmp_path):
+        """Тест: две копии из кэша не могут обе сохранить PENDING"""
+        # Arrange
+        backend = (
+            InMemoryOrderRepository() if backend_type == "in_memory"
+            else SqliteOrderRepository(str(tmp_path / "orders.db"))
+        )
+        order = create_order()
+        backend.save(order)
+        repository = CachingOrderRepository(backend)
+        first, second = repository.get_by_id(order.id), repository.get_by_id(order.id)
+        
+        # Act
+        first.start_payment()
+        second.start_payment()
+        repository.save(first)
+        
+        # Assert
+        with pytest.raises(ConcurrencyConflictException):
+            repository.save(second)
+        assert repository.get_by_id(order.id).version == first.version
+    
+    def test_failed_save_invalidates_cached_order(self):
+        """Тест: после конфликта версий заказ перечитывается из хранилища"""
+        # Arrange
+        backend = CountingRepository()
+        order = create_order()
+        backend.save(order)
+        repository = CachingOrderRepository(backend)
+        stale = repository.get_by_id(order.id)
+        order.pay()
+        backend.save(order.clone())
+        
+        # Act
+        with pytest.raises(ConcurrencyConflictException):
+            repository.save(stale)
+        fresh = repository.get_by_id(order.id)
+        
+        # Assert
+        assert fresh.status == OrderStatus.PAID
+        assert backend.reads == 2
+
+
+class RecordingRepository(InMemoryOrderRepository):
+    """In-memory репозиторий, записывающий пакеты сохранений и ошибки по ID"""
+    
+    def __init__(self, outbox=None):
+        super().__init__(outbox)
+        self.batches = []
+        self.failing = {}
+    
+    def save(self, order):
+        if order.id in self.failing:
+            raise self.failing[order.id]
+        super().save(order)
+    
+    def save_many(self, orders):
+        orders = list(orders)
+        if any(order.id in self.failing for order in orders):
+            raise RuntimeError("batch rejected")
+        self.batches.append([order.id for order in orders])
+        super().save_many(orders)
+
+
+class TestWriteBehindOrderRepository:
+    """Тесты репозитория с отложенной пакетной записью"""
+    
+    def test_repeated_saves_are_coalesced(self):
+        """Тест: повторные сохранения заказа дают одну запись последнего состояния"""
+        # Arrange
+        backend = RecordingRepository(InMemoryOutbox())
+        repository = WriteBehindOrderRepository(backend, flush_interval=None)
+        order = create_order()
+        
+        # Act
+        for _ in range(3):
+            repository.save(order)
+            order.add_line(create_order().lines[0])
+        repository.save(order)
+        written = repository.flush()
+        
+        # Assert
+        assert written == 1
+        assert backend.batches == [[order.id]]
+        assert order.version == 1
+        assert len(backend.get_by_id(order.id).lines) == 4
+        assert backend.outbox.pending_count() == 4
+        assert repository.stats.saves == 4
+        assert repository.stats.writes == 1
+    
+    def test_buffered_orders_are_readable_before_flush(self):
+        """Тест: чтение по ID видит буфер, find_* сначала сбрасывают его"""
+        # Arrange
+        backend = RecordingRepository()
+        repository = WriteBehindOrderRepository(backend, flush_interval=None)
+        stored, buffered = create_order(), create_order()
+        backend.save(stored)
+        
+        # Act
+        repository.save(buffered)
+        
+        # Assert
+        assert repository.get_by_id(buffered.id) is buffered
+        assert backend.get_by_id(buffered.id) is None
+        assert repository.get_many([buffered.id, stored.id, uuid4()]) == {
+            buffered.id: buffered, stored.id: stored
+        }
+        assert len(repository.find_by_status(OrderStatus.DRAFT)) == 2
+        assert len(repository) == 0
+    
+    def test_flush_on_size_threshold(self):
+        """Тест: save сбрасывает буфер при достижении max_pending заказов"""
+        # Arrange
+        backend = RecordingRepository()
+        repository = WriteBehindOrderRepository(backend, max_pending=3, flush_interval=None)
+        orders = [create_order() for _ in range(4)]
+        
+        # Act
+        repository.save_many(orders[:2])
+        before = list(backend.batches)
+        repository.save(orders[2])
+        repository.save(orders[3])
+        
+        # Assert
+        assert before == []
+        assert backend.batches == [[order.id for order in orders[:3]]]
+        assert len(repository) == 1
+    
+    def test_flush_on_interval(self):
+        """Тест: save сбрасывает буфер, если с прошлого сброса прошел интервал"""
+        # Arrange
+        clock = FakeClock()
+        backend = RecordingRepository()
+        repository = WriteBehindOrderRepository(backend, flush_interval=5.0, clock=clock)
+        first, second = create_order(), create_order()
+        
+        # Act
+        repository.save(first)
+        clock.now = 5.0
+        repository.save(second)
+        
+        # Assert
+        assert backend.batches == [[first.id, second.id]]
+    
+    def test_background_flush(self):
+        """Тест: фоновый поток сбрасывает буфер, stop записывает остаток"""
+        # Arrange
+        backend = RecordingRepository()
+        repository = WriteBehindOrderRepository(backend, flush_interval=0.01)
+        order = create_order()
+        repository.start()
+        
+        # Act
+        repository.save(order)
+        repository.stop()
+        
+        # Assert
+        assert backend.get_by_id(order.id) is order
+        assert len(repository) == 0
+    
+    def test_failures_are_reported_per_order(self):
+        """Тест: FlushError называет незаписанные заказы, временные ошибки повторяются"""
+        # Arrange
+        backend = RecordingRepository()
+        repository = WriteBehindOrderRepository(backend, flush_interval=None)
+        ok, transient, conflicting = (create_order() for _ in range(3))
+        backend.failing = {
+            transient.id: RuntimeError("disk full"),
+            conflicting.id: ConcurrencyConflictException("stale"),
+        }
+        repository.save_many([ok, transient, conflicting])
+        
+        # Act
+        with pytest.raises(FlushError) as error:
+            repository.flush()
+        backend.failing = {}
+        retried = repository.flush()
+        
+        # Assert
+        assert set(error.value.failures) == {transient.id, conflicting.id}
+        assert backend.get_by_id(ok.id) is ok
+        assert retried == 1
+        assert backend.get_by_id(transient.id) is transient
+        assert backend.get_by_id(conflicting.id) is None
+    
+    def test_background_failures_are_reported_by_next_flush(self):
+        """Тест: ошибка фонового сброса передается следующему вызову flush"""
+        # Arrange
+        backend = RecordingRepository()
+        repository = WriteBehindOrderRepository(backend, flush_interval=0.01)
+        order = create_order()
+        backend.failing = {order.id: ConcurrencyConflictException("stale")}
+        repository.save(order)
+        
+        # Act
+        repository.start()
+        deadline = time.monotonic() + 5.0
+        while repository.stats.failures == 0 and time.monotonic() < deadline:
+            time.sleep(0.005)
+        
+        # Assert
+        with pytest.raises(FlushError) as error:
+            repository.stop()
+        assert list(error.value.failures) == [order.id]
+    
+    def test_other_copy_of_buffered_order_is_rejected(self):
+        """Тест: сохранение другой копии заказа из буфера - конфликт версий"""
+        # Arrange
+        repository = WriteBehindOrderRepository(RecordingRepository(), flush_interval=None)
+        order = create_order()
+        repository.save(order)
+        
+        # Act & Assert
+        with pytest.raises(ConcurrencyConflictException):
+            repository.save(order.clone())
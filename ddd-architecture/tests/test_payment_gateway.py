@@ -0,0 +1,89 @@
+import pytest
+from decimal import Decimal
+from uuid import uuid4
+
+from domain.money import Money
+from application.interfaces import PaymentGatewayError
+from infrastructure.payment_gateway import (
+    FakePaymentGateway,
+    FixedLatency,
+    LongTailLatency,
+    NormalLatency
+)
+
+
+class TestFakePaymentGateway:
+    """Тесты фейкового платежного шлюза в режиме имитации нагрузки"""
+    
+    def test_history_is_bounded_and_counters_are_exact(self):
+        """Тест: история ограничена, счетчики учитывают все платежи"""
+        # Arrange
+        gateway = FakePaymentGateway(history_size=100)
+        
+        # Act
+        for _ in range(10_000):
+            gateway.charge(uuid4(), Money(Decimal("1.25")))
+        
+        # Assert
+        assert len(gateway.processed_payments) == 100
+        assert gateway.stats.charges == 10_000
+        assert gateway.stats.succeeded == 10_000
+        assert gateway.charged_total("USD") == Money(Decimal("12500.00"))
+    
+    def test_failures_are_reproducible_with_seed(self):
+        """Тест: одинаковый seed дает одинаковую последовательность отказов"""
+        # Arrange
+        gateways = [FakePaymentGateway(failure_probability=0.3, seed=42) for _ in range(2)]
+        
+        # Act
+        outcomes = [
+            [gateway.charge(uuid4(), Money(Decimal("1.00"))).success for _ in range(1000)]
+            for gateway in gateways
+        ]
+        
+        # Assert
+        assert outcomes[0] == outcomes[1]
+        assert 200 < gateways[0].stats.declined < 400
+    
+    @pytest.mark.parametrize("latency", [
+        FixedLatency(0.01),
+        NormalLatency(0.01, 0.002),
+        LongTailLatency(0.01, sigma=0.5),
+    ])
+    def test_latency_models(self, latency):
+        """Тест: задержка берется из распределения и не отрицательна"""
+        # Arrange
+        delays = []
+        gateway = FakePaymentGateway(latency=latency, seed=1, sleep=delays.append)
+        
+        # Act
+        for _ in range(200):
+            gateway.charge(uuid4(), Money(Decimal("1.00")))
+        
+        # Assert
+        assert len(delays) == 200
+        assert min(delays) >= 0
+        assert 0.005 < sorted(delays)[100] < 0.02
+    
+    def test_throughput_cap_spaces_out_charges(self):
+        """Тест: ограничение пропускной способности задерживает платежи"""
+        # Arrange
+        delays = []
+        gateway = FakePaymentGateway(max_throughput=100, sleep=delays.append)
+        
+        # Act
+        for _ in range(10):
+            gateway.charge(uuid4(), Money(Decimal("1.00")))
+        
+        # Assert
+        assert delays[-1] == pytest.approx(0.09, abs=0.01)
+    
+    def test_transient_errors(self):
+        """Тест: временная ошибка шлюза поднимает PaymentGatewayError"""
+        # Arrange
+        gateway = FakePaymentGateway(error_probability=1.0)
+        
+        # Act / Assert
+        with pytest.raises(PaymentGatewayError):
+            gateway.charge(uuid4(), Money(Decimal("1.00")))
+        assert gateway.stats.errors == 1
@@ -1,4 +1,6 @@
+import threading
 import pytest
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
 from uuid import uuid4
 
@@ -6,9 +8,12 @@ from domain.order_aggregate import Order, OrderLine
 from domain.money import Money
 from domain.order_status import OrderStatus
 from application.pay_order_usecase import PayOrderUseCase
-from application.interfaces import PaymentResult
+from application.interfaces import PaymentGatewayError, PaymentResult
+from application.idempotency import IdempotencyStore
 from infrastructure.order_repository import InMemoryOrderRepository
 from infrastructure.payment_gateway import FakePaymentGateway
+from infrastructure.sharded_order_repository import ShardedOrderRepository
+from infrastructure.payment_metrics import Histogram, InMemoryPaymentMetrics
 
 
 class TestPayOrderUseCase:
@@ -163,3 +168,485 @@ class TestPayOrderUseCase:
         # Assert
         assert result.success is True
         assert successful_gateway.processed_payments[0]['amount'].amount == expected_total
+    
+    def test_execute_many_pays_batch(self, order_repository, successful_gateway):
+        """Тест пакетной оплаты: результат для каждого заказа"""
+        # Arrange
+        orders = [self.create_test_order(order_repository) for _ in range(3)]
+        empty_order = Order()
+        order_repository.save(empty_order)
+        missing_order_id = uuid4()
+        use_case = PayOrderUseCase(order_repository, successful_gateway)
+        order_ids = [o.id for o in orders] + [empty_order.id, missing_order_id]
+        
+        # Act
+        results = use_case.execute_many(order_ids)
+        
+        # Assert
+        assert list(results) == order_ids
+        for order in orders:
+            assert results[order.id].success is True
+            assert order_repository.get_by_id(order.id).status == OrderStatus.PAID
+        assert "Cannot pay empty order" in results[empty_order.id].message
+        assert "not found" in results[missing_order_id].message.lower()
+        assert len(successful_gateway.processed_payments) == 3
+    
+    def test_execute_many_keeps_declined_orders_unpaid(self, order_repository, failing_gateway):
+        """Тест пакетной оплаты при отказе шлюза"""
+        # Arrange
+        orders = [self.create_test_order(order_repository) for _ in range(2)]
+        use_case = PayOrderUseCase(order_repository, failing_gateway)
+        
+        # Act
+        results = use_case.execute_many([o.id for o in orders])
+        
+        # Assert
+        for order in orders:
+            assert results[order.id].success is False
+            assert "declined" in results[order.id].message.lower()
+            assert order_repository.get_by_id(order.id).status == OrderStatus.DRAFT
+    
+    def test_execute_many_restores_orders_without_gateway_result(self, order_repository):
+        """Тест: заказы, на которые шлюз не вернул результат, не остаются в PENDING"""
+        # Arrange
+        orders = [self.create_test_order(order_repository) for _ in range(3)]
+        gateway = FakePaymentGateway(always_succeed=True)
+        charge_batch = gateway.charge_batch
+        gateway.charge_batch = lambda charges: charge_batch(charges)[:1]
+        use_case = PayOrderUseCase(order_repository, gateway)
+        
+        # Act
+        results = use_case.execute_many([o.id for o in orders])
+        
+        # Assert
+        assert results[orders[0].id].success is True
+        assert order_repository.get_by_id(orders[0].id).status == OrderStatus.PAID
+        for order in orders[1:]:
+            assert results[order.id].success is False
+            assert "no result" in results[order.id].message
+            assert order_repository.get_by_id(order.id).status == OrderStatus.DRAFT
+    
+    def test_execute_many_claims_after_partial_batch_save(self):
+        """Тест: заказы, сохраненные оборванным пакетом, не зависают в PENDING"""
+        # Arrange
+        repository = PartialBatchRepository()
+        orders = [Order(lines=[OrderLine(
+            product_id=uuid4(),
+            product_name="Test Product",
+            price=Money(Decimal("25.00")),
+            quantity=1
+        )]) for _ in range(3)]
+        for order in orders:
+            repository.save(order)
+        gateway = FakePaymentGateway(always_succeed=True)
+        use_case = PayOrderUseCase(repository, gateway)
+        
+        # Act
+        results = use_case.execute_many([o.id for o in orders])
+        
+        # Assert
+        assert all(result.success for result in results.values())
+        assert len(gateway.processed_payments) == 3
+        assert repository.find_by_status(OrderStatus.PENDING) == []
+    
+    def test_concurrent_payments_charge_once(self):
+        """Тест: параллельные оплаты одного заказа списывают деньги один раз"""
+        # Arrange
+        repository = ShardedOrderRepository(shards=8)
+        gateway = FakePaymentGateway(always_succeed=True)
+        order = self.create_test_order(repository)
+        use_case = PayOrderUseCase(repository, gateway)
+        threads = 16
+        barrier = threading.Barrier(threads)
+        
+        def pay(_):
+            barrier.wait()
+            return use_case.execute(order.id)
+        
+        # Act
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            results = list(pool.map(pay, range(threads)))
+        
+        # Assert
+        assert sum(result.success for result in results) == 1
+        assert len(gateway.processed_payments) == 1
+        assert repository.get_by_id(order.id).status == OrderStatus.PAID
+
+
+class FailingPaidSaveRepository(ShardedOrderRepository):
+    """Репозиторий-копия, который не может сохранить оплаченный заказ"""
+    
+    def __init__(self):
+        super().__init__(shards=2)
+        self.fail = True
+    
+    def save(self, order):
+        if self.fail and order.status == OrderStatus.PAID:
+            raise IOError("disk full")
+        super().save(order)
+    
+    def save_many(self, orders):
+        orders = list(orders)
+        if self.fail and any(order.status == OrderStatus.PAID for order in orders):
+            raise IOError("disk full")
+        super().save_many(orders)
+
+
+class PartialBatchRepository(ShardedOrderRepository):
+    """Неатомарный репозиторий: пакет обрывается после первого заказа"""
+    
+    def __init__(self):
+        super().__init__(shards=2)
+        self.broken_batches = 1
+    
+    def save_many(self, orders):
+        orders = list(orders)
+        if self.broken_batches and len(orders) > 1:
+            self.broken_batches -= 1
+            super().save_many(orders[:1])
+            raise IOError("connection lost")
+        super().save_many(orders)
+
+
+class TestUnrecordedPayment:
+    """Тесты списания, которое не удалось сохранить"""
+    
+    def create_order(self, repository) -> Order:
+        order = Order(lines=[OrderLine(
+            product_id=uuid4(),
+            product_name="Test Product",
+            price=Money(Decimal("25.00")),
+            quantity=1
+        )])
+        repository.save(order)
+        return order
+    
+    def test_failed_final_save_keeps_transaction_and_can_be_recovered(self):
+        """Тест: при сбое второго сохранения ID транзакции не теряется"""
+        # Arrange
+        repository = FailingPaidSaveRepository()
+        metrics = InMemoryPaymentMetrics()
+        gateway = FakePaymentGateway(always_succeed=True)
+        order = self.create_order(repository)
+        use_case = PayOrderUseCase(repository, gateway, instrumentation=metrics)
+        
+        # Act
+        result = use_case.execute(order.id)
+        stuck = [o.id for o in repository.find_by_status(OrderStatus.PENDING)]
+        retry = use_case.execute(order.id)
+        repository.fail = False
+        recovered = use_case.recover_pending(order.id, result.transaction_id)
+        
+        # Assert
+        assert result.success is True
+        assert result.transaction_id
+        assert "not recorded" in result.message
+        assert metrics.outcome_count("charged_unrecorded") == 1
+        assert stuck == [order.id]
+        assert retry.success is False
+        assert len(gateway.processed_payments) == 1
+        assert recovered.success is True
+        assert repository.get_by_id(order.id).status == OrderStatus.PAID
+    
+    def test_batch_save_failure_keeps_transactions(self):
+        """Тест: пакетная оплата возвращает ID транзакций при сбое сохранения"""
+        # Arrange
+        repository = FailingPaidSaveRepository()
+        orders = [self.create_order(repository) for _ in range(2)]
+        use_case = PayOrderUseCase(repository, FakePaymentGateway(always_succeed=True))
+        
+        # Act
+        results = use_case.execute_many([o.id for o in orders])
+        
+        # Assert
+        assert all(r.success and r.transaction_id for r in results.values())
+        assert all("not recorded" in r.message for r in results.values())
+    
+    def test_release_pending_without_charge(self):
+        """Тест: заказ без списания возвращается из PENDING в DRAFT"""
+        # Arrange
+        repository = ShardedOrderRepository(shards=2)
+        order = self.create_order(repository)
+        order.start_payment()
+        repository.save(order)
+        use_case = PayOrderUseCase(repository, FakePaymentGateway(always_succeed=True))
+        
+        # Act
+        released = use_case.recover_pending(order.id)
+        
+        # Assert
+        assert released.success is False
+        assert repository.get_by_id(order.id).status == OrderStatus.DRAFT
+        assert use_case.execute(order.id).success is True
+
+
+class SlowPaymentGateway(FakePaymentGateway):
+    """Шлюз, который не отвечает, пока тест не разрешит"""
+    
+    def __init__(self):
+        super().__init__(always_succeed=True)
+        self.release = threading.Event()
+    
+    def charge(self, order_id, money):
+        self.release.wait(timeout=5)
+        return super().charge(order_id, money)
+
+
+class FlakyPaymentGateway(FakePaymentGateway):
+    """Шлюз, первые вызовы которого завершаются временной ошибкой"""
+    
+    def __init__(self, failures: int):
+        super().__init__(always_succeed=True)
+        self.failures = failures
+        self.calls = 0
+    
+    def charge(self, order_id, money):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise PaymentGatewayError("gateway timeout")
+        return super().charge(order_id, money)
+
+
+class TestIdempotentPayment:
+    """Тесты оплаты с ключом идемпотентности"""
+    
+    def create_order(self, repository) -> Order:
+        order = Order(lines=[OrderLine(
+            product_id=uuid4(),
+            product_name="Test Product",
+            price=Money(Decimal("25.00")),
+            quantity=1
+        )])
+        repository.save(order)
+        return order
+    
+    def test_retry_returns_stored_result(self):
+        """Тест: повтор с тем же ключом не вызывает шлюз повторно"""
+        # Arrange
+        repository = InMemoryOrderRepository()
+        gateway = FakePaymentGateway(always_succeed=True)
+        order = self.create_order(repository)
+        use_case = PayOrderUseCase(repository, gateway)
+        
+        # Act
+        first = use_case.execute(order.id, idempotency_key="request-1")
+        retry = use_case.execute(order.id, idempotency_key="request-1")
+        
+        # Assert
+        assert first.success is True
+        assert retry is first
+        assert len(gateway.processed_payments) == 1
+    
+    def test_concurrent_duplicates_wait_for_first_call(self):
+        """Тест: параллельные дубликаты получают результат первого вызова"""
+        # Arrange
+        repository = ShardedOrderRepository()
+        gateway = SlowPaymentGateway()
+        order = self.create_order(repository)
+        use_case = PayOrderUseCase(repository, gateway)
+        
+        # Act
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            futures = [
+                pool.submit(use_case.execute, order.id, "request-1") for _ in range(8)
+            ]
+            gateway.release.set()
+            results = [future.result() for future in futures]
+        
+        # Assert
+        assert all(result is results[0] for result in results)
+        assert results[0].success is True
+        assert len(gateway.processed_payments) == 1
+    
+    def test_expired_and_foreign_keys(self):
+        """Тест истечения срока ключа и повторного использования ключа для другого заказа"""
+        # Arrange
+        now = [0.0]
+        store = IdempotencyStore(max_size=10, ttl=60, clock=lambda: now[0])
+        repository = InMemoryOrderRepository()
+        gateway = FakePaymentGateway(always_succeed=True)
+        order, other = self.create_order(repository), self.create_order(repository)
+        use_case = PayOrderUseCase(repository, gateway, store)
+        use_case.execute(order.id, idempotency_key="request-1")
+        
+        # Act
+        foreign = use_case.execute(other.id, idempotency_key="request-1")
+        now[0] = 61
+        expired = use_case.execute(order.id, idempotency_key="request-1")
+        
+        # Assert
+        assert foreign.success is False
+        assert "was used for order" in foreign.message
+        assert "already paid" in expired.message.lower()
+        assert len(store) == 0
+    
+    def test_transient_failure_is_not_stored(self):
+        """Тест: после временной ошибки шлюза повтор с тем же ключом выполняется заново"""
+        # Arrange
+        repository = InMemoryOrderRepository()
+        gateway = FlakyPaymentGateway(failures=1)
+        order = self.create_order(repository)
+        use_case = PayOrderUseCase(repository, gateway)
+        
+        # Act
+        first = use_case.execute(order.id, idempotency_key="request-1")
+        retry = use_case.execute(order.id, idempotency_key="request-1")
+        again = use_case.execute(order.id, idempotency_key="request-1")
+        
+        # Assert
+        assert first.success is False
+        assert retry.success is True
+        assert again is retry
+        assert gateway.calls == 2
+    
+    def test_declined_payment_is_stored(self):
+        """Тест: отказ в платеже - окончательный результат для ключа"""
+        # Arrange
+        repository = InMemoryOrderRepository()
+        gateway = FakePaymentGateway(always_succeed=False)
+        order = self.create_order(repository)
+        use_case = PayOrderUseCase(repository, gateway)
+        
+        # Act
+        first = use_case.execute(order.id, idempotency_key="request-1")
+        retry = use_case.execute(order.id, idempotency_key="request-1")
+        
+        # Assert
+        assert first.success is False
+        assert retry is first
+        assert len(gateway.processed_payments) == 1
+    
+    def test_in_flight_entry_is_not_evicted(self):
+        """Тест: переполнение хранилища не вытесняет выполняющийся вызов"""
+        # Arrange
+        store = IdempotencyStore(max_size=1)
+        started, release = threading.Event(), threading.Event()
+        calls = []
+        
+        def slow():
+            calls.append("slow")
+            started.set()
+            release.wait(timeout=5)
+            return PaymentResult(True, "tx-1"), True
+        
+        order_id = uuid4()
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            first = pool.submit(store.run, "slow", order_id, slow)
+            started.wait(timeout=5)
+            
+            # Act
+            store.run("other", uuid4(), lambda: (PaymentResult(True, "tx-2"), True))
+            duplicate = pool.submit(store.run, "slow", order_id, slow)
+            release.set()
+            results = first.result(), duplicate.result()
+        
+        # Assert
+        assert calls == ["slow"]
+        assert results[0] is results[1]
+
+
+class TestPaymentInstrumentation:
+    """Тесты инструментирования фаз оплаты"""
+    
+    def test_phases_and_outcomes_are_recorded(self):
+        """Тест: длительность фаз и исходы попадают в сборщик"""
+        # Arrange
+        repository = InMemoryOrderRepository()
+        metrics = InMemoryPaymentMetrics()
+        order = Order(lines=[OrderLine(
+            product_id=uuid4(),
+            product_name="Test Product",
+            price=Money(Decimal("25.00")),
+            quantity=1
+        )])
+        empty_order = Order()
+        repository.save_many([order, empty_order])
+        use_case = PayOrderUseCase(
+            repository, FakePaymentGateway(), instrumentation=metrics
+        )
+        
+        # Act
+        use_case.execute(order.id)
+        use_case.execute(order.id)
+        use_case.execute(empty_order.id)
+        use_case.execute(uuid4())
+        
+        # Assert
+        assert metrics.outcome_count("success") == 1
+        assert metrics.outcome_count("domain_error") == 2
+        assert metrics.outcome_count("not_found") == 1
+        assert metrics.phase_quantile("charge", 0.99) > 0
+        exported = metrics.to_prometheus()
+        assert '# TYPE pay_order_phase_seconds histogram' in exported
+        assert 'pay_order_phase_seconds_count{phase="load"} 4' in exported
+        assert 'pay_order_phase_seconds_count{phase="domain"} 3' in exported
+        assert 'pay_order_phase_seconds_count{phase="claim"} 1' in exported
+        assert 'pay_order_phase_seconds_count{phase="save"} 1' in exported
+        assert 'pay_order_outcomes_total{outcome="success"} 1' in exported
+    
+    def test_failed_saves_are_timed(self):
+        """Тест: неудачное занятие заказа и неудачное сохранение оплаты измеряются"""
+        # Arrange
+        repository = FailingPaidSaveRepository()
+        metrics = InMemoryPaymentMetrics()
+        order = Order(lines=[OrderLine(
+            product_id=uuid4(),
+            product_name="Test Product",
+            price=Money(Decimal("25.00")),
+            quantity=1
+        )])
+        repository.save(order)
+        stale = repository.get_by_id(order.id)
+        repository.save(repository.get_by_id(order.id))
+        use_case = PayOrderUseCase(
+            repository, FakePaymentGateway(), instrumentation=metrics
+        )
+        
+        # Act
+        use_case.execute(order.id)
+        repository.get_by_id = lambda order_id: stale
+        use_case.execute(order.id)
+        
+        # Assert
+        assert metrics.outcome_count("charged_unrecorded") == 1
+        assert metrics.outcome_count("conflict") == 1
+        exported = metrics.to_prometheus()
+        assert 'pay_order_phase_seconds_count{phase="claim"} 2' in exported
+        assert 'pay_order_phase_seconds_count{phase="save"} 1' in exported
+    
+    def test_batch_outcomes_are_recorded(self):
+        """Тест: пакетная оплата учитывает исход каждого заказа"""
+        # Arrange
+        repository = InMemoryOrderRepository()
+        metrics = InMemoryPaymentMetrics()
+        orders = [Order(lines=[OrderLine(
+            product_id=uuid4(),
+            product_name="Test Product",
+            price=Money(Decimal("25.00")),
+            quantity=1
+        )]) for _ in range(3)]
+        repository.save_many(orders)
+        use_case = PayOrderUseCase(
+            repository, FakePaymentGateway(always_succeed=False), instrumentation=metrics
+        )
+        
+        # Act
+        use_case.execute_many([o.id for o in orders] + [uuid4()])
+        
+        # Assert
+        assert metrics.outcome_count("declined") == 3
+        assert metrics.outcome_count("not_found") == 1
+    
+    def test_histogram_quantile(self):
+        """Тест оценки квантиля по корзинам гистограммы"""
+        # Arrange
+        histogram = Histogram([0.01, 0.1, 1.0])
+        
+        # Act
+        for _ in range(99):
+            histogram.observe(0.005)
+        histogram.observe(0.5)
+        
+        # Assert
+        assert histogram.quantile(0.5) <= 0.01
+        assert 0.1 < histogram.quantile(0.999) <= 1.0
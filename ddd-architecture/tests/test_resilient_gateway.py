@@ -0,0 +1,224 @@
+import json
+import threading
+import time
+import pytest
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from uuid import uuid4
+
+from domain.money import Money
+from application.interfaces import PaymentGateway, PaymentGatewayError, PaymentResult
+from infrastructure.http_payment_gateway import HttpPaymentGateway
+from infrastructure.resilient_payment_gateway import CircuitBreaker, ResilientPaymentGateway
+
+
+class StandInGateway:
+    """Локальный HTTP-сервер, изображающий платежный шлюз"""
+    
+    def __init__(self):
+        self.requests = []
+        self.failures_left = 0
+        self.delay = 0.0
+        stand_in = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                stand_in.requests.append((self.headers["Idempotency-Key"], body))
+                time.sleep(stand_in.delay)
+                if stand_in.failures_left > 0:
+                    stand_in.failures_left -= 1
+                    self.respond(503, {"message": "unavailable"})
+                else:
+                    self.respond(200, {
+                        "success": True,
+                        "transaction_id": "tx-" + body["order_id"],
+                        "message": "Payment processed successfully",
+                    })
+            
+            def respond(self, status, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            
+            def log_message(self, *args):
+                pass
+        
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+    
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class UnreliableGateway(PaymentGateway):
+    """Шлюз с заданными задержками и ошибками по номеру вызова"""
+    
+    def __init__(self, delays=(), errors=0):
+        self.delays = list(delays)
+        self.errors = errors
+        self.calls = 0
+        self._lock = threading.Lock()
+    
+    def charge(self, order_id, amount):
+        with self._lock:
+            call = self.calls
+            self.calls += 1
+        if call < len(self.delays):
+            time.sleep(self.delays[call])
+        if call < self.errors:
+            raise PaymentGatewayError("boom")
+        return PaymentResult(success=True, transaction_id=f"tx-{call}", message="ok")
+
+
+@pytest.fixture
+def stand_in():
+    server = StandInGateway()
+    yield server
+    server.stop()
+
+
+class TestHttpPaymentGateway:
+    """Тесты HTTP-шлюза на локальном сервере"""
+    
+    def test_charge_over_http(self, stand_in):
+        """Тест платежа через HTTP с ключом идемпотентности"""
+        # Arrange
+        gateway = HttpPaymentGateway(stand_in.url)
+        order_id = uuid4()
+        
+        # Act
+        result = gateway.charge(order_id, Money(Decimal("12.50")))
+        second = gateway.charge(order_id, Money(Decimal("12.50")))
+        gateway.close()
+        
+        # Assert
+        assert result.success is True
+        assert result.transaction_id == f"tx-{order_id}"
+        assert second.success is True
+        assert stand_in.requests[0] == (
+            str(order_id), {"order_id": str(order_id), "amount": "12.50", "currency": "USD"}
+        )
+    
+    def test_server_error_raises_gateway_error(self, stand_in):
+        """Тест: ответ 5xx - временная ошибка шлюза"""
+        # Arrange
+        stand_in.failures_left = 1
+        gateway = HttpPaymentGateway(stand_in.url)
+        
+        # Act / Assert
+        with pytest.raises(PaymentGatewayError):
+            gateway.charge(uuid4(), Money(Decimal("1.00")))
+        gateway.close()
+
+
+class TestResilientPaymentGateway:
+    """Тесты устойчивого декоратора платежного шлюза"""
+    
+    def test_retries_transient_errors(self, stand_in):
+        """Тест: временные ошибки повторяются с задержкой"""
+        # Arrange
+        stand_in.failures_left = 2
+        gateway = ResilientPaymentGateway(
+            HttpPaymentGateway(stand_in.url), max_attempts=3, backoff=0.01
+        )
+        
+        # Act
+        result = gateway.charge(uuid4(), Money(Decimal("5.00")))
+        gateway.close()
+        
+        # Assert
+        assert result.success is True
+        assert len(stand_in.requests) == 3
+        assert len({key for key, _ in stand_in.requests}) == 1
+    
+    def test_slow_call_times_out_within_budget(self, stand_in):
+        """Тест: медленный шлюз не блокирует вызов дольше бюджета"""
+        # Arrange
+        stand_in.delay = 0.5
+        gateway = ResilientPaymentGateway(
+            HttpPaymentGateway(stand_in.url), timeout=0.1, max_attempts=5, budget=0.25
+        )
+        
+        # Act
+        start = time.monotonic()
+        result = gateway.charge(uuid4(), Money(Decimal("5.00")))
+        elapsed = time.monotonic() - start
+        gateway.close()
+        
+        # Assert
+        assert result.success is False
+        assert "unavailable" in result.message
+        assert elapsed < 0.4
+    
+    def test_circuit_breaker_fails_fast(self):
+        """Тест: открытый выключатель отклоняет вызовы без обращения к шлюзу"""
+        # Arrange
+        now = [0.0]
+        inner = UnreliableGateway(errors=3)
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10, clock=lambda: now[0])
+        gateway = ResilientPaymentGateway(
+            inner, max_attempts=3, backoff=0, circuit_breaker=breaker
+        )
+        
+        # Act
+        first = gateway.charge(uuid4(), Money(Decimal("5.00")))
+        rejected = gateway.charge(uuid4(), Money(Decimal("5.00")))
+        now[0] = 10
+        probe = gateway.charge(uuid4(), Money(Decimal("5.00")))
+        gateway.close()
+        
+        # Assert
+        assert first.success is False
+        assert "circuit is open" in rejected.message
+        assert probe.success is True
+        assert inner.calls == 4
+        assert breaker.state == CircuitBreaker.CLOSED
+    
+    def test_exhausted_budget_does_not_take_probe(self):
+        """Тест: вызов без бюджета не оставляет выключатель в half_open"""
+        # Arrange
+        now = [0.0]
+        inner = UnreliableGateway(errors=1)
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=lambda: now[0])
+        gateway = ResilientPaymentGateway(inner, backoff=0, circuit_breaker=breaker)
+        no_budget = ResilientPaymentGateway(inner, budget=0, circuit_breaker=breaker)
+        gateway.charge(uuid4(), Money(Decimal("5.00")))
+        now[0] = 10
+        
+        # Act
+        exhausted = no_budget.charge(uuid4(), Money(Decimal("5.00")))
+        state = breaker.state
+        probe = gateway.charge(uuid4(), Money(Decimal("5.00")))
+        gateway.close()
+        no_budget.close()
+        
+        # Assert
+        assert "budget exhausted" in exhausted.message
+        assert state == CircuitBreaker.OPEN
+        assert probe.success is True
+        assert breaker.state == CircuitBreaker.CLOSED
+    
+    def test_hedged_request_cuts_tail_latency(self):
+        """Тест: при медленном первом запросе берется ответ хеджирующего"""
+        # Arrange
+        inner = UnreliableGateway(delays=[1.0])
+        gateway = ResilientPaymentGateway(inner, timeout=2.0, hedge_after=0.05)
+        
+        # Act
+        start = time.monotonic()
+        result = gateway.charge(uuid4(), Money(Decimal("5.00")))
+        elapsed = time.monotonic() - start
+        gateway.close()
+        
+        # Assert
+        assert result.transaction_id == "tx-1"
+        assert elapsed < 0.5
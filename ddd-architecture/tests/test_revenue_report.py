@@ -0,0 +1,114 @@
+import pytest
+from decimal import Decimal
+from uuid import uuid4
+
+from domain.money import Money
+from domain.order_aggregate import Order, OrderLine
+from domain.order_status import OrderStatus
+from application.pay_order_usecase import PayOrderUseCase
+from application.revenue_report import RevenueReport, Totals
+from infrastructure.observable_repository import ObservableOrderRepository
+from infrastructure.payment_gateway import FakePaymentGateway
+from infrastructure.sharded_order_repository import ShardedOrderRepository
+
+
+def create_order(price: str, currency: str = "USD", customer_id=None) -> Order:
+    return Order(customer_id=customer_id, lines=[OrderLine(
+        product_id=uuid4(),
+        product_name="Product",
+        price=Money(Decimal(price), currency),
+        quantity=2
+    )])
+
+
+class TestRevenueReport:
+    """Тесты материализованных итогов по заказам"""
+    
+    @pytest.fixture
+    def report(self):
+        return RevenueReport()
+    
+    @pytest.fixture
+    def repository(self, report):
+        return ObservableOrderRepository(ShardedOrderRepository(shards=4), [report.on_saved])
+    
+    def test_totals_follow_payments(self, report, repository):
+        """Тест: итоги обновляются при сохранениях use-case оплаты"""
+        # Arrange
+        customer_id = uuid4()
+        orders = [
+            create_order("10.00", customer_id=customer_id),
+            create_order("2.50", customer_id=customer_id),
+            create_order("100", "JPY"),
+        ]
+        repository.save_many(orders)
+        use_case = PayOrderUseCase(repository, FakePaymentGateway())
+        
+        # Act
+        use_case.execute(orders[0].id)
+        use_case.execute_many([orders[2].id])
+        
+        # Assert
+        assert report.by_status(OrderStatus.PAID) == Totals(2, 2, {
+            "USD": Money(Decimal("20.00")),
+            "JPY": Money(Decimal("200"), "JPY"),
+        })
+        assert report.by_status(OrderStatus.DRAFT) == Totals(1, 0, {})
+        assert report.by_status(OrderStatus.PENDING) == Totals()
+        assert report.by_customer(customer_id) == Totals(2, 1, {"USD": Money(Decimal("20.00"))})
+        assert report.by_currency("JPY").revenue == {"JPY": Money(Decimal("200"), "JPY")}
+        assert report.by_currency("USD").orders == 2
+    
+    def test_stale_notifications_are_ignored(self, report):
+        """Тест: сохранение с версией не новее учтенной пропускается"""
+        # Arrange
+        order = create_order("1.00")
+        repository = ShardedOrderRepository(shards=2)
+        repository.save(order)
+        stale = order.clone()
+        order.pay()
+        repository.save(order)
+        
+        # Act
+        report.on_saved([order])
+        report.on_saved([stale])
+        
+        # Assert
+        assert report.by_status(OrderStatus.PAID).paid_orders == 1
+        assert report.by_status(OrderStatus.DRAFT) == Totals()
+    
+    def test_rebuild_matches_incremental_totals(self, report, repository):
+        """Тест: пересчет полным обходом дает те же итоги"""
+        # Arrange
+        orders = [create_order(str(i + 1), customer_id=uuid4()) for i in range(10)]
+        repository.save_many(orders)
+        for order in orders[:4]:
+            order.pay()
+        repository.save_many(orders[:4])
+        rebuilt = RevenueReport()
+        
+        # Act
+        rebuilt.rebuild_from(repository)
+        
+        # Assert
+        for status in OrderStatus:
+            assert rebuilt.by_status(status) == report.by_status(status)
+        for order in orders:
+            assert rebuilt.by_customer(order.customer_id) == report.by_customer(order.customer_id)
+        assert rebuilt.by_currency("USD").revenue == {"USD": Money(Decimal("20.00"))}
+    
+    def test_listener_failure_does_not_fail_save(self):
+        """Тест: ошибка подписчика не отменяет сохранение"""
+        # Arrange
+        def broken_listener(orders):
+            raise RuntimeError("report is unavailable")
+        
+        repository = ObservableOrderRepository(ShardedOrderRepository(), [broken_listener])
+        order = create_order("1.00")
+        
+        # Act
+        repository.save(order)
+        
+        # Assert
+        assert repository.get_by_id(order.id) == order
+        assert repository.listener_failures == 1
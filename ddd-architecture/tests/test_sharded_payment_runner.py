@@ -0,0 +1,106 @@
+import os
+import pytest
+from decimal import Decimal
+from functools import partial
+from uuid import uuid4
+
+from domain.money import Money
+from domain.order_aggregate import Order, OrderLine
+from domain.order_status import OrderStatus
+from infrastructure.payment_gateway import FakePaymentGateway
+from infrastructure.sqlite_order_repository import SqliteOrderRepository
+from infrastructure.sharded_payment_runner import ShardedPaymentRunner
+
+
+WORKERS = 3
+
+
+# Фабрики определены на уровне модуля, чтобы их можно было передать в процесс
+def open_shard(directory: str, shard: int) -> SqliteOrderRepository:
+    return SqliteOrderRepository(os.path.join(directory, f"shard-{shard}.db"))
+
+
+def make_gateway(shard: int) -> FakePaymentGateway:
+    return FakePaymentGateway()
+
+
+def broken_repository(shard: int) -> SqliteOrderRepository:
+    raise RuntimeError(f"shard {shard} is unavailable")
+
+
+def create_order() -> Order:
+    order = Order()
+    order.add_line(OrderLine(
+        product_id=uuid4(),
+        product_name="Product",
+        price=Money(Decimal("12.5")),
+        quantity=2
+    ))
+    return order
+
+
+class TestShardedPaymentRunner:
+    """Тесты оплаты заказов в пуле процессов"""
+    
+    @pytest.fixture
+    def shards(self, tmp_path):
+        """Заказы, разложенные по файлам шардов"""
+        runner = ShardedPaymentRunner(WORKERS, partial(open_shard, str(tmp_path)), make_gateway)
+        orders = [create_order() for _ in range(60)]
+        for shard in range(WORKERS):
+            repository = open_shard(str(tmp_path), shard)
+            repository.save_many(order for order in orders if runner.shard_of(order.id) == shard)
+            repository.close()
+        return str(tmp_path), orders
+    
+    def test_pays_every_order_once(self, shards):
+        """Тест: каждый заказ оплачен в своем шарде, результаты приходят одним потоком"""
+        # Arrange
+        directory, orders = shards
+        runner = ShardedPaymentRunner(
+            WORKERS, partial(open_shard, directory), make_gateway, batch_size=7
+        )
+        
+        # Act
+        results = list(runner.run(order.id for order in orders))
+        
+        # Assert
+        assert sorted(order_id for order_id, _ in results) == sorted(order.id for order in orders)
+        assert all(result.success for _, result in results)
+        paid_total = 0
+        for shard in range(WORKERS):
+            repository = open_shard(directory, shard)
+            paid = repository.find_by_status(OrderStatus.PAID)
+            repository.close()
+            assert all(runner.shard_of(order.id) == shard for order in paid)
+            paid_total += len(paid)
+        assert paid_total == len(orders)
+    
+    def test_missing_and_repeated_orders(self, shards):
+        """Тест: повторная оплата и неизвестный заказ возвращают ошибку"""
+        # Arrange
+        directory, orders = shards
+        runner = ShardedPaymentRunner(WORKERS, partial(open_shard, directory), make_gateway)
+        list(runner.run([orders[0].id]))
+        unknown = uuid4()
+        
+        # Act
+        results = dict(runner.run([orders[0].id, unknown]))
+        
+        # Assert
+        assert not results[orders[0].id].success
+        assert "not found" in results[unknown].message
+    
+    def test_worker_failure_is_reported(self):
+        """Тест: ошибка в воркере передается в родительский процесс"""
+        # Arrange
+        runner = ShardedPaymentRunner(2, broken_repository, make_gateway, batch_size=1)
+        
+        # Act / Assert
+        with pytest.raises(RuntimeError, match="is unavailable"):
+            list(runner.run(uuid4() for _ in range(20)))
+    
+    def test_invalid_worker_count(self):
+        """Тест: число воркеров должно быть положительным"""
+        with pytest.raises(ValueError):
+            ShardedPaymentRunner(0, broken_repository, make_gateway)
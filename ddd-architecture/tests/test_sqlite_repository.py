@@ -0,0 +1,182 @@
+import threading
+import pytest
+from decimal import Decimal
+from uuid import uuid4
+
+from domain.order_aggregate import Order, OrderLine
+from domain.money import Money
+from domain.order_status import OrderStatus
+from application.pay_order_usecase import PayOrderUseCase
+from infrastructure.sqlite_order_repository import SqliteOrderRepository
+from infrastructure.payment_gateway import FakePaymentGateway
+
+
+def create_order(lines: int = 2) -> Order:
+    """Создает заказ с несколькими строками"""
+    order = Order()
+    for i in range(lines):
+        order.add_line(OrderLine(
+            product_id=uuid4(),
+            product_name=f"Product {i}",
+            price=Money(Decimal("10.5") + i),
+            quantity=i + 1
+        ))
+    return order
+
+
+class TestSqliteOrderRepository:
+    """Тесты для SQLite-репозитория заказов"""
+    
+    @pytest.fixture
+    def repository(self, tmp_path):
+        repository = SqliteOrderRepository(str(tmp_path / "orders.db"))
+        yield repository
+        repository.close()
+    
+    def test_save_and_load_order(self, repository):
+        """Тест: заказ восстанавливается со строками, статусом и временем"""
+        # Arrange
+        order = create_order()
+        
+        # Act
+        repository.save(order)
+        loaded = repository.get_by_id(order.id)
+        
+        # Assert
+        assert loaded is not order
+        assert loaded == order
+        assert loaded.customer_id == order.customer_id
+        assert loaded.lines == order.lines
+        assert str(loaded.lines[0].price.amount) == "10.5"
+        assert loaded.total_amount == order.total_amount
+        assert loaded.status == OrderStatus.DRAFT
+        assert loaded.created_timestamp == order.created_timestamp
+    
+    def test_save_replaces_lines(self, repository):
+        """Тест: повторное сохранение заменяет строки заказа"""
+        # Arrange
+        order = create_order(3)
+        repository.save(order)
+        
+        # Act
+        order.remove_line(order.lines[0].product_id)
+        repository.save(order)
+        
+        # Assert
+        assert repository.get_by_id(order.id).lines == order.lines
+    
+    def test_bulk_save_and_get(self, repository):
+        """Тест пакетных save_many и get_many"""
+        # Arrange
+        orders = [create_order() for _ in range(600)]
+        missing_id = uuid4()
+        
+        # Act
+        repository.save_many(orders)
+        loaded = repository.get_many([o.id for o in orders] + [missing_id])
+        
+        # Assert
+        assert list(loaded) == [o.id for o in orders]
+        assert all(loaded[o.id].total_amount == o.total_amount for o in orders)
+    
+    def test_uses_wal_and_connection_per_thread(self, repository):
+        """Тест: режим WAL и отдельное соединение для каждого потока"""
+        # Arrange
+        order = create_order()
+        repository.save(order)
+        connections = []
+        
+        def worker():
+            connections.append(repository._connection())
+            assert repository.get_by_id(order.id) == order
+        
+        # Act
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+        
+        # Assert
+        journal_mode = repository._connection().execute("PRAGMA journal_mode").fetchone()[0]
+        assert journal_mode == "wal"
+        assert connections[0] is not repository._connection()
+    
+    def test_pay_order_use_case_with_sqlite(self, repository):
+        """Тест: use-case оплаты сохраняет оплаченный заказ в SQLite"""
+        # Arrange
+        order = create_order()
+        repository.save(order)
+        use_case = PayOrderUseCase(repository, FakePaymentGateway())
+        
+        # Act
+        result = use_case.execute(order.id)
+        
+        # Assert
+        assert result.success is True
+        assert repository.get_by_id(order.id).status == OrderStatus.PAID
+
+
+class TestLazyLines:
+    """Тесты ленивой загрузки строк из SQLite"""
+    
+    @pytest.fixture
+    def path(self, tmp_path):
+        return str(tmp_path / "orders.db")
+    
+    @pytest.fixture
+    def repository(self, path):
+        repository = SqliteOrderRepository(path, lazy_lines=True)
+        yield repository
+        repository.close()
+    
+    def test_header_is_enough_for_status_and_total(self, repository):
+        """Тест: статус, сумма и число строк не загружают строки"""
+        # Arrange
+        order = create_order(3)
+        repository.save(order)
+        
+        # Act
+        loaded = repository.get_by_id(order.id)
+        many = repository.get_many([order.id])[order.id]
+        
+        # Assert
+        assert loaded.status == OrderStatus.DRAFT
+        assert loaded.total_amount == order.total_amount
+        assert len(loaded.line_view) == 3
+        assert not loaded.lines_loaded
+        assert not many.lines_loaded
+        assert loaded.lines == order.lines
+        assert loaded.lines_loaded
+    
+    def test_payment_does_not_load_lines(self, repository):
+        """Тест: оплата через use-case не читает и не перезаписывает строки"""
+        # Arrange
+        order = create_order(2)
+        repository.save(order)
+        loaded = repository.get_by_id(order.id)
+        
+        # Act
+        loaded.start_payment()
+        loaded.pay()
+        repository.save(loaded)
+        
+        # Assert
+        assert not loaded.lines_loaded
+        stored = repository.get_by_id(order.id)
+        assert stored.status == OrderStatus.PAID
+        assert stored.lines == order.lines
+    
+    def test_modified_lines_are_saved(self, repository):
+        """Тест: изменение ленивого заказа загружает и сохраняет строки"""
+        # Arrange
+        order = create_order(2)
+        repository.save(order)
+        loaded = repository.get_by_id(order.id)
+        
+        # Act
+        loaded.remove_line(order.lines[0].product_id)
+        repository.save(loaded)
+        
+        # Assert
+        stored = repository.get_by_id(order.id)
+        assert stored.lines == order.lines[1:]
+        assert stored.total_amount == order.lines[1].total